@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""Per-endpoint latency and Docker API calls, checked against a baseline.
+
+Runs the web app in-process against fake_docker.py (a Docker host with
+300 containers) and times every case for --requests requests. Each case
+reports p50/p99 latency and Docker API calls per request. The result is
+compared with benchmarks/baseline.json; the run fails (exit 1) when a
+p99 is above baseline * --tolerance plus --slack ms or a case makes
+more Docker API calls than recorded.
+
+--update-baseline writes the current numbers as the new baseline; do
+that on purpose, in the same commit as the change that moved them.
+
+Usage: python3 benchmarks/bench_api.py [--requests N] [--tolerance X] [--slack MS]
+           [--update-baseline] [--only CASE]
+"""
+import argparse
+import gc
+import json
+import os
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+WEB_DIR = os.path.join(HERE, '..', 'common', 'rootfs', 'app', 'web')
+BASELINE_PATH = os.path.join(HERE, 'baseline.json')
+CONTAINERS = 300
+
+import fake_docker  # noqa: E402
+
+
+def percentile(sorted_values, q):
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * q))]
+
+
+def docker_calls(state):
+    # The events stream is long-lived and not a per-request cost
+    return sum(count for route, count in state['calls'].items() if not route.endswith('/events'))
+
+
+def build_cases(web_app, state):
+    client = web_app.app.test_client()
+    ha_container = web_app.ha_container
+
+    def get(path):
+        def request():
+            resp = client.get(path)
+            assert resp.status_code == 200, (path, resp.status_code, resp.data[:200])
+        return request
+
+    def revalidate(path):
+        # A poller that sends back the ETag it got last: 304 until the content changes
+        etag = {'value': ''}
+
+        def request():
+            resp = client.get(path, headers={'If-None-Match': etag['value']})
+            assert resp.status_code in (200, 304), (path, resp.status_code, resp.data[:200])
+            etag['value'] = resp.headers['ETag']
+        return request
+
+    def find(cold):
+        def request():
+            if cold:
+                ha_container.invalidate()
+            container, error = ha_container.find_ha_container()
+            assert container is not None, error
+        return request
+
+    def rename_ha(name, label):
+        # Only the fallback filters match a container without the label and exact name
+        ha = state['containers'][-1]
+        ha['Names'] = [f'/{name}']
+        ha['Labels'] = {'io.hass.type': 'homeassistant'} if label else {}
+        ha_container.invalidate()
+
+    # (name, request, description, setup)
+    return [
+        ('find_ha_cold', find(True), 'find_ha_container() without the cache (exact name)',
+         lambda: rename_ha('homeassistant', True)),
+        ('find_ha_fallback', find(True), 'find_ha_container() without the cache (name contains)',
+         lambda: rename_ha('addon_HomeAssistant_1', False)),
+        ('find_ha_cached', find(False), 'find_ha_container() from the cache',
+         lambda: rename_ha('homeassistant', True)),
+        ('index', get('/'), 'GET /', None),
+        ('status', get('/api/status'), 'GET /api/status', None),
+        ('status_not_modified', revalidate('/api/status'), 'GET /api/status with If-None-Match', None),
+        ('operations', get('/api/operations'), 'GET /api/operations', None),
+        ('progress', get('/api/progress?since=0'), 'GET /api/progress?since=0', None),
+        ('healthz', get('/healthz'), 'GET /healthz', None),
+        ('readyz', get('/readyz'), 'GET /readyz', None),
+    ]
+
+
+def wait_for_watcher(ha_container):
+    ha_container.get_client()
+    deadline = time.time() + 10
+    while time.time() < deadline and not ha_container._state['watching']:
+        time.sleep(0.05)
+
+
+def measure(request, requests, state):
+    gc.collect()
+    request()  # warm-up (and fills the cache for the cached case)
+    before = docker_calls(state)
+    timings = []
+    for _ in range(requests):
+        start = time.perf_counter()
+        request()
+        timings.append((time.perf_counter() - start) * 1000)
+    calls = (docker_calls(state) - before) / requests
+    timings.sort()
+    return {
+        'p50_ms': round(percentile(timings, 0.5), 3),
+        'p99_ms': round(percentile(timings, 0.99), 3),
+        'docker_calls_per_request': round(calls, 2),
+    }
+
+
+def check(result, baseline, tolerance, slack):
+    """Return a list of reasons the result is worse than the baseline."""
+    failures = []
+    limit = baseline['p99_ms'] * tolerance + slack
+    if result['p99_ms'] > limit:
+        failures.append(f"p99 {result['p99_ms']:.1f} ms > {limit:.1f} ms")
+    if result['docker_calls_per_request'] > baseline['docker_calls_per_request']:
+        failures.append(f"docker calls {result['docker_calls_per_request']} "
+                        f"> {baseline['docker_calls_per_request']}")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--tolerance', type=float, default=2.0,
+                        help='allowed p99 factor over the baseline (default 2.0)')
+    parser.add_argument('--slack', type=float, default=5.0,
+                        help='ms added to the p99 limit, for scheduler noise on fast cases')
+    parser.add_argument('--update-baseline', action='store_true')
+    parser.add_argument('--only', help='run a single case')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        socket_path = os.path.join(tmpdir, 'docker.sock')
+        server, state = fake_docker.start(socket_path, containers=CONTAINERS)
+        os.environ['DOCKER_HOST'] = f'unix://{socket_path}'
+        os.environ['HA_CONFIG_PATH'] = tmpdir
+        os.environ['HACS_CACHE_DIR'] = os.path.join(tmpdir, 'cache')
+        os.environ['AUDIT_LOG_PATH'] = os.path.join(tmpdir, 'audit.jsonl')
+        sys.path.insert(0, WEB_DIR)
+        import app as web_app
+
+        wait_for_watcher(web_app.ha_container)
+        baseline = {}
+        if os.path.exists(BASELINE_PATH):
+            with open(BASELINE_PATH) as f:
+                baseline = json.load(f)['cases']
+
+        print(f'{CONTAINERS} containers, {args.requests} requests per case')
+        print(f'{"case":<20} {"p50 ms":>8} {"p99 ms":>8} {"docker":>7} {"base p99":>9}  result')
+        results = {}
+        failed = False
+        for name, request, description, setup in build_cases(web_app, state):
+            if args.only and name != args.only:
+                continue
+            if setup:
+                setup()
+            result = measure(request, args.requests, state)
+            results[name] = dict(result, description=description)
+            base = baseline.get(name)
+            if args.update_baseline or base is None:
+                verdict = 'new' if base is None else 'updated'
+                base_p99 = '-'
+            else:
+                failures = check(result, base, args.tolerance, args.slack)
+                failed = failed or bool(failures)
+                verdict = 'FAIL ' + '; '.join(failures) if failures else 'ok'
+                base_p99 = f"{base['p99_ms']:.1f}"
+            print(f"{name:<20} {result['p50_ms']:>8.1f} {result['p99_ms']:>8.1f} "
+                  f"{result['docker_calls_per_request']:>7} {base_p99:>9}  {verdict}")
+        server.shutdown()
+
+    if args.update_baseline:
+        merged = dict(baseline, **results)
+        with open(BASELINE_PATH, 'w') as f:
+            json.dump({
+                'setup': {'containers': CONTAINERS, 'requests': args.requests},
+                'cases': merged,
+            }, f, indent=2, sort_keys=True)
+            f.write('\n')
+        print(f'baseline written to {os.path.relpath(BASELINE_PATH)}')
+    elif failed:
+        sys.exit('regression against benchmarks/baseline.json')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""Scenario checks and timings for the HACS artifact cache.
+
+Runs artifacts.install() against fake_github.py and checks:
+cold download, cache hit (no download), resume after a cut connection
+(only the missing bytes are fetched), a corrupted download rejected
+without touching the live directory, offline install from cache, and
+a server without Range support. Every install verifies the archive
+once: a fresh download while it is fetched, a cached one before it is
+unpacked. With the API rate-limited (403), the release is found through
+the releases/latest/download redirect, or through the API when a token
+is set; only a refused connection is reported as GitHub being
+unreachable.
+
+Usage: python3 benchmarks/bench_artifacts.py [--port N]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+WEB_DIR = os.path.join(HERE, '..', 'common', 'rootfs', 'app', 'web')
+
+import fake_github  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--port', type=int, default=18500)
+    args = parser.parse_args()
+
+    tmpdir = tempfile.mkdtemp()
+    os.environ['GITHUB_API_URL'] = f'http://127.0.0.1:{args.port}'
+    os.environ['GITHUB_URL'] = f'http://127.0.0.1:{args.port}'
+    os.environ['HACS_CACHE_DIR'] = os.path.join(tmpdir, 'cache')
+    sys.path.insert(0, WEB_DIR)
+    import artifacts
+
+    server, state = fake_github.start(args.port)
+    target = os.path.join(tmpdir, 'custom_components', 'hacs')
+    size = len(state['body'])
+    verify_archive = artifacts.verify_archive
+    verified = []
+
+    def counting_verify(*args, **kwargs):
+        verified.append(args[0])
+        return verify_archive(*args, **kwargs)
+
+    artifacts.verify_archive = counting_verify
+
+    def install():
+        state['bytes_sent'] = 0
+        del verified[:]
+        start = time.perf_counter()
+        try:
+            version = artifacts.install(target, lambda line: None, lambda name: None)
+            error = None
+        except artifacts.ArtifactError as e:
+            version, error = None, str(e)
+        return version, error, (time.perf_counter() - start) * 1000, state['bytes_sent']
+
+    def live_version():
+        with open(os.path.join(target, '__init__.py')) as f:
+            return f.read().split('"')[1]
+
+    print(f'archive: {size} bytes')
+    print(f'{"scenario":<28} {"ms":>8} {"bytes":>9}  result')
+
+    def report(name, result, ok):
+        version, error, ms, sent = result
+        print(f'{name:<28} {ms:>8.1f} {sent:>9}  {"ok" if ok else "FAIL"} {error or version}')
+        assert ok, name
+
+    r = install()
+    report('cold download', r, r[0] == '2.0.1' and r[3] == size and live_version() == '2.0.1')
+    assert len(verified) == 1, verified
+
+    r = install()
+    report('cache hit', r, r[0] == '2.0.1' and r[3] == 0)
+    assert len(verified) == 1, verified
+
+    # New release, connection cut half way, then resumed
+    state['version'] = '2.0.2'
+    state['body'] = fake_github.build_archive('2.0.2')
+    size = len(state['body'])
+    state['cut_after'] = size // 2
+    r = install()
+    report('cut download', r, r[1] is not None and live_version() == '2.0.1')
+    state['cut_after'] = None
+    r = install()
+    report('resumed download', r, r[0] == '2.0.2' and r[3] == size - size // 2 and live_version() == '2.0.2')
+
+    # Corrupted body with the published digest: rejected, live tree untouched
+    state['version'] = '2.0.3'
+    state['body'] = fake_github.build_archive('2.0.3')
+    state['corrupt'] = True
+    r = install()
+    report('corrupted download', r, r[1] is not None and 'checksum' in r[1] and live_version() == '2.0.2')
+    state['corrupt'] = False
+
+    state['offline'] = True
+    r = install()
+    report('offline, from cache', r, r[0] == '2.0.2' and live_version() == '2.0.2')
+    state['offline'] = False
+
+    state['no_range'] = True
+    state['no_digest'] = True
+    state['cut_after'] = size // 3
+    install()
+    state['cut_after'] = None
+    r = install()
+    report('no Range, no digest', r, r[0] == '2.0.3' and live_version() == '2.0.3')
+    state['no_range'] = False
+    state['no_digest'] = False
+
+    def redirect_used():
+        return any(path.endswith('/releases/latest/download/hacs.zip') for path, _ in state['requests'])
+
+    # 60 unauthenticated API requests per hour used up: the web redirect names the release
+    state['version'] = '2.0.4'
+    state['body'] = fake_github.build_archive('2.0.4')
+    state['rate_limited'] = True
+    del state['requests'][:]
+    r = install()
+    report('rate limited, redirect', r, r[0] == '2.0.4' and redirect_used() and live_version() == '2.0.4')
+
+    state['version'] = '2.0.5'
+    state['body'] = fake_github.build_archive('2.0.5')
+    state['token'] = artifacts.GITHUB_TOKEN = 'bench-token'
+    del state['requests'][:]
+    r = install()
+    report('rate limited, token', r, r[0] == '2.0.5' and not redirect_used() and live_version() == '2.0.5')
+    state['rate_limited'] = False
+
+    state['offline'] = True
+    try:
+        artifacts.latest_release()
+    except artifacts.ArtifactError as e:
+        assert str(e) == 'Release lookup failed: HTTP 503', e
+    else:
+        raise AssertionError('lookup succeeded while GitHub answered 503')
+    state['offline'] = False
+    server.shutdown()
+    server.server_close()
+    try:
+        artifacts.latest_release()
+    except artifacts.ArtifactError as e:
+        assert str(e).startswith('Unable to connect to GitHub'), e
+    else:
+        raise AssertionError('lookup succeeded without a server')
+    print('HTTP 503 reported as a failed lookup, a refused connection as GitHub unreachable')
+
+    leftovers = [n for n in os.listdir(os.path.dirname(target)) if n != 'hacs']
+    assert not leftovers, leftovers
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""Scheduling checks for the job queue (jobs.py).
+
+Registers stand-in job kinds on two resources, like install/uninstall
+(custom_components/hacs) and restart (the HA container), and runs them
+with --workers worker threads. The first job on the shared resource
+holds it until released. Checks that:
+
+- the jobs queued behind it on the same resource do not take the other
+  workers: a job on the other resource submitted after them starts
+  right away
+- the jobs on the shared resource run in submission order
+- a submission is only merged into the last job queued on its resource:
+  uninstall → install → uninstall queues three jobs and the last one
+  wins, while a repeated click is merged
+
+Usage: python3 benchmarks/bench_jobs.py [--workers N]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+WEB_DIR = os.path.join(HERE, '..', 'common', 'rootfs', 'app', 'web')
+
+
+def wait_until(predicate, timeout=10):
+    deadline = time.time() + timeout
+    while not predicate():
+        if time.time() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--workers', type=int, default=4)
+    args = parser.parse_args()
+
+    os.environ['HACS_WORKERS'] = str(args.workers)
+    os.environ['AUDIT_LOG_PATH'] = os.path.join(tempfile.mkdtemp(), 'audit.jsonl')
+    sys.path.insert(0, WEB_DIR)
+    import jobs
+
+    started = []
+    release = threading.Event()
+
+    def work_for(kind):
+        def work(log, step):
+            started.append(kind)
+            if kind == 'hold':
+                release.wait(10)
+        return work
+
+    shared = ['hold'] + [f'shared-{i}' for i in range(args.workers + 1)]
+    for kind in shared:
+        jobs.register(kind, kind, work_for(kind), 'Done.', resource='hacs')
+    jobs.register('other', 'other', work_for('other'), 'Done.', resource='homeassistant')
+    jobs.start()
+
+    submitted = [jobs.submit(kind)[0]['operation_id'] for kind in shared]
+    assert wait_until(lambda: 'hold' in started)
+    start = time.perf_counter()
+    other, _ = jobs.submit('other')
+    assert wait_until(lambda: jobs.get(other['operation_id'])['status'] == 'success', timeout=5), \
+        'a job on another resource waited behind the queued ones'
+    elapsed = (time.perf_counter() - start) * 1000
+    assert jobs.get(submitted[0])['status'] == 'running'
+    print(f'{args.workers} workers, {len(shared) - 1} jobs queued on one resource: '
+          f'a job on another resource finished in {elapsed:.0f} ms')
+
+    release.set()
+    assert wait_until(lambda: all(jobs.get(i)['finished_at'] for i in submitted))
+    order = [kind for kind in started if kind != 'other']
+    assert order == shared, order
+    print(f'shared resource ran in submission order: {", ".join(order)}')
+
+    # Install running, then uninstall, install, uninstall, uninstall clicked
+    for kind in ('install', 'uninstall'):
+        jobs.register(kind, kind, work_for(kind), 'Done.', resource='hacs')
+    release.clear()
+    del started[:]
+    jobs.submit('hold')
+    assert wait_until(lambda: 'hold' in started)
+    results = [jobs.submit(kind) for kind in ('uninstall', 'install', 'uninstall', 'uninstall')]
+    created = [c for _, c in results]
+    assert created == [True, True, True, False], created
+    assert results[3][0]['operation_id'] == results[2][0]['operation_id']
+    release.set()
+    last = results[2][0]['operation_id']
+    assert wait_until(lambda: jobs.get(last)['finished_at'])
+    assert started == ['hold', 'uninstall', 'install', 'uninstall'], started
+    print(f"uninstall, install, uninstall, uninstall: {sum(created)} queued, ran {', '.join(started[1:])}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""Cap and lifetime of /api/progress/stream.
+
+Every progress stream holds one of the WEB_THREADS gthread threads while
+it is open. Runs the app in-process with a job that waits until
+released, and checks that:
+
+- SSE_MAX_SUBSCRIBERS streams following it open, the next one is
+  refused with 503 and Retry-After, and /healthz still answers
+- the streams end by themselves once the job finishes, freeing every slot
+- a stream for a finished job with nothing left to send gets 204, so the
+  browser's EventSource stops reconnecting
+
+Usage: python3 benchmarks/bench_progress.py [--max-subscribers N]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+WEB_DIR = os.path.join(HERE, '..', 'common', 'rootfs', 'app', 'web')
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--max-subscribers', type=int, default=2)
+    args = parser.parse_args()
+
+    tmpdir = tempfile.mkdtemp()
+    os.environ['SSE_MAX_SUBSCRIBERS'] = str(args.max_subscribers)
+    os.environ['AUDIT_LOG_PATH'] = os.path.join(tmpdir, 'audit.jsonl')
+    os.environ['HA_CONFIG_PATH'] = tmpdir
+    sys.path.insert(0, WEB_DIR)
+    import app as web_app
+    jobs, progress = web_app.jobs, web_app.progress
+    client = web_app.app.test_client()
+    assert progress.MAX_SUBSCRIBERS == args.max_subscribers
+
+    release = threading.Event()
+    jobs.register('wait', 'Wait', lambda log, step: release.wait(), 'Done.', resource='bench')
+    jobs.start()
+    since = progress.last_seq()
+    job, _ = jobs.submit('wait')
+    url = f"/api/progress/stream?since={since}&operation_id={job['operation_id']}"
+
+    def follow(opened, received):
+        # One thread per stream, like gthread; the request context is per thread
+        resp = client.get(url, buffered=False)
+        assert resp.status_code == 200, resp.status_code
+        for chunk in resp.response:
+            received.append(chunk)
+            opened.set()
+        resp.close()
+
+    streams = []
+    for _ in range(args.max_subscribers):
+        opened, received = threading.Event(), []
+        thread = threading.Thread(target=follow, args=(opened, received))
+        thread.start()
+        assert opened.wait(10), 'stream did not open'
+        streams.append((thread, received))
+    print(f'{progress.subscriber_count()} streams open (SSE_MAX_SUBSCRIBERS={progress.MAX_SUBSCRIBERS})')
+
+    resp = client.get(url)
+    assert resp.status_code == 503, resp.status_code
+    assert resp.headers['Retry-After'] == str(progress.RETRY_AFTER), resp.headers
+    assert client.get('/healthz').status_code == 200
+    print(f"next stream: 503, Retry-After {resp.headers['Retry-After']}; /healthz still answers")
+
+    start = time.perf_counter()
+    release.set()
+    for thread, received in streams:
+        thread.join(10)
+        assert not thread.is_alive(), 'stream still open after the job finished'
+        assert b'"status":"success"' in b''.join(received), received
+    elapsed = (time.perf_counter() - start) * 1000
+    assert progress.subscriber_count() == 0, progress.subscriber_count()
+    print(f'streams ended {elapsed:.0f} ms after the job finished')
+
+    resp = client.get(url, headers={'Last-Event-ID': str(progress.last_seq())})
+    assert resp.status_code == 204, resp.status_code
+    print('reconnect after the end: 204')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""Startup time of the web service: imports, port bind, first responses.
+
+Import phase: `python3 -X importtime -c "import app"` in a fresh
+interpreter, reported as wall time (minus a bare interpreter start) and
+the slowest of the modules app imports directly.
+
+Serve phase: starts the service the way the container does (gunicorn
+with gunicorn.conf.py, or the Flask development server with --server
+dev) against fake_docker.py and records, from the moment the process is
+spawned: when the port accepts connections, the first 200 from /healthz
+and /, the first /api/status, and when /readyz reports warmed_up (the
+docker SDK is imported and the Home Assistant container found, see
+app.warm_up()).
+
+Usage: python3 benchmarks/bench_startup.py [--runs N] [--server gunicorn|dev]
+"""
+import argparse
+import os
+import signal
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+WEB_DIR = os.path.join(HERE, '..', 'common', 'rootfs', 'app', 'web')
+TIMEOUT = 30
+
+import fake_docker  # noqa: E402
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def python_startup():
+    start = time.perf_counter()
+    subprocess.run([sys.executable, '-c', 'pass'], check=True)
+    return time.perf_counter() - start
+
+
+def measure_imports(env):
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import app'],
+                            cwd=WEB_DIR, env=env, capture_output=True, text=True, check=True)
+    elapsed = time.perf_counter() - start - python_startup()
+    # "import time: self [us] | cumulative | imported package", children
+    # listed (indented by two more spaces) before their parent
+    children, top_level = [], []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line.split('|')
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        if depth == 1:
+            children.append((int(cumulative), name.strip()))
+        elif depth == 0:
+            if name.strip() == 'app':
+                top_level = children
+            children = []
+    top_level.sort(reverse=True)
+    return elapsed, top_level[:6]
+
+
+def get(port, path):
+    try:
+        with urllib.request.urlopen(f'http://127.0.0.1:{port}{path}', timeout=5) as resp:
+            return resp.status, resp.read()
+    except urllib.error.HTTPError as e:
+        return e.code, e.read()
+    except OSError:
+        return None, b''
+
+
+def wait_until(check, start):
+    while time.perf_counter() - start < TIMEOUT:
+        if check():
+            return (time.perf_counter() - start) * 1000
+        time.sleep(0.005)
+    raise RuntimeError('service did not start in time')
+
+
+def port_open(port):
+    try:
+        with socket.create_connection(('127.0.0.1', port), timeout=0.1):
+            return True
+    except OSError:
+        return False
+
+
+def measure_serving(env, server):
+    port = free_port()
+    env = dict(env, WEB_PORT=str(port))
+    if server == 'gunicorn':
+        cmd = ['gunicorn', '--config', 'gunicorn.conf.py', '--chdir', WEB_DIR, 'app:app']
+    else:
+        cmd = [sys.executable, 'app.py']
+    start = time.perf_counter()
+    process = subprocess.Popen(cmd, cwd=WEB_DIR, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        marks = {'bind': wait_until(lambda: port_open(port), start)}
+        marks['healthz'] = wait_until(lambda: get(port, '/healthz')[0] == 200, start)
+        marks['index'] = wait_until(lambda: get(port, '/')[0] == 200, start)
+        marks['status'] = wait_until(lambda: get(port, '/api/status')[0] == 200, start)
+        marks['warm'] = wait_until(lambda: b'"warmed_up":true' in get(port, '/readyz')[1].replace(b' ', b''),
+                                   start)
+        return marks
+    finally:
+        process.send_signal(signal.SIGTERM)
+        try:
+            process.wait(10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--server', choices=('gunicorn', 'dev'), default='gunicorn')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        socket_path = os.path.join(tmpdir, 'docker.sock')
+        server, _ = fake_docker.start(socket_path)
+        env = dict(os.environ, DOCKER_HOST=f'unix://{socket_path}', HA_CONFIG_PATH=tmpdir,
+                   HACS_CACHE_DIR=os.path.join(tmpdir, 'cache'), AUDIT_LOG_PATH=os.path.join(tmpdir, 'audit.jsonl'),
+                   WEB_SERVER=args.server)
+
+        imports = [measure_imports(env) for _ in range(args.runs)]
+        print(f'import app: median {statistics.median(i[0] for i in imports) * 1000:.0f} ms '
+              f'over {args.runs} runs (interpreter start subtracted)')
+        for cumulative, name in imports[-1][1]:
+            print(f'  {name:<20} {cumulative / 1000:>7.1f} ms')
+
+        runs = [measure_serving(env, args.server) for _ in range(args.runs)]
+        print(f'{args.server}, ms after spawn (median of {args.runs}):')
+        for mark, label in (('bind', 'port accepts connections'), ('healthz', 'first /healthz 200'),
+                            ('index', 'first / 200'), ('status', 'first /api/status 200'),
+                            ('warm', '/readyz warmed_up')):
+            print(f'  {label:<26} {statistics.median(r[mark] for r in runs):>7.0f}')
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""Stub Docker Engine API on a unix socket, for the benchmarks.
+
+Answers the calls ha_container.py makes: /version, /containers/json
+with name/label filters, /events (held open without events) and
+/containers/<id>/restart. The host has `containers` containers, one of
+which is Home Assistant. Knobs (keys of the returned `state` dict):
+
+- ha_name: name of the Home Assistant container (default 'homeassistant')
+- ha_label: whether it carries io.hass.type=homeassistant (default True)
+- delay: seconds added to every response
+
+`state['calls']` counts requests per (method, route).
+
+Usage as a module: server, state = start(socket_path); ... server.shutdown()
+Point the app at it with DOCKER_HOST=unix://<socket_path>.
+"""
+import json
+import re
+import socketserver
+import threading
+import time
+from http.server import BaseHTTPRequestHandler
+from urllib.parse import parse_qs, urlparse
+
+API_VERSION = '1.43'
+
+
+def build_containers(count, ha_name, ha_label):
+    containers = []
+    for i in range(count - 1):
+        containers.append({
+            'Id': f'{i:064x}',
+            'Names': [f'/addon_{i:03d}'],
+            'Image': f'example/addon-{i % 20}:latest',
+            'Labels': {'io.hass.type': 'addon'} if i % 3 == 0 else {},
+            'State': 'running',
+        })
+    containers.append({
+        'Id': 'ha' + '0' * 62,
+        'Names': [f'/{ha_name}'],
+        'Image': 'ghcr.io/home-assistant/home-assistant:stable',
+        'Labels': {'io.hass.type': 'homeassistant'} if ha_label else {},
+        'State': 'running',
+    })
+    return containers
+
+
+def matches(container, filters):
+    for pattern in filters.get('name', []):
+        if not any(re.search(pattern, name) for name in container['Names']):
+            return False
+    for label in filters.get('label', []):
+        key, _, value = label.partition('=')
+        if key not in container['Labels'] or (value and container['Labels'][key] != value):
+            return False
+    return True
+
+
+class _Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def start(socket_path, containers=300, ha_name='homeassistant', ha_label=True):
+    state = {
+        'ha_name': ha_name,
+        'ha_label': ha_label,
+        'delay': 0,
+        'calls': {},
+        'stop': threading.Event(),
+    }
+    state['containers'] = build_containers(containers, ha_name, ha_label)
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def log_message(self, *args):
+            pass
+
+        def address_string(self):
+            return 'unix'
+
+        def _count(self, route):
+            key = f'{self.command} {route}'
+            state['calls'][key] = state['calls'].get(key, 0) + 1
+
+        def _json(self, status, data):
+            payload = json.dumps(data).encode()
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            path = re.sub(r'^/v[0-9.]+', '', url.path)
+            time.sleep(state['delay'])
+            if path == '/version':
+                self._count('/version')
+                return self._json(200, {'ApiVersion': API_VERSION, 'Version': '24.0.0'})
+            if path == '/_ping':
+                return self._json(200, 'OK')
+            if path == '/containers/json':
+                self._count('/containers/json')
+                filters = json.loads(parse_qs(url.query).get('filters', ['{}'])[0])
+                return self._json(200, [c for c in state['containers'] if matches(c, filters)])
+            if path == '/events':
+                self._count('/events')
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Transfer-Encoding', 'chunked')
+                self.end_headers()
+                self.wfile.flush()
+                # No events; keep the stream open like an idle daemon
+                state['stop'].wait()
+                return
+            self._json(404, {'message': 'page not found'})
+
+        def do_POST(self):
+            url = urlparse(self.path)
+            path = re.sub(r'^/v[0-9.]+', '', url.path)
+            time.sleep(state['delay'])
+            if re.fullmatch(r'/containers/[0-9a-z]+/restart', path):
+                self._count('/containers/<id>/restart')
+                self.send_response(204)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+            self._json(404, {'message': 'page not found'})
+
+    server = _Server(socket_path, Handler)
+    threading.Thread(target=server.serve_forever, name='fake-docker', daemon=True).start()
+    original_shutdown = server.shutdown
+
+    def shutdown():
+        state['stop'].set()
+        original_shutdown()
+        server.server_close()
+
+    server.shutdown = shutdown
+    return server, state
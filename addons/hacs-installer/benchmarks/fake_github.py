@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""Local stand-in for the GitHub release API and asset download.
+
+Serves /repos/<repo>/releases/latest and /download/hacs.zip for a
+generated HACS-like archive, with HTTP Range support, plus the web
+redirect /<repo>/releases/latest/download/hacs.zip to
+/<repo>/releases/download/<version>/hacs.zip. Knobs (attributes
+of the server's `state` dict, changed between runs):
+
+- cut_after: close the connection after this many body bytes
+- corrupt: serve a different body than the published digest
+- offline: answer every request with 503
+- no_digest: omit the asset digest, as older GitHub responses do
+- no_range: ignore Range and always send the full body
+- rate_limited: answer the API with 403, as GitHub does once the 60
+  unauthenticated requests per hour are used up, unless the request
+  carries `token`
+
+Usage as a module: server, state = start(port); ... server.shutdown()
+"""
+import hashlib
+import io
+import json
+import threading
+import zipfile
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def build_archive(version, files=200, size=2048):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr('__init__.py', f'VERSION = "{version}"\n')
+        archive.writestr('manifest.json', json.dumps({'domain': 'hacs', 'version': version}))
+        for i in range(files):
+            # Incompressible-ish payload so the archive has a realistic size
+            payload = hashlib.sha256(f'{version}-{i}'.encode()).hexdigest() * (size // 64)
+            archive.writestr(f'frontend/chunk_{i}.js', payload)
+    return buffer.getvalue()
+
+
+def start(port, version='2.0.1'):
+    body = build_archive(version)
+    state = {
+        'version': version,
+        'body': body,
+        'cut_after': None,
+        'corrupt': False,
+        'offline': False,
+        'no_digest': False,
+        'no_range': False,
+        'rate_limited': False,
+        'token': None,
+        'requests': [],
+        'bytes_sent': 0,
+    }
+
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def _json(self, data):
+            payload = json.dumps(data).encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def _redirect(self):
+            repo = self.path[:-len('/releases/latest/download/hacs.zip')]
+            self.send_response(302)
+            self.send_header('Location', f"{repo}/releases/download/{state['version']}/hacs.zip")
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+
+        def do_HEAD(self):
+            # Only the latest-release redirect is looked up with HEAD
+            state['requests'].append((self.path, None))
+            if state['offline']:
+                self.send_error(503)
+            elif self.path.endswith('/releases/latest/download/hacs.zip'):
+                self._redirect()
+            else:
+                self.send_error(405)
+
+        def do_GET(self):
+            state['requests'].append((self.path, self.headers.get('Range')))
+            if state['offline']:
+                self.send_error(503)
+                return
+            if self.path.startswith('/repos/') and state['rate_limited'] \
+                    and self.headers.get('Authorization') != f"Bearer {state['token']}":
+                self.send_response(403)
+                self.send_header('X-RateLimit-Remaining', '0')
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+            if self.path.endswith('/releases/latest'):
+                asset = {
+                    'name': 'hacs.zip',
+                    'size': len(state['body']),
+                    'browser_download_url': f'http://127.0.0.1:{port}/download/hacs.zip',
+                }
+                if not state['no_digest']:
+                    asset['digest'] = 'sha256:' + hashlib.sha256(state['body']).hexdigest()
+                self._json({'tag_name': state['version'], 'assets': [asset]})
+                return
+            if self.path == '/download/hacs.zip' or self.path.endswith(f"/releases/download/{state['version']}/hacs.zip"):
+                self._send_asset()
+                return
+            self.send_error(404)
+
+        def _send_asset(self):
+            body = state['body']
+            if state['corrupt']:
+                body = body[:len(body) // 2] + bytes(len(body) - len(body) // 2)
+            start_at = 0
+            range_header = self.headers.get('Range')
+            if range_header and not state['no_range']:
+                start_at = int(range_header.split('=')[1].split('-')[0])
+                if start_at >= len(body):
+                    self.send_response(416)
+                    self.send_header('Content-Length', '0')
+                    self.end_headers()
+                    return
+                self.send_response(206)
+                self.send_header('Content-Range', f'bytes {start_at}-{len(body) - 1}/{len(body)}')
+            else:
+                self.send_response(200)
+            chunk = body[start_at:]
+            self.send_header('Content-Length', str(len(chunk)))
+            self.end_headers()
+            if state['cut_after'] is not None:
+                chunk = chunk[:state['cut_after']]
+            self.wfile.write(chunk)
+            state['bytes_sent'] += len(chunk)
+            if state['cut_after'] is not None:
+                self.close_connection = True
+
+    server = ThreadingHTTPServer(('127.0.0.1', port), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, state
@@ -4,4 +4,8 @@ set -e
 echo "Starting HACS Installer..."
 
 # 启动 Web 服务
-exec python3 /app/web/app.py
+# production: gunicorn 多线程模式；development: Flask 开发服务器
+if [ "${WEB_SERVER:-production}" = "development" ]; then
+    exec python3 /app/web/app.py
+fi
+exec gunicorn --config /app/web/gunicorn.conf.py --chdir /app/web app:app
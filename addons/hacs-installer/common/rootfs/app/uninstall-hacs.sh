@@ -10,6 +10,8 @@ NC='\033[0m'
 log_info() { echo -e "${GREEN}[INFO] $1${NC}"; }
 log_warn() { echo -e "${YELLOW}[WARN] $1${NC}"; }
 log_error() { echo -e "${RED}[ERROR] $1${NC}"; }
+# 步骤标记，Web 界面据此显示当前步骤和耗时
+step() { echo "::step:: $1"; }
 
 HA_CONFIG_PATH="${HA_CONFIG_PATH:-/homeassistant}"
 CUSTOM_COMPONENTS_DIR="$HA_CONFIG_PATH/custom_components"
@@ -18,6 +20,8 @@ HACS_DIR="$CUSTOM_COMPONENTS_DIR/hacs"
 log_info "Starting HACS uninstallation process..."
 log_info "Home Assistant config directory: $HA_CONFIG_PATH"
 
+step check
+
 # 1. 检查配置目录是否存在
 if [ ! -d "$HA_CONFIG_PATH" ]; then
     log_error "Home Assistant config directory not found: $HA_CONFIG_PATH"
@@ -31,6 +35,7 @@ if [ ! -d "$HACS_DIR" ]; then
 fi
 
 # 3. 执行卸载
+step remove
 log_info "Removing HACS directory..."
 if rm -rf "$HACS_DIR"; then
     log_info "HACS directory removed."
@@ -1,10 +1,16 @@
-from flask import Flask, render_template, jsonify
+from flask import Flask, Response, render_template, jsonify, request, stream_with_context
 import os
 import subprocess
 import threading
 import time
 import re
-import docker
+
+import artifacts
+import audit
+import ha_container
+import http_cache
+import jobs
+import progress
 
 app = Flask(__name__)
 
@@ -12,20 +18,16 @@ HA_CONFIG_PATH = os.environ.get('HA_CONFIG_PATH', '/homeassistant')
 CUSTOM_COMPONENTS_DIR = os.path.join(HA_CONFIG_PATH, 'custom_components')
 HACS_DIR = os.path.join(CUSTOM_COMPONENTS_DIR, 'hacs')
 
-# operation_status: idle, starting, running, success, error
-operation_state = {
-    'status': 'idle',
-    'message': '',
-    'operation': None,  # 'Install' or 'Uninstall'
-    'detail': '',
-    'operation_id': None,
-    'started_at': None,
-    'finished_at': None,
-}
+# 任务和进度长轮询 ?wait= 的上限（秒）
+MAX_WAIT = 30
+# 安装/卸载脚本输出的步骤标记前缀
+STEP_MARKER = '::step::'
 
 ansi_escape = re.compile(r'\x1B\[[0-?]*[ -/]*[@-~]')
-state_lock = threading.Lock()
-operation_counter = 0
+server_state = {
+    'draining': False,
+    'warmed_up': False,
+}
 
 
 def clean_output(text):
@@ -40,12 +42,18 @@ def humanize_failure(operation_name, detail):
     if operation_name == 'Install':
         if 'unable to connect to github' in detail_lower or 'could not resolve host' in detail_lower or 'failed to connect' in detail_lower:
             return 'Install failed: unable to reach GitHub. Please check network or proxy settings.'
+        if 'release lookup failed' in detail_lower:
+            return 'Install failed: GitHub did not return the latest HACS release. Please try again later.'
+        if 'checksum mismatch' in detail_lower:
+            return 'Install failed: downloaded package did not match the published checksum.'
         if 'download failed' in detail_lower or 'downloaded file is empty' in detail_lower:
             return 'Install failed: HACS package download did not complete successfully.'
         if 'config directory not found' in detail_lower or 'unable to create or access config directory' in detail_lower:
             return 'Install failed: Home Assistant config path is unavailable. Please check the addon mount path.'
         if 'unzip failed' in detail_lower or 'cannot find or open' in detail_lower:
             return 'Install failed: downloaded package could not be extracted.'
+        if 'permission denied' in detail_lower or 'unable to create custom_components' in detail_lower:
+            return 'Install failed: unable to write HACS files. Please check file permissions.'
 
     if operation_name == 'Uninstall':
         if 'config directory not found' in detail_lower:
@@ -56,127 +64,68 @@ def humanize_failure(operation_name, detail):
     return f'{operation_name} failed'
 
 
-def update_operation_state(operation_id=None, **kwargs):
-    with state_lock:
-        if operation_id is not None and operation_state.get('operation_id') != operation_id:
-            return False
-        operation_state.update(kwargs)
-        return True
+def check_hacs_installed():
+    return os.path.exists(os.path.join(HACS_DIR, '__init__.py'))
 
 
-def get_operation_state():
-    with state_lock:
-        return dict(operation_state)
+class OperationFailed(Exception):
+    pass
 
 
-def reserve_operation(operation_name, message):
-    global operation_counter
+def run_script(script_path, log, step):
+    """执行脚本，逐行转发输出；脚本中的 "::step:: <name>" 标记步骤"""
+    # 合并 stderr，逐行读取，避免整个日志缓存在内存中
+    process = subprocess.Popen(
+        ['/bin/bash', script_path],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        text=True,
+        bufsize=1,
+    )
+    for raw_line in process.stdout:
+        line = clean_output(raw_line)
+        if line.startswith(STEP_MARKER):
+            step(line[len(STEP_MARKER):].strip())
+        elif line:
+            log(line)
+    if process.wait() != 0:
+        raise OperationFailed(f'Exit code: {process.returncode}')
 
-    with state_lock:
-        if operation_state['status'] in {'starting', 'running'}:
-            return None
 
-        operation_counter += 1
-        operation_id = operation_counter
-        operation_state.update({
-            'status': 'starting',
-            'message': message,
-            'operation': operation_name,
-            'detail': '',
-            'operation_id': operation_id,
-            'started_at': int(time.time()),
-            'finished_at': None,
-        })
-        return operation_id
+def install_hacs(log, step):
+    artifacts.install(HACS_DIR, log, step)
 
 
-def check_hacs_installed():
-    return os.path.exists(os.path.join(HACS_DIR, '__init__.py'))
+def uninstall_hacs(log, step):
+    run_script('/app/uninstall-hacs.sh', log, step)
 
 
-def find_ha_container():
-    """自动识别 Home Assistant 容器。
-    
-    查找优先级：
-    1. 容器名完全匹配 'homeassistant'
-    2. 带有 io.hass.type=homeassistant 标签的容器
-    3. 容器名包含 'homeassistant' 的容器
-    """
-    try:
-        client = docker.from_env()
-        containers = client.containers.list(all=True)
-        
-        # 优先级1：容器名完全匹配
-        for container in containers:
-            if container.name == 'homeassistant':
-                return container, None
-        
-        # 优先级2：通过标签匹配
-        for container in containers:
-            labels = container.labels or {}
-            if labels.get('io.hass.type') == 'homeassistant':
-                return container, None
-        
-        # 优先级3：容器名包含 homeassistant
-        for container in containers:
-            if 'homeassistant' in container.name.lower():
-                return container, None
-        
-        return None, "找不到包含 homeassistant 名称的容器"
-    except Exception as e:
-        print(f"查找 HA 容器时出错: {e}")
-        return None, str(e)
-
-
-def run_script_thread(script_path, operation_name, success_msg, operation_id):
-    update_operation_state(
-        operation_id=operation_id,
-        status='running',
-        operation=operation_name,
-        message=f'Executing {operation_name}...',
-        detail='',
-        finished_at=None,
-    )
+jobs.register('install', 'Install', install_hacs,
+              'HACS files installed. Restart Home Assistant, then add the HACS integration in Home Assistant.',
+              resource='hacs', describe_failure=humanize_failure,
+              expected=(OperationFailed, artifacts.ArtifactError))
+jobs.register('uninstall', 'Uninstall', uninstall_hacs,
+              'HACS files removed. Please restart Home Assistant to clear the integration from runtime.',
+              resource='hacs', describe_failure=humanize_failure, expected=(OperationFailed,))
+jobs.register('restart', 'Restart', ha_container.restart, 'Home Assistant restarted.',
+              resource='homeassistant', expected=(ha_container.RestartError,))
 
+
+def submit_job(kind, started_msg):
+    """提交任务；同类任务已在排队时返回该任务"""
+    # 客户端从这个序号之后订阅进度事件
+    progress_seq = progress.last_seq()
     try:
-        process = subprocess.Popen(
-            ['/bin/bash', script_path],
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True,
-        )
-        stdout, stderr = process.communicate()
-
-        stdout = clean_output(stdout)
-        stderr = clean_output(stderr)
-        detail = '\n'.join(part for part in [stdout, stderr] if part).strip()
-
-        if process.returncode == 0:
-            update_operation_state(
-                operation_id=operation_id,
-                status='success',
-                message=success_msg,
-                detail='',
-                finished_at=int(time.time()),
-            )
-        else:
-            error_detail = detail or f'Exit code: {process.returncode}'
-            update_operation_state(
-                operation_id=operation_id,
-                status='error',
-                message=humanize_failure(operation_name, error_detail),
-                detail=error_detail,
-                finished_at=int(time.time()),
-            )
-
-    except Exception as e:
-        update_operation_state(
-            operation_id=operation_id,
-            status='error',
-            message=f'Error occurred during {operation_name}',
-            detail=str(e),
-            finished_at=int(time.time()),
-        )
+        job, created = jobs.submit(kind)
+    except jobs.QueueClosed as e:
+        return jsonify({'status': 'error', 'message': str(e)})
+    return jsonify({
+        'status': 'success',
+        'message': started_msg if created else f"{job['operation']} already queued",
+        'operation_id': job['operation_id'],
+        'deduplicated': not created,
+        'progress_seq': progress_seq,
+    })
 
 
 @app.route('/')
@@ -192,93 +141,186 @@ def index():
 
 @app.route('/api/install', methods=['POST'])
 def install():
-    operation_id = reserve_operation('Install', 'Preparing installation...')
-    if operation_id is None:
-        return jsonify({'status': 'error', 'message': 'Task already in progress'})
-
-    try:
-        thread = threading.Thread(
-            target=run_script_thread,
-            args=(
-                '/app/install-hacs.sh',
-                'Install',
-                'HACS files installed. Restart Home Assistant, then add the HACS integration in Home Assistant.',
-                operation_id,
-            ),
-            daemon=True,
-        )
-        thread.start()
-    except Exception as e:
-        update_operation_state(
-            operation_id=operation_id,
-            status='error',
-            message='Failed to start installation',
-            detail=str(e),
-            finished_at=int(time.time()),
-        )
-        return jsonify({'status': 'error', 'message': 'Failed to start installation'})
-
-    return jsonify({
-        'status': 'success',
-        'message': 'Installation started',
-        'operation_id': operation_id,
-    })
+    return submit_job('install', 'Installation started')
 
 
 @app.route('/api/uninstall', methods=['POST'])
 def uninstall():
-    operation_id = reserve_operation('Uninstall', 'Preparing uninstallation...')
-    if operation_id is None:
-        return jsonify({'status': 'error', 'message': 'Task already in progress'})
+    return submit_job('uninstall', 'Uninstallation started')
+
+
+@app.route('/api/restart_ha', methods=['POST'])
+def restart_ha():
+    """在后台重启 Home Assistant 容器，直到 HA API 恢复"""
+    return submit_job('restart', 'Restart started')
+
+
+@app.route('/api/operations')
+def list_operations():
+    """最近的任务（新的在前），包括排队中的任务"""
+    limit = request.args.get('limit', jobs.JOB_HISTORY, type=int)
+    return jsonify({'operations': jobs.history(limit), 'busy': jobs.is_busy()})
 
+
+@app.route('/api/operations/<int:operation_id>')
+def get_operation(operation_id):
+    """查询任务；带 wait=N 时长轮询，直到任务结束或超时"""
+    wait = min(request.args.get('wait', 0, type=float), MAX_WAIT)
+    deadline = time.time() + wait
+    snapshot = jobs.snapshot()
+    job = snapshot['jobs'].get(operation_id)
+    while job is not None and job['finished_at'] is None and time.time() < deadline:
+        snapshot = jobs.wait_for_change(snapshot['version'], deadline - time.time())
+        job = snapshot['jobs'].get(operation_id)
+    if job is None:
+        return jsonify({'error': 'Operation not found'}), 404
+    return jsonify(job)
+
+
+@app.route('/api/status')
+def status():
+    """最近一次安装/卸载任务的状态（不加锁的快照）
+
+    版本号为 operation_id 和任务最后一次变化时的快照版本号，任务没有变化时
+    If-None-Match 得到 304。
+    """
+    job, revision = jobs.latest(('install', 'uninstall'))
+    if job is None:
+        return http_cache.json_response('status', 'idle', {
+            'status': 'idle', 'message': '', 'operation': None, 'detail': '',
+            'operation_id': None, 'step': None, 'steps': [],
+            'started_at': None, 'finished_at': None})
+    return http_cache.json_response('status', f"{job['operation_id']}.{revision}", job)
+
+
+@app.route('/api/audit')
+def get_audit_log():
+    """流式返回审计记录（JSON Lines，旧的在前）
+
+    过滤条件：?type=（可重复或以逗号分隔）、?since= 和 ?until=（Unix 秒）、
+    ?outcome=success|error|cancelled、?limit=N。
+    """
+    types = {t for value in request.args.getlist('type') for t in value.split(',') if t}
     try:
-        thread = threading.Thread(
-            target=run_script_thread,
-            args=(
-                '/app/uninstall-hacs.sh',
-                'Uninstall',
-                'HACS files removed. Please restart Home Assistant to clear the integration from runtime.',
-                operation_id,
-            ),
-            daemon=True,
-        )
-        thread.start()
-    except Exception as e:
-        update_operation_state(
-            operation_id=operation_id,
-            status='error',
-            message='Failed to start uninstallation',
-            detail=str(e),
-            finished_at=int(time.time()),
-        )
-        return jsonify({'status': 'error', 'message': 'Failed to start uninstallation'})
+        since, until = time_arg('since'), time_arg('until')
+    except ValueError:
+        return jsonify({'error': 'since and until must be Unix timestamps'}), 400
+    records = audit.query(types=types or None, since=since, until=until,
+                          outcome=request.args.get('outcome') or None,
+                          limit=request.args.get('limit', type=int))
+    return Response(stream_with_context(records), mimetype='application/x-ndjson')
 
-    return jsonify({
-        'status': 'success',
-        'message': 'Uninstallation started',
-        'operation_id': operation_id,
-    })
 
+def time_arg(name):
+    # 与 args.get(type=float) 不同，无效的值返回错误而不是忽略过滤条件
+    value = request.args.get(name)
+    return float(value) if value else None
 
-@app.route('/api/restart_ha', methods=['POST'])
-def restart_ha():
-    """重启 Home Assistant 容器"""
+
+@app.route('/api/audit/stats')
+def get_audit_stats():
+    """审计日志状态：各文件大小、已写入/等待写入/丢弃的记录数"""
+    return jsonify(audit.stats())
+
+
+@app.route('/api/progress')
+def progress_poll():
+    """长轮询进度事件：返回序号大于 since 的事件，没有时最多等待 wait 秒"""
+    since = request.args.get('since', 0, type=int)
+    wait = min(request.args.get('wait', 0, type=float), MAX_WAIT)
+    return jsonify({'events': progress.since(since, wait), 'last_seq': progress.last_seq()})
+
+
+@app.route('/api/progress/stream')
+def progress_stream():
+    """SSE 进度事件；重连时从 Last-Event-ID（或 ?since=）之后继续
+
+    跟随 ?operation_id= 指定的任务（默认为最近提交的任务），该任务结束后
+    流随之结束；任务已结束且没有错过的事件时返回 204，EventSource 不再重连。
+    同时打开的流达到 progress.MAX_SUBSCRIBERS 个时返回 503。
+    """
+    if server_state['draining']:
+        return jsonify({'error': 'Server is shutting down'}), 503
+    since = request.headers.get('Last-Event-ID', type=int)
+    if since is None:
+        since = request.args.get('since', progress.last_seq(), type=int)
+    operation_id = request.args.get('operation_id', type=int)
+    if operation_id is None:
+        job, _ = jobs.latest()
+        operation_id = job and job['operation_id']
+
+    def finished():
+        job = jobs.get(operation_id) if operation_id is not None else None
+        return job is None or job['finished_at'] is not None
+
+    if finished() and not progress.since(since):
+        return '', 204
+    if not progress.subscribe():
+        # 每个流占用一个服务线程，其余线程留给其他接口
+        response = jsonify({'error': f'Too many progress streams open (at most {progress.MAX_SUBSCRIBERS})'})
+        response.headers['Retry-After'] = str(progress.RETRY_AFTER)
+        return response, 503
+    response = Response(stream_with_context(progress.stream(since, operation_id, finished)),
+                        mimetype='text/event-stream')
+    # 客户端断开或流结束时释放名额（生成器未开始时也会调用）
+    response.call_on_close(progress.unsubscribe)
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+@app.route('/healthz')
+def liveness():
+    """存活检查：进程正在处理请求"""
+    return jsonify({'status': 'ok'})
+
+
+@app.route('/readyz')
+def readiness():
+    """就绪检查：未在停止中，且 Home Assistant 配置目录已挂载"""
+    if server_state['draining']:
+        return jsonify({'status': 'draining'}), 503
+    if not os.path.isdir(HA_CONFIG_PATH):
+        return jsonify({'status': 'unavailable', 'error': f'{HA_CONFIG_PATH} is not mounted'}), 503
+    return jsonify({'status': 'ready', 'warmed_up': server_state['warmed_up']})
+
+
+def begin_shutdown():
+    """停止接受新任务并结束进度事件流"""
+    server_state['draining'] = True
+    progress.close()
+
+
+def warm_up():
+    """预热：编译首页模板，导入 docker SDK 并查找 HA 容器（同时启动事件监听）"""
     try:
-        container, error_msg = find_ha_container()
+        app.jinja_env.get_template('index.html')
+        container, error_msg = ha_container.find_ha_container()
         if container is None:
-            return jsonify({'status': 'error', 'message': f'Unable to find Home Assistant container: {error_msg}'})
-        
-        container_name = container.name
-        container.restart(timeout=30)
-        return jsonify({'status': 'success', 'message': f'Home Assistant ({container_name}) is restarting. After it comes back, add HACS from Settings > Devices & services > Add integration.'})
-    except Exception as e:
-        return jsonify({'status': 'error', 'message': f'Restart failed: {str(e)}'})
+            print(f"预热时未找到 HA 容器: {error_msg}")
+    finally:
+        server_state['warmed_up'] = True
 
 
-@app.route('/api/status')
-def status():
-    return jsonify(get_operation_state())
+def start_background():
+    """启动任务工作线程和后台预热；每个服务进程调用一次"""
+    jobs.start()
+    # 此时端口已在监听，预热不阻塞请求
+    threading.Thread(target=warm_up, name='warm-up', daemon=True).start()
+
+
+def shutdown(timeout=30):
+    """停止接受新任务，取消排队中的任务，并等待正在进行的任务完成"""
+    begin_shutdown()
+    finished = jobs.shutdown(timeout)
+    audit.flush()
+    if not finished:
+        print("Shutdown timeout reached with an operation still running")
+        return False
+    return True
+
 
 if __name__ == '__main__':
+    # 开发服务器；生产模式由 gunicorn 启动（见 gunicorn.conf.py）
+    start_background()
     # 端口改为 8202
-    app.run(host='0.0.0.0', port=8202)
+    app.run(host='0.0.0.0', port=int(os.environ.get('WEB_PORT', '8202')))
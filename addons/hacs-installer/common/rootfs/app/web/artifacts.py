@@ -0,0 +1,319 @@
+"""HACS 发布包的本地缓存、断点续传和原子替换。
+
+缓存目录结构（HACS_CACHE_DIR，默认在 /data 卷中）：
+
+    index.json            版本 -> {sha256, size, url}
+    blobs/<sha256>.zip    按内容寻址的发布包
+    partial/<version>.part 未下载完的文件，下次用 HTTP Range 续传
+
+查询最新版本使用 GitHub API（设置 GITHUB_TOKEN 时带上令牌）。未认证的 API
+每个 IP 每小时只能请求 60 次，被限流（403/429）时改为读取
+releases/latest/download 重定向中的版本号，此时没有摘要和大小可供校验，
+只检查 zip 完整性。
+
+安装流程：查询最新版本（GitHub 不可达时退回到缓存中最新的版本）→ 命中
+缓存或下载 → 校验大小、SHA-256 和 zip 完整性 → 解压到 custom_components
+下的临时目录 → 用同一文件系统上的 rename 换入。旧版本在新包校验并解压
+成功之前不会被改动，失败时保持原样。
+"""
+import hashlib
+import http.client
+import json
+import os
+import shutil
+import time
+import re
+import urllib.error
+import urllib.parse
+import urllib.request
+import zipfile
+
+GITHUB_API_URL = os.environ.get('GITHUB_API_URL', 'https://api.github.com')
+GITHUB_URL = os.environ.get('GITHUB_URL', 'https://github.com')
+GITHUB_TOKEN = os.environ.get('GITHUB_TOKEN', '')
+HACS_REPO = os.environ.get('HACS_REPO', 'hacs/integration')
+ASSET_NAME = 'hacs.zip'
+CACHE_DIR = os.environ.get('HACS_CACHE_DIR', '/data/hacs-cache')
+# 缓存中保留的版本数
+CACHE_KEEP = 3
+CHUNK_SIZE = 64 * 1024
+REQUEST_TIMEOUT = 30
+# API 拒绝请求（令牌无效、限流）时改用重定向查询版本
+API_FALLBACK_STATUSES = (401, 403, 429)
+
+
+class ArtifactError(Exception):
+    pass
+
+
+def _path(*parts):
+    return os.path.join(CACHE_DIR, *parts)
+
+
+def load_index():
+    try:
+        with open(_path('index.json')) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_index(index):
+    tmp = _path('index.json.tmp')
+    with open(tmp, 'w') as f:
+        json.dump(index, f, indent=2, sort_keys=True)
+    os.replace(tmp, _path('index.json'))
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+def _latest_from_redirect():
+    """从 releases/latest/download 的重定向地址中得到最新版本。"""
+    url = f'{GITHUB_URL}/{HACS_REPO}/releases/latest/download/{ASSET_NAME}'
+    opener = urllib.request.build_opener(_NoRedirect)
+    try:
+        with opener.open(urllib.request.Request(url, method='HEAD'), timeout=REQUEST_TIMEOUT) as response:
+            raise ArtifactError(f'Release lookup failed: expected a redirect, got HTTP {response.status}')
+    except urllib.error.HTTPError as e:
+        location = e.headers.get('Location') if 300 <= e.code < 400 else None
+        if not location:
+            raise ArtifactError(f'Release lookup failed: HTTP {e.code}')
+    except (OSError, http.client.HTTPException) as e:
+        raise ArtifactError(f'Unable to connect to GitHub: {e}')
+
+    location = urllib.parse.urljoin(url, location)
+    match = re.search(r'/releases/download/([^/]+)/', urllib.parse.urlparse(location).path)
+    if not match:
+        raise ArtifactError(f'Release lookup failed: unexpected redirect to {location}')
+    return {'version': urllib.parse.unquote(match.group(1)), 'url': location, 'sha256': None, 'size': None}
+
+
+def latest_release():
+    """返回 {'version', 'url', 'sha256', 'size'}；GitHub 提供 digest 时 sha256 非空。"""
+    headers = {'Accept': 'application/vnd.github+json'}
+    if GITHUB_TOKEN:
+        headers['Authorization'] = f'Bearer {GITHUB_TOKEN}'
+    request = urllib.request.Request(f'{GITHUB_API_URL}/repos/{HACS_REPO}/releases/latest', headers=headers)
+    try:
+        with urllib.request.urlopen(request, timeout=REQUEST_TIMEOUT) as response:
+            release = json.load(response)
+    except urllib.error.HTTPError as e:
+        if e.code in API_FALLBACK_STATUSES:
+            return _latest_from_redirect()
+        raise ArtifactError(f'Release lookup failed: HTTP {e.code}')
+    except ValueError as e:
+        raise ArtifactError(f'Release lookup failed: invalid response ({e})')
+    except (OSError, http.client.HTTPException) as e:
+        raise ArtifactError(f'Unable to connect to GitHub: {e}')
+
+    for asset in release.get('assets', []):
+        if asset.get('name') == ASSET_NAME:
+            digest = asset.get('digest') or ''
+            return {
+                'version': release.get('tag_name', ''),
+                'url': asset['browser_download_url'],
+                'sha256': digest[len('sha256:'):] if digest.startswith('sha256:') else None,
+                'size': asset.get('size'),
+            }
+    raise ArtifactError(f'Download failed: release {release.get("tag_name")} has no {ASSET_NAME}')
+
+
+def newest_cached():
+    """缓存中最近下载的版本，没有时返回 None。"""
+    index = load_index()
+    if not index:
+        return None
+    version = max(index, key=lambda v: index[v].get('cached_at', 0))
+    return dict(index[version], version=version)
+
+
+def _download(release, log):
+    """下载到 partial/<version>.part，已有部分时用 Range 续传。"""
+    part = _path('partial', f"{release['version']}.part")
+    offset = os.path.getsize(part) if os.path.exists(part) else 0
+    headers = {'Range': f'bytes={offset}-'} if offset else {}
+    if offset:
+        log(f'Resuming download at {offset} bytes')
+
+    request = urllib.request.Request(release['url'], headers=headers)
+    try:
+        with urllib.request.urlopen(request, timeout=REQUEST_TIMEOUT) as response:
+            # 206 续传；200 表示服务器不支持 Range，从头下载
+            mode = 'ab' if response.status == 206 else 'wb'
+            expected = int(response.headers.get('Content-Length') or -1)
+            received = 0
+            with open(part, mode) as f:
+                # read() 返回已到达的数据，连接中断前收到的部分都会写入
+                for chunk in iter(lambda: response.read(CHUNK_SIZE), b''):
+                    f.write(chunk)
+                    received += len(chunk)
+            if 0 <= received < expected:
+                # 保留已下载的部分，下次续传
+                raise ArtifactError(f'Download failed: connection closed after {received} of {expected} bytes')
+    except urllib.error.HTTPError as e:
+        if e.code != 416:
+            raise ArtifactError(f'Download failed: HTTP {e.code}')
+        if offset == release.get('size'):
+            # 上次已下载完整，只是还没有校验
+            return part
+        os.remove(part)
+        raise ArtifactError('Download failed: partial file does not match the release')
+    except (OSError, http.client.HTTPException) as e:
+        # 保留已下载的部分，下次续传
+        raise ArtifactError(f'Download failed: {e}')
+    return part
+
+
+def verify_archive(path, sha256=None, size=None):
+    """校验大小、SHA-256 和 zip 内容，返回实际的 SHA-256。"""
+    actual_size = os.path.getsize(path)
+    if actual_size == 0:
+        raise ArtifactError('Downloaded file is empty')
+    if size is not None and actual_size != size:
+        raise ArtifactError(f'Download failed: expected {size} bytes, got {actual_size}')
+    actual = file_sha256(path)
+    if sha256 and actual != sha256:
+        raise ArtifactError(f'Download failed: checksum mismatch (expected {sha256}, got {actual})')
+    try:
+        with zipfile.ZipFile(path) as archive:
+            bad = archive.testzip()
+            if bad is not None:
+                raise ArtifactError(f'Unzip failed: corrupted member {bad}')
+            if '__init__.py' not in archive.namelist():
+                raise ArtifactError('Unzip failed: HACS core files were not found in the package')
+    except zipfile.BadZipFile as e:
+        raise ArtifactError(f'Unzip failed: {e}')
+    return actual
+
+
+def fetch(release, log):
+    """返回 (缓存文件路径, SHA-256, 是否刚下载并校验过)，必要时下载。
+
+    新下载的文件在放入缓存前已由 verify_archive() 校验；命中缓存的文件
+    由调用方再校验一次，以发现磁盘上的损坏。
+    """
+    for directory in ('blobs', 'partial'):
+        os.makedirs(_path(directory), exist_ok=True)
+    index = load_index()
+
+    entry = index.get(release['version'])
+    if entry and (not release.get('sha256') or entry['sha256'] == release['sha256']):
+        blob = _path('blobs', f"{entry['sha256']}.zip")
+        if os.path.exists(blob):
+            log(f"Using cached {release['version']} ({entry['sha256'][:12]})")
+            return blob, entry['sha256'], False
+
+    if not release.get('url'):
+        raise ArtifactError(f"Download failed: {release['version']} is not cached")
+
+    log(f"Downloading HACS {release['version']}...")
+    part = _download(release, log)
+    try:
+        sha256 = verify_archive(part, release.get('sha256'), release.get('size'))
+    except ArtifactError:
+        # 内容有误，续传没有意义
+        os.remove(part)
+        raise
+
+    blob = _path('blobs', f'{sha256}.zip')
+    os.replace(part, blob)
+    index[release['version']] = {
+        'sha256': sha256,
+        'size': os.path.getsize(blob),
+        'url': release['url'],
+        'cached_at': time.time(),
+    }
+    _prune(index)
+    _save_index(index)
+    log('Download complete.')
+    return blob, sha256, True
+
+
+def _prune(index):
+    versions = sorted(index, key=lambda v: index[v].get('cached_at', 0), reverse=True)
+    for version in versions[CACHE_KEEP:]:
+        entry = index.pop(version)
+        if not any(e['sha256'] == entry['sha256'] for e in index.values()):
+            try:
+                os.remove(_path('blobs', f"{entry['sha256']}.zip"))
+            except OSError:
+                pass
+
+
+def swap_in(archive_path, target_dir):
+    """解压到 target_dir 旁边的临时目录，校验后用 rename 换入。"""
+    parent = os.path.dirname(target_dir)
+    name = os.path.basename(target_dir)
+    try:
+        os.makedirs(parent, exist_ok=True)
+    except OSError as e:
+        raise ArtifactError(f'Unable to create custom_components directory: {e}')
+
+    staging = os.path.join(parent, f'.{name}.new-{os.getpid()}')
+    backup = os.path.join(parent, f'.{name}.old-{os.getpid()}')
+    shutil.rmtree(staging, ignore_errors=True)
+    try:
+        with zipfile.ZipFile(archive_path) as archive:
+            archive.extractall(staging)
+        if not os.path.isfile(os.path.join(staging, '__init__.py')):
+            raise ArtifactError('Installation completed but HACS core files were not found')
+    except (OSError, zipfile.BadZipFile) as e:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise ArtifactError(f'Unzip failed: {e}')
+    except ArtifactError:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+
+    had_old = os.path.exists(target_dir)
+    try:
+        if had_old:
+            os.rename(target_dir, backup)
+        os.rename(staging, target_dir)
+    except OSError as e:
+        if had_old and not os.path.exists(target_dir) and os.path.exists(backup):
+            os.rename(backup, target_dir)
+        shutil.rmtree(staging, ignore_errors=True)
+        raise ArtifactError(f'Permission denied while replacing HACS directory: {e}')
+    shutil.rmtree(backup, ignore_errors=True)
+
+
+def install(target_dir, log, step):
+    """安装最新版 HACS 到 target_dir，返回安装的版本号。
+
+    log(line) 输出一行日志，step(name) 标记进入下一个步骤。
+    """
+    step('resolve')
+    try:
+        release = latest_release()
+        log(f"Latest HACS release: {release['version']}")
+    except ArtifactError as e:
+        cached = newest_cached()
+        if cached is None:
+            raise
+        log(f'[WARN] {e}')
+        log(f"Installing cached {cached['version']}")
+        release = {'version': cached['version'], 'url': None, 'sha256': cached['sha256'], 'size': cached['size']}
+
+    step('download')
+    path, sha256, verified = fetch(release, log)
+
+    step('verify')
+    if not verified:
+        verify_archive(path, sha256)
+    log(f'Verified {os.path.basename(path)}')
+
+    step('unzip')
+    swap_in(path, target_dir)
+    log(f"HACS {release['version']} installed successfully!")
+    return release['version']
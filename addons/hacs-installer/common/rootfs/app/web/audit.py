@@ -0,0 +1,225 @@
+"""只追加的审计日志：记录安装、卸载和重启 Home Assistant 任务。
+
+每个结束（或被取消）的任务在 AUDIT_LOG_PATH 中留下一行 JSON：结束时间
+（ts）和开始时间、类型（hacs.install 等）、参数、耗时、结果和错误信息、
+各步骤耗时，失败时附带输出的最后 DETAIL_LINES 行。参数中名字像密钥的字段
+和输出中的 token=/password= 等值会被替换为 ***。
+
+record() 只把记录放入内存中的批次，由写入线程每 AUDIT_LOG_FLUSH_INTERVAL
+秒，或积累 AUDIT_LOG_BATCH 条时一次写入文件。文件达到 AUDIT_LOG_MAX_BYTES
+时轮转为 <path>.1 … <path>.N（N = AUDIT_LOG_BACKUPS），最旧的文件被删除。
+磁盘跟不上时最多 MAX_PENDING 条记录等待写入，之后的记录被丢弃并计数。
+
+query() 按时间顺序逐行读取并过滤，时间范围之外的轮转文件直接跳过，
+不会把文件整个读入内存。AUDIT_LOG_PATH 为空时关闭审计日志。
+
+本模块复制自 network-manager 的同名模块，scripts/check_shared_modules.py
+中列出的部分须与其保持一致。
+"""
+import contextlib
+import json
+import os
+import re
+import threading
+import time
+
+PATH = os.environ.get('AUDIT_LOG_PATH', '/data/audit.jsonl')
+MAX_BYTES = int(os.environ.get('AUDIT_LOG_MAX_BYTES', str(5 * 1024 * 1024)))
+BACKUPS = int(os.environ.get('AUDIT_LOG_BACKUPS', '3'))
+FLUSH_INTERVAL = float(os.environ.get('AUDIT_LOG_FLUSH_INTERVAL', '1'))
+BATCH_SIZE = int(os.environ.get('AUDIT_LOG_BATCH', '100'))
+MAX_PENDING = 10000
+# 失败记录中保留的输出行数
+DETAIL_LINES = 20
+# 从文件末尾读取的字节数，用于找到最后一条记录
+TAIL_BYTES = 64 * 1024
+
+REDACTED = '***'
+SECRET_KEY_RE = re.compile(r'pass|psk|secret|token|credential', re.I)
+SECRET_TEXT_RE = re.compile(r'((?:token|password|secret|authorization)["\']?\s*[:=]\s*)(?:bearer\s+)?[^\s&"\']+',
+                            re.I)
+
+_lock = threading.Lock()
+_write_lock = threading.Lock()
+_wake = threading.Event()
+_pending = []
+_state = {
+    'started': False,
+    'size': None,
+}
+_stats = {
+    'written': 0,
+    'dropped': 0,
+    'rotations': 0,
+    'write_errors': 0,
+    'last_error': None,
+}
+
+
+def redact(value):
+    """返回 value 的副本，名字像密钥的字段的值被替换（None 保留）"""
+    if isinstance(value, dict):
+        return {k: REDACTED if SECRET_KEY_RE.search(str(k)) and value[k] not in (None, '') else redact(value[k])
+                for k in value}
+    if isinstance(value, (list, tuple)):
+        return [redact(v) for v in value]
+    return value
+
+
+def redact_text(text):
+    """替换文本中 token=、password: 等后面的值"""
+    return SECRET_TEXT_RE.sub(lambda m: m.group(1) + REDACTED, text) if text else text
+
+
+def record(op_type, params=None, outcome='success', duration=None, error=None, **fields):
+    """把一条记录交给写入线程；不做 I/O，不会阻塞"""
+    if not PATH:
+        return
+    entry = {'ts': round(time.time(), 3), 'type': op_type, 'outcome': outcome, 'duration': duration,
+             'params': redact(params or {}), 'error': redact_text(error)}
+    entry.update(fields)
+    with _lock:
+        if len(_pending) >= MAX_PENDING:
+            _stats['dropped'] += 1
+            return
+        _pending.append(entry)
+        full = len(_pending) >= BATCH_SIZE
+        if not _state['started']:
+            _state['started'] = True
+            threading.Thread(target=_writer, name='audit-writer', daemon=True).start()
+    if full:
+        _wake.set()
+
+
+def _files():
+    """日志文件，旧的在前"""
+    return [f'{PATH}.{i}' for i in range(BACKUPS, 0, -1)] + [PATH]
+
+
+def _rotate():
+    for i in range(BACKUPS - 1, 0, -1):
+        if os.path.exists(f'{PATH}.{i}'):
+            os.replace(f'{PATH}.{i}', f'{PATH}.{i + 1}')
+    if BACKUPS > 0:
+        os.replace(PATH, f'{PATH}.1')
+    else:
+        os.remove(PATH)
+    _state['size'] = 0
+    _stats['rotations'] += 1
+
+
+def flush():
+    """写入目前排队的全部记录"""
+    with _write_lock:
+        with _lock:
+            batch = _pending[:]
+            del _pending[:]
+        if not batch or not PATH:
+            return
+        data = ''.join(json.dumps(entry, separators=(',', ':'), ensure_ascii=False, default=str) + '\n'
+                       for entry in batch).encode()
+        try:
+            if _state['size'] is None:
+                os.makedirs(os.path.dirname(PATH) or '.', exist_ok=True)
+                _state['size'] = os.path.getsize(PATH) if os.path.exists(PATH) else 0
+            # 在批次之间轮转，一条记录不会被拆到两个文件中
+            if _state['size'] and _state['size'] + len(data) > MAX_BYTES:
+                _rotate()
+            with open(PATH, 'ab') as f:
+                f.write(data)
+            _state['size'] += len(data)
+            _stats['written'] += len(batch)
+        except OSError as e:
+            # 这一批记录丢失，下一批重新尝试
+            _state['size'] = None
+            _stats['write_errors'] += 1
+            _stats['dropped'] += len(batch)
+            if _stats['last_error'] != str(e):
+                print(f"写入审计日志失败: {e}")
+            _stats['last_error'] = str(e)
+
+
+def _writer():
+    while True:
+        _wake.wait(FLUSH_INTERVAL)
+        _wake.clear()
+        flush()
+
+
+def _ts(line):
+    try:
+        return json.loads(line)['ts']
+    except (ValueError, KeyError, TypeError):
+        return None
+
+
+def _time_span(f):
+    """已打开的日志文件中（第一条记录的 ts, 最后一条记录的 ts）"""
+    first = _ts(f.readline())
+    end = f.seek(0, os.SEEK_END)
+    f.seek(max(0, end - TAIL_BYTES))
+    lines = f.read().splitlines()
+    return first, _ts(lines[-1]) if lines else None
+
+
+def _matches(line, types, since, until, outcome):
+    try:
+        entry = json.loads(line)
+    except ValueError:
+        return False
+    ts = entry.get('ts', 0)
+    return ((not types or entry.get('type') in types)
+            and (since is None or ts >= since)
+            and (until is None or ts <= until)
+            and (not outcome or entry.get('outcome') == outcome))
+
+
+def query(types=None, since=None, until=None, outcome=None, limit=None):
+    """按时间顺序逐条返回匹配的记录（bytes，每行一条 JSON）
+
+    types 为记录类型的集合，since/until 为记录时间的范围（Unix 秒，包含
+    边界）。所有记录都在范围之外的轮转文件只读取第一行和最后一行。
+    """
+    if not PATH:
+        return
+    flush()
+    # 解析前先在原始行上做一次简单的匹配
+    needles = [json.dumps({'type': t}, separators=(',', ':'), ensure_ascii=False)[1:-1].encode()
+               for t in types] if types else None
+    # 没有过滤条件时原样返回，不解析
+    parse = bool(types or since is not None or until is not None or outcome)
+    count = 0
+    for path in _files():
+        try:
+            f = open(path, 'rb')
+        except FileNotFoundError:
+            continue
+        with f:
+            if since is not None or until is not None:
+                first, last = _time_span(f)
+                if since is not None and last is not None and last < since:
+                    continue
+                if until is not None and first is not None and first > until:
+                    # 之后的文件更新
+                    return
+                f.seek(0)
+            for line in f:
+                if needles and not any(needle in line for needle in needles):
+                    continue
+                if parse and not _matches(line, types, since, until, outcome):
+                    continue
+                yield line if line.endswith(b'\n') else line + b'\n'
+                count += 1
+                if limit is not None and count >= limit:
+                    return
+
+
+def stats():
+    with _lock:
+        pending = len(_pending)
+    sizes = {}
+    for path in _files():
+        with contextlib.suppress(OSError):
+            sizes[os.path.basename(path)] = os.path.getsize(path)
+    return dict(_stats, enabled=bool(PATH), path=PATH, max_bytes=MAX_BYTES, backups=BACKUPS,
+                pending=pending, files=sizes)
@@ -0,0 +1,38 @@
+"""gunicorn settings for the production serving mode (WEB_SERVER=production).
+
+One worker process with a thread per connection: the operation state
+lives in process memory, so it must not be split across workers.
+"""
+import os
+import signal
+
+bind = f"0.0.0.0:{os.environ.get('WEB_PORT', '8202')}"
+workers = 1
+worker_class = 'gthread'
+threads = int(os.environ.get('WEB_THREADS', '8'))
+# Keep idle browser/ingress connections open long enough to be reused
+keepalive = int(os.environ.get('WEB_KEEPALIVE', '5'))
+# Only bounds a stuck worker; long-polls return within 30s
+timeout = 120
+# Time given to a running install/uninstall after SIGTERM
+graceful_timeout = int(os.environ.get('WEB_GRACEFUL_TIMEOUT', '60'))
+errorlog = '-'
+
+
+def post_worker_init(worker):
+    from app import begin_shutdown, start_background
+    start_background()
+
+    handle_exit = worker.handle_exit
+
+    def on_term(sig, frame):
+        # Report not-ready and end SSE streams so the worker can drain
+        begin_shutdown()
+        handle_exit(sig, frame)
+
+    signal.signal(signal.SIGTERM, on_term)
+
+
+def worker_exit(server, worker):
+    from app import shutdown
+    shutdown(graceful_timeout)
@@ -0,0 +1,170 @@
+"""Home Assistant 容器的查找与异步重启。
+
+整个进程共用一个 Docker 客户端（复用其 HTTP 连接池）。找到的 HA 容器按
+ID 缓存，后台线程订阅 Docker 事件流，在该容器被删除/重命名、或出现新的
+候选容器时使缓存失效；事件流断开期间不使用缓存。查找使用 Docker API 的
+name/label 过滤，不再列出全部容器。
+
+restart() 作为任务队列中的任务执行，分步骤（locating、restarting、
+waiting_api）报告进度，直到 HA 的 HTTP API 重新响应为止。
+
+docker SDK（连同 requests/urllib3）在第一次用到时才导入，不计入服务
+启动时间；启动后由 app.warm_up() 在后台完成导入和第一次查找。
+"""
+import os
+import threading
+import time
+
+HA_API_URL = os.environ.get('HA_API_URL', 'http://127.0.0.1:8123/api/')
+# 等待 HA API 恢复的最长时间（秒）
+RESTART_TIMEOUT = int(os.environ.get('HA_RESTART_TIMEOUT', '300'))
+STOP_TIMEOUT = 30
+API_POLL_INTERVAL = 2
+EVENTS_RETRY_MAX_DELAY = 60
+
+# 查找优先级，每一级都由 Docker 服务端过滤
+LOOKUP_FILTERS = (
+    # 1. 容器名完全匹配 'homeassistant'
+    {'name': '^/?homeassistant$'},
+    # 2. 带有 io.hass.type=homeassistant 标签
+    {'label': 'io.hass.type=homeassistant'},
+    # 3. 容器名包含 homeassistant（不区分大小写）
+    {'name': '(?i)homeassistant'},
+)
+WATCHED_EVENTS = ('create', 'destroy', 'rename')
+
+
+class RestartError(Exception):
+    pass
+
+
+_lock = threading.Lock()
+_state = {
+    'client': None,
+    'container': None,  # {'id': ..., 'name': ...}
+    'watching': False,
+    'watcher_started': False,
+}
+
+
+def get_client():
+    """返回共用的 Docker 客户端，首次调用时创建并启动事件监听。"""
+    with _lock:
+        if _state['client'] is None:
+            import docker
+            _state['client'] = docker.from_env()
+        client = _state['client']
+        if not _state['watcher_started']:
+            _state['watcher_started'] = True
+            threading.Thread(target=_watch_events, name='docker-events', daemon=True).start()
+    return client
+
+
+def invalidate():
+    with _lock:
+        _state['container'] = None
+
+
+def _is_candidate(attributes):
+    return ('homeassistant' in attributes.get('name', '').lower()
+            or attributes.get('io.hass.type') == 'homeassistant')
+
+
+def _on_event(event):
+    actor = event.get('Actor') or {}
+    attributes = actor.get('Attributes') or {}
+    with _lock:
+        cached = _state['container']
+        if cached is None:
+            return
+        if actor.get('ID') == cached['id'] or _is_candidate(attributes):
+            _state['container'] = None
+
+
+def _watch_events():
+    delay = 1
+    while True:
+        try:
+            stream = get_client().events(decode=True, filters={
+                'type': 'container',
+                'event': list(WATCHED_EVENTS),
+            })
+            with _lock:
+                _state['watching'] = True
+            delay = 1
+            for event in stream:
+                _on_event(event)
+        except Exception as e:
+            print(f"Docker 事件流出错: {e}")
+        with _lock:
+            _state['watching'] = False
+            # 断开期间可能错过变化
+            _state['container'] = None
+        time.sleep(delay)
+        delay = min(delay * 2, EVENTS_RETRY_MAX_DELAY)
+
+
+def find_ha_container():
+    """返回 ({'id', 'name'}, None)，找不到时返回 (None, 错误信息)。"""
+    try:
+        client = get_client()
+        with _lock:
+            if _state['watching'] and _state['container'] is not None:
+                return dict(_state['container']), None
+
+        for filters in LOOKUP_FILTERS:
+            # sparse 避免为每个结果再 inspect 一次
+            found = client.containers.list(all=True, sparse=True, filters=filters)
+            if found:
+                # sparse 结果只有 Names 列表（带前导 /）
+                names = found[0].attrs.get('Names') or ['']
+                container = {'id': found[0].id, 'name': names[0].lstrip('/')}
+                with _lock:
+                    _state['container'] = container
+                return dict(container), None
+
+        return None, "找不到包含 homeassistant 名称的容器"
+    except Exception as e:
+        print(f"查找 HA 容器时出错: {e}")
+        return None, str(e)
+
+
+def _wait_for_api(deadline):
+    import requests
+    while time.time() < deadline:
+        try:
+            # 未带令牌时 HA 返回 401，任何非 5xx 响应都说明 API 已恢复
+            if requests.get(HA_API_URL, timeout=5).status_code < 500:
+                return True
+        except requests.RequestException:
+            pass
+        time.sleep(API_POLL_INTERVAL)
+    return False
+
+
+def restart(log, step):
+    """重启 HA 容器并等待其 API 恢复（在任务队列中执行），返回结果消息。"""
+    step('locating')
+    container, error_msg = find_ha_container()
+    if container is None:
+        raise RestartError(f'Unable to find Home Assistant container: {error_msg}')
+
+    import docker
+    step('restarting')
+    log(f"Restarting {container['name']}...")
+    try:
+        get_client().api.restart(container['id'], timeout=STOP_TIMEOUT)
+    except docker.errors.NotFound:
+        # 缓存的容器已不存在，重新查找一次
+        invalidate()
+        container, error_msg = find_ha_container()
+        if container is None:
+            raise RestartError(f'Unable to find Home Assistant container: {error_msg}')
+        get_client().api.restart(container['id'], timeout=STOP_TIMEOUT)
+
+    step('waiting_api')
+    log('Waiting for Home Assistant to come back...')
+    if not _wait_for_api(time.time() + RESTART_TIMEOUT):
+        raise RestartError(f'Home Assistant did not answer within {RESTART_TIMEOUT}s after restart')
+    return (f"Home Assistant ({container['name']}) is back online. "
+            "Add HACS from Settings > Devices & services > Add integration.")
@@ -0,0 +1,65 @@
+"""被轮询接口的条件响应和压缩。
+
+调用方为响应内容提供一个廉价的版本号（例如 operation_id 加上任务最后一次
+变化时的快照版本号）。序列化后的响应体按接口缓存，版本号不变时重复请求
+不再做 JSON 编码；版本号同时作为弱 ETag，If-None-Match 匹配时返回空的
+304。
+
+不小于 GZIP_MIN_SIZE 字节的响应体在客户端接受时以 gzip 压缩，压缩结果
+与原始响应体一起缓存。响应带 `Cache-Control: no-cache`，浏览器每次轮询
+都会重新验证，而不是使用过期的副本。
+
+本模块复制自 network-manager 的同名模块，scripts/check_shared_modules.py
+中列出的部分须与其保持一致。
+"""
+import gzip
+import os
+import threading
+
+from flask import Response, current_app, request
+
+GZIP_MIN_SIZE = int(os.environ.get('HTTP_GZIP_MIN_SIZE', '1024'))
+GZIP_LEVEL = 6
+
+# 版本号随进程重启从头开始，加上实例标识避免与上次运行的 ETag 相同
+_instance = os.urandom(4).hex()
+_lock = threading.Lock()
+_bodies = {}
+
+
+def _entry(key, version, payload):
+    with _lock:
+        entry = _bodies.get(key)
+    if entry is not None and entry['version'] == version:
+        return entry
+    entry = {'version': version, 'body': (current_app.json.dumps(payload) + '\n').encode(), 'gzip': None}
+    with _lock:
+        _bodies[key] = entry
+    return entry
+
+
+def _accepts_gzip():
+    return request.accept_encodings['gzip'] > 0
+
+
+def json_response(key, version, payload):
+    """与 jsonify(payload) 相同的响应，按 key 缓存，version 变化时才重新序列化"""
+    etag = f'{_instance}-{key}-{version}'
+    if request.if_none_match.contains_weak(etag):
+        response = Response(status=304)
+    else:
+        entry = _entry(key, version, payload)
+        body = entry['body']
+        compress = len(body) >= GZIP_MIN_SIZE and _accepts_gzip()
+        if compress:
+            if entry['gzip'] is None:
+                # mtime=0 使相同的响应体压缩结果也相同
+                entry['gzip'] = gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+            body = entry['gzip']
+        response = Response(body, mimetype=current_app.json.mimetype)
+        if compress:
+            response.headers['Content-Encoding'] = 'gzip'
+    response.set_etag(etag, weak=True)
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['Vary'] = 'Accept-Encoding'
+    return response
@@ -0,0 +1,300 @@
+"""安装/卸载/重启任务队列。
+
+每个资源（安装和卸载都操作 custom_components/hacs，重启操作 HA 容器）有
+自己的先进先出队列，由 HACS_WORKERS 个工作线程执行：空闲的工作线程取资源
+空闲的队列中最早提交的任务，不会为等待资源而占着线程，因此同一资源上的
+任务按提交顺序依次执行，不同资源的任务可以并行。提交的任务与该资源队列
+末尾（最近排队）的任务同类时直接返回已有任务，不会重复排队；之后又排了
+别的任务时（如卸载 → 安装 → 卸载）照常排队，最后一次操作不会丢失。
+
+任务记录保存在有界的历史中（JOB_HISTORY），按 operation_id 查询。写入方
+在锁内生成新的快照并整体替换引用，读取方直接读取当前快照而不加锁，频繁
+轮询 /api/status 不会和写入方争用锁。快照中的字典创建后不再修改。
+
+每个结束或被取消的任务写入一条审计日志（audit.py）。
+"""
+import os
+import threading
+import time
+from collections import deque
+
+import audit
+import progress
+
+WORKERS = int(os.environ.get('HACS_WORKERS', '2'))
+# 保留的已结束任务数
+JOB_HISTORY = 50
+
+
+class QueueClosed(Exception):
+    pass
+
+
+_lock = threading.Lock()
+_changed = threading.Condition(_lock)
+# 有任务可以开始执行，或正在停止
+_runnable = threading.Condition(_lock)
+_kinds = {}
+_queues = {}          # resource -> 排队中的任务 ID（先进先出）
+_busy = set()         # 有任务正在执行的资源
+_state = {
+    'counter': 0,
+    'closed': False,
+    'workers': [],
+}
+# 只读快照：{'version': n, 'jobs': {id: job}, 'revisions': {id: 任务最后一次变化时的 version}}，
+# 每次更新整体替换
+_snapshot = {'version': 0, 'jobs': {}, 'revisions': {}}
+
+
+def register(kind, operation, work, success_msg, resource, describe_failure=None, expected=()):
+    """注册任务类型。
+
+    work(log, step) 执行任务并可返回结果消息，失败时抛出异常。expected 中的
+    异常视为预期的失败，错误信息由 describe_failure(operation, detail) 生成，
+    未提供时使用异常信息。
+    """
+    _kinds[kind] = {
+        'operation': operation,
+        'work': work,
+        'success_msg': success_msg,
+        'resource': resource,
+        'describe_failure': describe_failure,
+        'expected': expected,
+    }
+    _queues.setdefault(resource, deque())
+
+
+def _publish(job_id, **changes):
+    """在锁内调用：生成包含更新后任务的新快照"""
+    global _snapshot
+    jobs = dict(_snapshot['jobs'])
+    job = dict(jobs[job_id], **changes)
+    if changes.get('finished_at') is not None and job['started_at'] is not None:
+        job['duration'] = round(job['finished_at'] - job['started_at'], 3)
+    jobs[job_id] = job
+
+    version = _snapshot['version'] + 1
+    revisions = dict(_snapshot['revisions'])
+    revisions[job_id] = version
+    finished = [i for i in sorted(jobs) if jobs[i]['finished_at'] is not None]
+    for old_id in finished[:-JOB_HISTORY]:
+        del jobs[old_id]
+        del revisions[old_id]
+
+    _snapshot = {'version': version, 'jobs': jobs, 'revisions': revisions}
+    _changed.notify_all()
+    return job
+
+
+def _update(job_id, **changes):
+    with _lock:
+        return _publish(job_id, **changes)
+
+
+def submit(kind):
+    """提交任务，返回 (job, created)；该资源最近排队的任务与它同类时 created 为 False。"""
+    global _snapshot
+    spec = _kinds[kind]
+    with _lock:
+        if _state['closed']:
+            raise QueueClosed('Server is shutting down')
+        queued = _queues[spec['resource']]
+        if queued and _snapshot['jobs'][queued[-1]]['kind'] == kind:
+            return _snapshot['jobs'][queued[-1]], False
+
+        _state['counter'] += 1
+        job_id = _state['counter']
+        jobs = dict(_snapshot['jobs'])
+        jobs[job_id] = {
+            'operation_id': job_id,
+            'kind': kind,
+            'operation': spec['operation'],
+            'status': 'queued',
+            'message': f"{spec['operation']} queued",
+            'detail': '',
+            'step': None,
+            'steps': [],
+            'created_at': time.time(),
+            'started_at': None,
+            'finished_at': None,
+            'duration': None,
+        }
+        version = _snapshot['version'] + 1
+        revisions = dict(_snapshot['revisions'])
+        revisions[job_id] = version
+        _snapshot = {'version': version, 'jobs': jobs, 'revisions': revisions}
+        _queues[spec['resource']].append(job_id)
+        _changed.notify_all()
+        _runnable.notify_all()
+        job = jobs[job_id]
+    return job, True
+
+
+def snapshot():
+    """当前快照（不加锁）"""
+    return _snapshot
+
+
+def get(job_id):
+    return _snapshot['jobs'].get(job_id)
+
+
+def latest(kinds=None):
+    """(最近创建的任务, 它最后一次变化时的快照版本号)，可按类型过滤；没有任务时为 (None, None)"""
+    snapshot = _snapshot
+    jobs = snapshot['jobs']
+    for job_id in sorted(jobs, reverse=True):
+        if kinds is None or jobs[job_id]['kind'] in kinds:
+            return jobs[job_id], snapshot['revisions'][job_id]
+    return None, None
+
+
+def history(limit=JOB_HISTORY):
+    jobs = _snapshot['jobs']
+    return [jobs[i] for i in sorted(jobs, reverse=True)[:limit]]
+
+
+def wait_for_change(version, timeout):
+    """等待快照版本号变化（长轮询），返回新快照"""
+    with _changed:
+        _changed.wait_for(lambda: _snapshot['version'] != version or _state['closed'], timeout=timeout)
+        return _snapshot
+
+
+def is_busy():
+    return any(job['finished_at'] is None for job in _snapshot['jobs'].values())
+
+
+def _finish_step(job_id, steps):
+    if not steps or steps[-1]['duration'] is not None:
+        return
+    step = steps[-1]
+    step['duration'] = round(time.time() - step['started_at'], 3)
+    progress.publish(job_id, 'step', name=step['name'], status='finished', duration=step['duration'])
+
+
+def _run(job_id):
+    job = get(job_id)
+    spec = _kinds[job['kind']]
+    operation = spec['operation']
+    with _lock:
+        _publish(job_id, status='running', message=f'Executing {operation}...', started_at=time.time())
+    progress.publish(job_id, 'status', status='running', operation=operation)
+
+    steps = []
+
+    def log(line):
+        progress.publish(job_id, 'log', line=line)
+
+    def step(name):
+        _finish_step(job_id, steps)
+        steps.append({'name': name, 'started_at': time.time(), 'duration': None})
+        progress.publish(job_id, 'step', name=name, status='started')
+        _update(job_id, step=name, message=f'{operation}: {name}...', steps=[dict(s) for s in steps])
+
+    try:
+        try:
+            message = spec['work'](log, step)
+        finally:
+            _finish_step(job_id, steps)
+        _update(job_id, status='success', message=message or spec['success_msg'], detail='',
+                steps=[dict(s) for s in steps], finished_at=time.time())
+    except spec['expected'] as e:
+        log(f'[ERROR] {e}')
+        detail = '\n'.join(progress.lines(job_id)) or str(e)
+        describe = spec['describe_failure']
+        message = describe(operation, detail) if describe else str(e)
+        _update(job_id, status='error', message=message, detail=detail,
+                steps=[dict(s) for s in steps], finished_at=time.time())
+    except Exception as e:
+        _update(job_id, status='error', message=f'Error occurred during {operation}', detail=str(e),
+                steps=[dict(s) for s in steps], finished_at=time.time())
+
+    job = get(job_id)
+    progress.publish(job_id, 'status', status=job['status'], operation=operation, message=job['message'])
+    _audit(job)
+
+
+def _audit(job):
+    failed = job['status'] == 'error'
+    detail = job['detail'].splitlines()[-audit.DETAIL_LINES:] if failed else []
+    audit.record(f"hacs.{job['kind']}",
+                 {'operation_id': job['operation_id'], 'queued_for': _queued_for(job)},
+                 outcome=job['status'], duration=job['duration'],
+                 error=job['message'] if failed else None,
+                 started_at=job['started_at'] and round(job['started_at'], 3),
+                 steps=[{'name': s['name'], 'duration': s['duration']} for s in job['steps']],
+                 detail=[audit.redact_text(line) for line in detail])
+
+
+def _queued_for(job):
+    end = job['started_at'] or job['finished_at']
+    return round(end - job['created_at'], 3)
+
+
+def _next_job():
+    """在锁内调用：资源空闲的队列中最早提交的任务，没有时返回 None"""
+    heads = [queued[0] for resource, queued in _queues.items() if queued and resource not in _busy]
+    return min(heads) if heads else None
+
+
+def _worker():
+    while True:
+        with _lock:
+            _runnable.wait_for(lambda: _state['closed'] or _next_job() is not None)
+            if _state['closed']:
+                return
+            job_id = _next_job()
+            kind = _snapshot['jobs'][job_id]['kind']
+            resource = _kinds[kind]['resource']
+            _queues[resource].popleft()
+            _busy.add(resource)
+        try:
+            _run(job_id)
+        finally:
+            with _lock:
+                _busy.discard(resource)
+                # 这个资源上的下一个任务可以开始了
+                _runnable.notify_all()
+
+
+def _cancel_queued():
+    """在锁内调用：取消所有排队中的任务，返回被取消的任务"""
+    cancelled = []
+    for queued in _queues.values():
+        while queued:
+            job_id = queued.popleft()
+            operation = _kinds[_snapshot['jobs'][job_id]['kind']]['operation']
+            cancelled.append(_publish(job_id, status='cancelled', message=f'{operation} cancelled',
+                                      finished_at=time.time()))
+    return cancelled
+
+
+def start():
+    with _lock:
+        if _state['workers']:
+            return
+        for i in range(WORKERS):
+            thread = threading.Thread(target=_worker, name=f'job-worker-{i}', daemon=True)
+            thread.start()
+            _state['workers'].append(thread)
+
+
+def shutdown(timeout):
+    """停止接受新任务，取消排队中的任务，等待运行中的任务完成。"""
+    with _lock:
+        _state['closed'] = True
+        workers = list(_state['workers'])
+        cancelled = _cancel_queued()
+        _changed.notify_all()
+        _runnable.notify_all()
+    for job in cancelled:
+        # 跟随这个任务的进度流随之结束
+        progress.publish(job['operation_id'], 'status', status='cancelled', operation=job['operation'],
+                         message=job['message'])
+        _audit(job)
+    deadline = time.time() + timeout
+    for thread in workers:
+        thread.join(max(0, deadline - time.time()))
+    return not any(thread.is_alive() for thread in workers)
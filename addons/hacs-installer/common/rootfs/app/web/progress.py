@@ -0,0 +1,123 @@
+"""安装/卸载进度事件。
+
+脚本输出逐行写入一个有界的环形缓冲区，每条事件带递增的序号和
+operation_id。客户端可以用 since(seq, wait) 长轮询，或通过 stream()
+订阅 SSE（断线重连时由 Last-Event-ID 续传），不必反复轮询 /api/status。
+
+每个 SSE 流在打开期间占用一个服务线程，因此同时打开的流最多
+SSE_MAX_SUBSCRIBERS 个（默认为 WEB_THREADS 的四分之一），其余线程留给
+/healthz、/readyz 和其他接口；流在所跟随的操作结束后即结束。
+
+事件类型：
+- log：一行脚本输出（已去除 ANSI 颜色）
+- step：步骤开始/结束（download、verify、unzip 等）及耗时
+- status：操作开始、成功或失败
+"""
+import json
+import os
+import threading
+import time
+from collections import deque
+
+BUFFER_SIZE = 500
+# 空闲连接上发送 keep-alive 注释的间隔（秒）
+KEEPALIVE_INTERVAL = 15
+MAX_SUBSCRIBERS = int(os.environ.get('SSE_MAX_SUBSCRIBERS',
+                                     str(max(1, int(os.environ.get('WEB_THREADS', '8')) // 4))))
+# 超出上限时建议客户端等待的秒数（Retry-After）
+RETRY_AFTER = 15
+FINAL_STATUSES = ('success', 'error', 'cancelled')
+
+_changed = threading.Condition()
+_events = deque(maxlen=BUFFER_SIZE)
+_state = {
+    'seq': 0,
+    'closed': False,
+    'subscribers': 0,
+}
+
+
+def publish(operation_id, event_type, **data):
+    with _changed:
+        _state['seq'] += 1
+        event = {
+            'seq': _state['seq'],
+            'operation_id': operation_id,
+            'type': event_type,
+            'time': time.time(),
+        }
+        event.update(data)
+        _events.append(event)
+        _changed.notify_all()
+    return event
+
+
+def last_seq():
+    with _changed:
+        return _state['seq']
+
+
+def since(seq, wait=0):
+    """返回序号大于 seq 的事件；没有新事件时最多等待 wait 秒。"""
+    with _changed:
+        if seq > _state['seq']:
+            # 序号来自重启之前的进程
+            seq = 0
+        if wait > 0:
+            _changed.wait_for(lambda: _state['seq'] > seq or _state['closed'], timeout=wait)
+        return [event for event in _events if event['seq'] > seq]
+
+
+def lines(operation_id):
+    """缓冲区中某个操作的输出行（可能已被新事件挤出一部分）。"""
+    with _changed:
+        return [e['line'] for e in _events if e['operation_id'] == operation_id and e['type'] == 'log']
+
+
+def format_event(event):
+    return f"id: {event['seq']}\nevent: {event['type']}\ndata: {json.dumps(event, separators=(',', ':'))}\n\n"
+
+
+def close():
+    """结束所有 SSE 流并唤醒长轮询（停止服务时调用）。"""
+    with _changed:
+        _state['closed'] = True
+        _changed.notify_all()
+
+
+def subscribe():
+    """占用一个 SSE 流名额；已有 MAX_SUBSCRIBERS 个流时返回 False。"""
+    with _changed:
+        if _state['subscribers'] >= MAX_SUBSCRIBERS:
+            return False
+        _state['subscribers'] += 1
+        return True
+
+
+def unsubscribe():
+    with _changed:
+        _state['subscribers'] -= 1
+
+
+def subscriber_count():
+    return _state['subscribers']
+
+
+def stream(seq, operation_id=None, finished=None):
+    """生成 seq 之后的 SSE 消息，直到 operation_id 的操作结束或 close() 被调用。
+
+    收到该操作的最终 status 事件，或 finished() 返回 True（操作已经结束，
+    最终事件可能已被发送过）时结束。名额由调用方在响应关闭时释放。
+    """
+    while not _state['closed']:
+        done = finished is not None and finished()
+        events = since(seq, wait=0 if done else KEEPALIVE_INTERVAL)
+        for event in events:
+            yield format_event(event)
+        if events:
+            seq = events[-1]['seq']
+        if done or any(event['operation_id'] == operation_id and event['type'] == 'status'
+                       and event['status'] in FINAL_STATUSES for event in events):
+            return
+        if not events and not _state['closed']:
+            yield ': keep-alive\n\n'
@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""Per-endpoint latency and nmcli spawn counts, checked against a baseline.
+
+Runs the web app in-process against the fake nmcli with a dense setup
+(40 interfaces, 500-AP scans) and times every case for --requests
+requests. Each case reports p50/p99 latency and nmcli spawns per
+request. The result is compared with benchmarks/baseline.json; the run
+fails (exit 1) when a p99 is above baseline * --tolerance plus --slack
+ms or a case spawns more nmcli processes than recorded.
+
+--update-baseline writes the current numbers as the new baseline; do
+that on purpose, in the same commit as the change that moved them.
+
+Usage: python3 benchmarks/bench_api.py [--requests N] [--tolerance X] [--slack MS]
+           [--update-baseline] [--only CASE]
+"""
+import argparse
+import gc
+import json
+import os
+import sys
+import tempfile
+import time
+
+from bench_status import WEB_DIR, count_lines, install_fake_nmcli
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+BASELINE_PATH = os.path.join(HERE, 'baseline.json')
+DEVICES = 40
+ACCESS_POINTS = 500
+
+
+def percentile(sorted_values, q):
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * q))]
+
+
+def build_cases(web_app):
+    client = web_app.app.test_client()
+
+    def get(path, headers=None):
+        def request():
+            resp = client.get(path, headers=headers)
+            assert resp.status_code == 200, (path, resp.status_code, resp.data[:200])
+        return request
+
+    def revalidate(path):
+        # A poller that sends back the ETag it got last: 304 until the content changes
+        etag = {'value': ''}
+
+        def request():
+            resp = client.get(path, headers={'If-None-Match': etag['value']})
+            assert resp.status_code in (200, 304), (path, resp.status_code, resp.data[:200])
+            etag['value'] = resp.headers['ETag']
+        return request
+
+    # (name, request, description); the first group runs before the status
+    # watcher is started, so every status read queries nmcli
+    direct = [
+        ('status_direct', get('/api/status'), 'GET /api/status without the status watcher'),
+        ('readyz_direct', get('/readyz'), 'GET /readyz without the status watcher'),
+    ]
+    cached = [
+        ('status_cached', get('/api/status'), 'GET /api/status from the snapshot'),
+        ('connections_active', get('/api/connections/active'), 'GET /api/connections/active'),
+        ('wifi_scan', get('/api/wifi/scan'), 'GET /api/wifi/scan (cached result)'),
+        ('wifi_scan_extended', get('/api/wifi/scan?extended=1'), 'GET /api/wifi/scan?extended=1'),
+        ('wifi_scan_gzip', get('/api/wifi/scan?extended=1', {'Accept-Encoding': 'gzip'}),
+         'GET /api/wifi/scan?extended=1, gzip'),
+        ('status_not_modified', revalidate('/api/status'), 'GET /api/status with If-None-Match'),
+        ('wifi_scan_not_modified', revalidate('/api/wifi/scan'), 'GET /api/wifi/scan with If-None-Match'),
+        ('scan_refresh', lambda: web_app.list_wifi(False), f'list + parse {ACCESS_POINTS} APs'),
+        ('wifi_history', get('/api/wifi/history/net-1'), 'GET /api/wifi/history/<ssid>'),
+        ('wifi_recommend', get('/api/wifi/recommend'), 'GET /api/wifi/recommend'),
+        ('reconnect_stats', get('/api/reconnect'), 'GET /api/reconnect'),
+        ('metrics', get('/metrics'), 'GET /metrics'),
+    ]
+    return direct, cached
+
+
+def start_watcher(status_cache):
+    status_cache.start()
+    deadline = time.time() + 10
+    while time.time() < deadline:
+        if status_cache.is_watching() and status_cache.get_snapshot()[1] == 'cache':
+            break
+        time.sleep(0.05)
+    # Let the `nmcli monitor` spawn and the first refresh finish
+    time.sleep(0.5)
+
+
+def measure(request, requests, log_path):
+    gc.collect()
+    request()  # warm-up
+    before = count_lines(log_path)
+    timings = []
+    for _ in range(requests):
+        start = time.perf_counter()
+        request()
+        timings.append((time.perf_counter() - start) * 1000)
+    spawns = (count_lines(log_path) - before) / requests
+    timings.sort()
+    return {
+        'p50_ms': round(percentile(timings, 0.5), 3),
+        'p99_ms': round(percentile(timings, 0.99), 3),
+        'spawns_per_request': round(spawns, 2),
+    }
+
+
+def check(result, baseline, tolerance, slack):
+    """Return a list of reasons the result is worse than the baseline."""
+    failures = []
+    limit = baseline['p99_ms'] * tolerance + slack
+    if result['p99_ms'] > limit:
+        failures.append(f"p99 {result['p99_ms']:.1f} ms > {limit:.1f} ms")
+    if result['spawns_per_request'] > baseline['spawns_per_request']:
+        failures.append(f"spawns {result['spawns_per_request']} > {baseline['spawns_per_request']}")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--tolerance', type=float, default=2.0,
+                        help='allowed p99 factor over the baseline (default 2.0)')
+    parser.add_argument('--slack', type=float, default=5.0,
+                        help='ms added to the p99 limit, for scheduler noise on fast cases')
+    parser.add_argument('--update-baseline', action='store_true')
+    parser.add_argument('--only', help='run a single case')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        log_path = install_fake_nmcli(tmpdir)
+        os.environ['FAKE_NMCLI_DEVICES'] = str(DEVICES)
+        os.environ['FAKE_NMCLI_APS'] = str(ACCESS_POINTS)
+        # No background rescans or samples in the middle of a measurement
+        os.environ['WIFI_RESCAN_MIN_INTERVAL'] = '3600'
+        os.environ['FAKE_NMCLI_DELAY'] = os.environ.get('FAKE_NMCLI_DELAY', '0')
+        sys.path.insert(0, WEB_DIR)
+        import app as web_app
+
+        # First scan (and its signal history sample) before measuring
+        web_app.wifi_scan.get_latest()
+        direct, cached = build_cases(web_app)
+        baseline = {}
+        if os.path.exists(BASELINE_PATH):
+            with open(BASELINE_PATH) as f:
+                baseline = json.load(f)['cases']
+
+        print(f'{DEVICES} devices, {ACCESS_POINTS} APs, {args.requests} requests per case')
+        print(f'{"case":<22} {"p50 ms":>8} {"p99 ms":>8} {"spawns":>7} {"base p99":>9}  result')
+        results = {}
+        failed = False
+        for cases in (direct, cached):
+            if cases is cached:
+                start_watcher(web_app.status_cache)
+            for name, request, description in cases:
+                if args.only and name != args.only:
+                    continue
+                result = measure(request, args.requests, log_path)
+                results[name] = dict(result, description=description)
+                base = baseline.get(name)
+                if args.update_baseline or base is None:
+                    verdict = 'new' if base is None else 'updated'
+                    base_p99 = '-'
+                else:
+                    failures = check(result, base, args.tolerance, args.slack)
+                    failed = failed or bool(failures)
+                    verdict = 'FAIL ' + '; '.join(failures) if failures else 'ok'
+                    base_p99 = f"{base['p99_ms']:.1f}"
+                print(f"{name:<22} {result['p50_ms']:>8.1f} {result['p99_ms']:>8.1f} "
+                      f"{result['spawns_per_request']:>7} {base_p99:>9}  {verdict}")
+
+    if args.update_baseline:
+        merged = dict(baseline, **results)
+        with open(BASELINE_PATH, 'w') as f:
+            json.dump({
+                'setup': {'devices': DEVICES, 'access_points': ACCESS_POINTS, 'requests': args.requests},
+                'cases': merged,
+            }, f, indent=2, sort_keys=True)
+            f.write('\n')
+        print(f'baseline written to {os.path.relpath(BASELINE_PATH)}')
+    elif failed:
+        sys.exit('regression against benchmarks/baseline.json')
+
+
+if __name__ == '__main__':
+    main()
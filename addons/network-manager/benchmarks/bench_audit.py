@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""Audit log overhead, size bound and query streaming.
+
+Runs the app in-process with the fake nmcli and the audit log in a temp
+directory:
+
+- record() cost on the caller's thread while the writer runs
+- connect (one failing), disconnect and provisioning through the API:
+  their records carry the nmcli calls, and no password reaches the file
+- many records with a small AUDIT_LOG_MAX_BYTES: the files stay within
+  (AUDIT_LOG_BACKUPS + 1) x AUDIT_LOG_MAX_BYTES
+- GET /api/audit over all files, by type and with ?since=/?until= (files
+  outside the range are skipped), with the peak memory of the stream
+
+Usage: python3 benchmarks/bench_audit.py [--records N] [--max-bytes B]
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from bench_status import WEB_DIR, install_fake_nmcli
+
+PASSWORD = 'correct horse battery staple'
+
+
+def consume(client, query):
+    count = size = 0
+    for chunk in client.get(f'/api/audit{query}').response:
+        count += 1
+        size += len(chunk)
+    return count, size
+
+
+def timed_query(client, query):
+    start = time.perf_counter()
+    count, size = consume(client, query)
+    elapsed = (time.perf_counter() - start) * 1000
+    # Second pass for memory, tracing slows the first one down too much
+    tracemalloc.start()
+    consume(client, query)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return count, size, elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--records', type=int, default=100_000)
+    parser.add_argument('--max-bytes', type=int, default=4 * 1024 * 1024)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        install_fake_nmcli(tmpdir)
+        log_path = os.path.join(tmpdir, 'audit', 'audit.jsonl')
+        os.environ.update({
+            'AUDIT_LOG_PATH': log_path,
+            'AUDIT_LOG_MAX_BYTES': str(args.max_bytes),
+            'AUDIT_LOG_BACKUPS': '3',
+            'AUDIT_LOG_FLUSH_INTERVAL': '0.2',
+        })
+        sys.path.insert(0, WEB_DIR)
+        import app as web_app
+        audit = web_app.audit
+        client = web_app.app.test_client()
+
+        resp = client.post('/api/wifi/connect', json={'ssid': 'Office', 'password': PASSWORD})
+        assert resp.status_code == 200, resp.get_json()
+        resp = client.post('/api/wifi/connect', json={'ssid': 'Lab', 'password': PASSWORD, 'method': 'manual',
+                                                      'ip': '192.168.1.50/24', 'gateway': '192.168.1.1'})
+        assert resp.status_code == 200, resp.get_json()
+        os.environ['FAKE_NMCLI_FAIL'] = 'device wifi connect'
+        resp = client.post('/api/wifi/connect', json={'ssid': 'Office', 'password': PASSWORD})
+        assert resp.status_code == 500
+        del os.environ['FAKE_NMCLI_FAIL']
+        resp = client.post('/api/wifi/disconnect', json={'device': 'wlan0'})
+        assert resp.status_code == 200, resp.get_json()
+        resp = client.post('/api/wifi/provision', json={'networks': [{'ssid': 'Guest', 'password': PASSWORD}],
+                                                        'activate': False})
+        assert resp.status_code == 200, resp.get_json()
+
+        lines = client.get('/api/audit?type=wifi.connect,wifi.disconnect,wifi.provision').get_data().splitlines()
+        records = [json.loads(line) for line in lines]
+        assert [r['type'] for r in records] == ['wifi.connect'] * 3 + ['wifi.disconnect', 'wifi.provision'], records
+        for r in records:
+            print(f"{r['type']:<16} {r['outcome']:<8} {r['duration'] * 1000:6.1f} ms  "
+                  f"{', '.join(c['command'] for c in r['commands'])}"
+                  f"{'  error: ' + r['error'] if r['error'] else ''}")
+        assert records[0]['params']['password'] == audit.REDACTED
+        assert records[4]['params']['networks'][0]['password'] == audit.REDACTED
+        assert all(r['commands'] for r in records), records
+        assert records[2]['outcome'] == 'failure' and records[2]['error']
+        with open(log_path) as f:
+            assert PASSWORD not in f.read(), 'password written to the audit log'
+        print('passwords redacted in params, nmcli arguments not recorded')
+
+        params = {'ssid': 'Office', 'password': PASSWORD, 'method': 'auto', 'bssid': None}
+        start = time.perf_counter()
+        for i in range(args.records):
+            audit.record('bench', dict(params, n=i), duration=0.01, commands=[])
+        per_record = (time.perf_counter() - start) / args.records * 1e6
+        audit.flush()
+        s = audit.stats()
+        total = sum(s['files'].values())
+        print(f'record(): {per_record:.1f} us per call on the caller thread, {args.records} records, '
+              f"{s['rotations']} rotations, {s['dropped']} dropped")
+        print(f"files: {', '.join(f'{name} {size / 1e6:.2f} MB' for name, size in s['files'].items())}")
+        assert total <= (s['backups'] + 1) * s['max_bytes'], total
+
+        oldest_file = next(p for p in audit._files() if os.path.exists(p))
+        with open(oldest_file, 'rb') as f:
+            oldest = json.loads(f.readline())['ts']
+        with open(log_path, 'rb') as f:
+            since = json.loads(f.readline())['ts']
+        for label, query in (('everything', ''),
+                             ('type=wifi.connect', '?type=wifi.connect'),
+                             ('since (current file)', f'?since={since}'),
+                             ('until (oldest file)', f'?until={oldest}')):
+            count, size, elapsed, peak = timed_query(client, query)
+            print(f'GET /api/audit {label:<21} {count:>7} records {size / 1e6:6.2f} MB in {elapsed:6.0f} ms, '
+                  f'peak memory {peak / 1024:.0f} KiB')
+        assert peak < total / 10
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""Cap on open server-sent event streams.
+
+Every /api/events stream holds a gthread worker thread for as long as it
+is open. Opens SSE_MAX_SUBSCRIBERS streams against the fake nmcli, then
+checks that the next one is refused with 503 and Retry-After (counted in
+sse_rejected_total) while the API keeps answering, and that a slot
+freed by a closed stream is handed to the next client.
+
+Usage: python3 benchmarks/bench_events.py [--max-subscribers N]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+from bench_status import WEB_DIR, install_fake_nmcli
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--max-subscribers', type=int, default=4)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        install_fake_nmcli(tmpdir)
+        os.environ['SSE_MAX_SUBSCRIBERS'] = str(args.max_subscribers)
+        sys.path.insert(0, WEB_DIR)
+        import app as web_app
+        events = web_app.events
+        client = web_app.app.test_client()
+        assert events.MAX_SUBSCRIBERS == args.max_subscribers
+
+        def hold_stream(opened, release):
+            # One thread per stream, like gthread; the request context is per thread
+            resp = client.get('/api/events', buffered=False)
+            assert resp.status_code == 200, resp.status_code
+            # The snapshot comes first; reading it starts the stream
+            assert next(resp.response).startswith(b'event: snapshot')
+            opened.set()
+            release.wait()
+            resp.close()
+
+        def open_stream():
+            opened, release = threading.Event(), threading.Event()
+            thread = threading.Thread(target=hold_stream, args=(opened, release))
+            thread.start()
+            assert opened.wait(10), 'stream did not open'
+            return release, thread
+
+        streams = [open_stream() for _ in range(args.max_subscribers)]
+        print(f'{events.subscriber_count()} streams open (SSE_MAX_SUBSCRIBERS={events.MAX_SUBSCRIBERS})')
+
+        start = time.perf_counter()
+        resp = client.get('/api/events')
+        elapsed = (time.perf_counter() - start) * 1000
+        assert resp.status_code == 503, resp.status_code
+        assert resp.headers['Retry-After'] == str(events.RETRY_AFTER), resp.headers
+        assert events.subscriber_count() == args.max_subscribers
+        print(f'next stream: {resp.status_code} in {elapsed:.1f} ms, Retry-After {resp.headers["Retry-After"]}')
+
+        assert client.get('/api/status').status_code == 200
+        metrics = client.get('/metrics').get_data(as_text=True)
+        assert 'sse_rejected_total 1' in metrics, metrics
+
+        release, thread = streams.pop()
+        release.set()
+        thread.join()
+        assert events.subscriber_count() == args.max_subscribers - 1
+        streams.append(open_stream())
+        print('a closed stream frees its slot')
+
+        for release, thread in streams:
+            release.set()
+            thread.join()
+        assert events.subscriber_count() == 0
+
+if __name__ == '__main__':
+    main()
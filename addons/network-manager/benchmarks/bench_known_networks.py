@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""Connect and reconnect latency with and without the known-network index.
+
+Runs the app in-process against the fake nmcli with a profile store of
+--profiles saved networks. `device wifi connect` takes --scan-delay
+seconds extra for the scan lookup and, like nmcli, adds a new profile
+("SSID 1", "SSID 2" ...) when one already exists. Every case runs
+--repeat times with the index turned off (WIFI_PROFILE_INDEX=false, the
+behaviour before it) and on:
+
+- POST /api/wifi/connect to a saved network with its password
+- reconnect to INITIAL_WIFI_SSID before anything was connected, whose
+  saved profile is not named after the SSID ("Lab 1")
+- POST /api/wifi/connect with a static IP to that network: the saved
+  profile is updated instead of a second one being added
+
+and reports p50 latency, nmcli calls per connect and how many profiles
+the store holds afterwards. Then a saved profile pinned to one access
+point is connected with another BSSID and without one (the pin follows
+the request, and is not rewritten when it already matches), and the
+duplicates the runs without the index left behind are pruned, with an
+older copy active: /api/wifi/known lists the same profiles prune deletes
+and keeps the active one.
+
+Usage: python3 benchmarks/bench_known_networks.py [--profiles N] [--repeat N] [--scan-delay S]
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+import uuid
+
+from bench_status import WEB_DIR, count_lines, install_fake_nmcli
+
+
+def seed_profiles(path, count):
+    store = {}
+    for i in range(count):
+        ssid = 'Office' if i == 0 else f'net-{i}'
+        store[str(uuid.uuid4())] = {'name': ssid, 'type': '802-11-wireless', 'timestamp': 1700000000 + i,
+                                    'settings': {'802-11-wireless.ssid': ssid, 'ipv4.method': 'auto',
+                                                 'wifi-sec.key-mgmt': 'wpa-psk', 'wifi-sec.psk': f'secret-{i}'}}
+    # Left over from an earlier connect; nothing is named "Lab"
+    store[str(uuid.uuid4())] = {'name': 'Lab 1', 'type': '802-11-wireless', 'timestamp': 1700000000,
+                                'settings': {'802-11-wireless.ssid': 'Lab', 'ipv4.method': 'auto',
+                                             'wifi-sec.key-mgmt': 'wpa-psk', 'wifi-sec.psk': 'lab-secret'}}
+    with open(path, 'w') as f:
+        json.dump(store, f)
+
+
+def profile_names(path):
+    with open(path) as f:
+        return sorted(p['name'] for p in json.load(f).values())
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--profiles', type=int, default=50)
+    parser.add_argument('--repeat', type=int, default=10)
+    parser.add_argument('--scan-delay', type=float, default=0.3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        log_path = install_fake_nmcli(tmpdir)
+        store_path = os.path.join(tmpdir, 'profiles.json')
+        os.environ.update({
+            'FAKE_NMCLI_PROFILES': store_path,
+            'FAKE_NMCLI_CONNECT_SCAN_DELAY': str(args.scan_delay),
+            'INITIAL_WIFI_SSID': 'Lab',
+            'INITIAL_WIFI_PASSWORD': 'lab-secret',
+        })
+        sys.path.insert(0, WEB_DIR)
+        import app as web_app
+        known_networks, reconnect = web_app.known_networks, web_app.reconnect
+        client = web_app.app.test_client()
+        web_app.wifi_scan.get_latest()
+
+        def connect(body):
+            resp = client.post('/api/wifi/connect', json=body)
+            assert resp.status_code == 200, resp.get_json()
+
+        cases = (
+            ('connect Office', lambda: connect({'ssid': 'Office', 'password': 'secret-0'})),
+            ('reconnect Lab', lambda: reconnect._connect(None, 'wlan0')),
+            ('static IP Lab', lambda: connect({'ssid': 'Lab', 'password': 'lab-secret', 'method': 'manual',
+                                               'ip': '192.168.1.50/24', 'gateway': '192.168.1.1'})),
+        )
+        print(f'{args.profiles + 1} saved profiles, {args.scan_delay}s scan lookup, {args.repeat} runs per case')
+        print(f'{"case":<16} {"index":<6} {"p50 ms":>8} {"max ms":>8} {"nmcli":>6}  profiles after')
+        results = {}
+        for enabled in (False, True):
+            known_networks.ENABLED = enabled
+            for name, run in cases:
+                seed_profiles(store_path, args.profiles)
+                known_networks.invalidate()
+                before = count_lines(log_path)
+                times = []
+                for _ in range(args.repeat):
+                    start = time.perf_counter()
+                    run()
+                    times.append((time.perf_counter() - start) * 1000)
+                calls = (count_lines(log_path) - before) / args.repeat
+                names = profile_names(store_path)
+                results[name, enabled] = statistics.median(times)
+                print(f"{name:<16} {'on' if enabled else 'off':<6} {statistics.median(times):>8.1f} "
+                      f"{max(times):>8.1f} {calls:>6.1f}  {len(names)}")
+                if enabled:
+                    assert len(names) == args.profiles + 1, names
+            duplicates = [n for n in profile_names(store_path) if n.startswith('Lab')]
+            print(f"  Lab profiles after the static IP runs: {', '.join(duplicates)}")
+        for name, _ in cases:
+            print(f'{name}: {results[name, False] / results[name, True]:.1f}x faster with the index')
+
+        seed_profiles(store_path, args.profiles)
+        with open(store_path) as f:
+            store = json.load(f)
+        office = next(uid for uid, p in store.items() if p['name'] == 'Office')
+        store[office]['settings']['802-11-wireless.bssid'] = 'AA:BB:CC:00:00:01'
+        with open(store_path, 'w') as f:
+            json.dump(store, f)
+        known_networks.invalidate()
+        for bssid, expected in (('AA:BB:CC:00:00:02', 'AA:BB:CC:00:00:02'), (None, ''), (None, '')):
+            before = count_lines(log_path)
+            connect({'ssid': 'Office', 'password': 'secret-0', 'bssid': bssid})
+            with open(log_path) as f:
+                modified = any(line.startswith('connection modify') for line in f.read().splitlines()[before:])
+            with open(store_path) as f:
+                pin = json.load(f)[office]['settings'].get('802-11-wireless.bssid')
+            assert pin == expected, (bssid, pin)
+            print(f"bssid {bssid or '-':<17} pin {pin or '-':<17} {'modified' if modified else 'unchanged'}")
+        assert not modified, 'a matching pin was rewritten'
+
+        # Duplicates as the runs without the index leave them
+        seed_profiles(store_path, args.profiles)
+        known_networks.ENABLED = False
+        for _ in range(3):
+            connect({'ssid': 'Office', 'password': 'secret-0'})
+        known_networks.ENABLED = True
+        # The oldest copy is the active one: the API and prune must both keep it
+        with open(store_path) as f:
+            store = json.load(f)
+        active = next(uid for uid, p in store.items() if p['name'] == 'Office 1')
+        for uid, profile in store.items():
+            profile['active'] = uid == active
+        with open(store_path, 'w') as f:
+            json.dump(store, f)
+        known_networks.invalidate()
+        web_app.status_cache.invalidate()
+        listed = {p['uuid'] for p in client.get('/api/wifi/known').get_json()['duplicates']}
+        assert active not in listed, 'the active profile is listed as a duplicate'
+        start = time.perf_counter()
+        web_app.prune_duplicate_profiles()
+        elapsed = (time.perf_counter() - start) * 1000
+        offices = [n for n in profile_names(store_path) if n.startswith('Office')]
+        print(f'prune: {offices} left of Office, Office 1..3 in {elapsed:.0f} ms')
+        assert offices == ['Office 1'], offices
+        assert listed == {uid for uid, p in store.items() if p['name'].startswith('Office') and uid != active}
+        known = client.get('/api/wifi/known').get_json()
+        assert not known['duplicates'], known['duplicates']
+        print(f"/api/wifi/known: {len(known['profiles'])} profiles, best for Office: "
+              f"{next(p['name'] for p in known['profiles'] if p['ssid'] == 'Office')}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""Micro-benchmark and fuzz check for nmcli_parser.
+
+Parses a synthetic 1,000-AP `device wifi list` dump (SSIDs with colons
+and backslashes included) and reports time per parse, both for the
+per-SSID list and for the extended per-BSSID scan (grouped by SSID).
+Then --fuzz rounds (200 by default, fixed seed) round-trip random SSIDs
+through nmcli-style escaping and check they come back unchanged, and
+split random raw lines (stray backslashes and NULs included) with
+split_terse() and with a plain character loop, which must agree: that
+covers the placeholder fast path for escaped lines and its fallback.
+
+Usage: python3 benchmarks/bench_parser.py [--aps N] [--rounds N] [--fuzz N]
+"""
+import argparse
+import os
+import random
+import sys
+import timeit
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, '..', 'common', 'rootfs', 'app', 'web'))
+
+import nmcli_parser  # noqa: E402
+
+FIELDS = 'IN-USE,SSID,SIGNAL,SECURITY,BARS'
+EXTENDED_FIELDS = 'IN-USE,BSSID,SSID,CHAN,FREQ,RATE,SIGNAL,SECURITY,BARS'
+
+
+def escape(value):
+    return value.replace('\\', '\\\\').replace(':', '\\:')
+
+
+def scan_dump(aps, extended=False):
+    rng = random.Random(42)
+    lines = []
+    for i in range(aps):
+        # Roughly three BSSIDs per SSID, a few SSIDs needing escapes
+        ssid = f'net-{i // 3}'
+        if i % 50 == 0:
+            ssid += ':lab\\5G'
+        in_use = '*' if i == 7 else ''
+        signal = str(rng.randint(1, 100))
+        if extended:
+            bssid = escape(':'.join(f'{b:02X}' for b in (0xAA, 0xBB, i >> 16, (i >> 8) & 0xFF, i & 0xFF, 1)))
+            chan, freq, rate = ('36', '5180 MHz', '540 Mbit/s') if i % 2 else ('6', '2437 MHz', '130 Mbit/s')
+            lines.append(':'.join((in_use, bssid, escape(ssid), chan, freq, rate, signal, 'WPA2', '***')))
+        else:
+            lines.append(':'.join((in_use, escape(ssid), signal, 'WPA2', '***')))
+    return '\n'.join(lines)
+
+
+def parse_extended(dump):
+    return nmcli_parser.group_by_ssid(nmcli_parser.parse_access_points(dump, EXTENDED_FIELDS))
+
+
+def reference_split(line):
+    fields, current = [], []
+    chars = iter(line)
+    for ch in chars:
+        if ch == '\\':
+            current.append(next(chars, '\\'))
+        elif ch == ':':
+            fields.append(''.join(current))
+            current = []
+        else:
+            current.append(ch)
+    fields.append(''.join(current))
+    return fields
+
+
+def fuzz(iterations):
+    rng = random.Random(0)
+    alphabet = 'ab:\\ -_é'
+    for _ in range(iterations):
+        ssids = [''.join(rng.choice(alphabet) for _ in range(rng.randint(1, 12))) for _ in range(5)]
+        output = '\n'.join(f':{escape(s)}:{n}:WPA2:**' for n, s in enumerate(ssids))
+        parsed = nmcli_parser.parse_wifi_list(output, FIELDS)
+        # Dedup keeps the strongest; compare against the expected survivors
+        expected = {}
+        for n, s in enumerate(ssids):
+            expected[s] = n
+        got = {net.ssid: net.signal for net in parsed}
+        assert got == expected, (ssids, got, expected)
+        line = ''.join(rng.choice('a:\\\0\1\2') for _ in range(rng.randint(0, 16)))
+        assert nmcli_parser.split_terse(line) == reference_split(line), repr(line)
+    print(f'fuzz: {iterations} rounds ok')
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--aps', type=int, default=1000)
+    parser.add_argument('--rounds', type=int, default=200)
+    parser.add_argument('--fuzz', type=int, default=200, help='run N fuzz rounds (0 to skip)')
+    args = parser.parse_args()
+
+    dump = scan_dump(args.aps)
+    seconds = timeit.timeit(lambda: nmcli_parser.parse_wifi_list(dump, FIELDS), number=args.rounds)
+    networks = nmcli_parser.parse_wifi_list(dump, FIELDS)
+    print(f'{args.aps} APs -> {len(networks)} SSIDs: {seconds / args.rounds * 1000:.3f} ms per parse')
+
+    dump = scan_dump(args.aps, extended=True)
+    seconds = timeit.timeit(lambda: parse_extended(dump), number=args.rounds)
+    groups = parse_extended(dump)
+    assert sum(len(aps) for aps in groups.values()) == args.aps
+    print(f'{args.aps} APs -> {len(groups)} SSIDs (extended, per BSSID): '
+          f'{seconds / args.rounds * 1000:.3f} ms per parse')
+
+    if args.fuzz:
+        fuzz(args.fuzz)
+
+
+if __name__ == '__main__':
+    main()
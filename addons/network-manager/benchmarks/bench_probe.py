@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""Connectivity probes against local stand-ins.
+
+Runs the prober and the reconnect monitor in-process with the fake
+nmcli (gateway and DNS server of the device point at 127.0.0.1), a fake
+ping and fake_probe_server.py for DNS and throughput. Probes are
+requested through POST /api/probe and the scenarios check:
+
+- healthy link: no problems, probe duration, DNS latency, throughput
+- rate limit: a second request right away gets 429 with Retry-After
+- packet loss: degraded after PROBE_DEGRADED_AFTER probes, which makes
+  reconnect re-associate (`connection up`) with the best access point of
+  the SSID, looked up by the profile's UUID since its name ("conn-N")
+  is not the SSID; one clean probe recovers
+- slow throughput and a DNS server that does not answer are reported
+
+Usage: python3 benchmarks/bench_probe.py [--probes N] [--rate-mbps X]
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+from bench_status import HERE, WEB_DIR, count_lines, install_fake_nmcli
+import fake_probe_server
+
+DEGRADED_AFTER = 3
+
+
+def install_fake_ping(tmpdir):
+    os.symlink(os.path.join(HERE, 'fake_ping.py'), os.path.join(tmpdir, 'bin', 'ping'))
+    os.chmod(os.path.join(HERE, 'fake_ping.py'), 0o755)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--probes', type=int, default=10)
+    parser.add_argument('--rate-mbps', type=float, default=200, help='pace of the throughput stand-in')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        log_path = install_fake_nmcli(tmpdir)
+        install_fake_ping(tmpdir)
+        dns = fake_probe_server.DnsServer()
+        http = fake_probe_server.start_http(rate_mbps=args.rate_mbps)
+        size = 2_000_000
+        os.environ.update({
+            'FAKE_NMCLI_GATEWAY': '127.0.0.1',
+            'FAKE_NMCLI_DNS': '127.0.0.1',
+            'PROBE_DNS_PORT': str(dns.port),
+            'PROBE_THROUGHPUT_URL': f'http://127.0.0.1:{http.server_address[1]}/blob?size={size}',
+            'PROBE_THROUGHPUT_BYTES': str(size),
+            'PROBE_INTERVAL': '0',
+            'PROBE_MIN_INTERVAL': '0',
+            'PROBE_TIMEOUT': '0.5',
+            'PROBE_MIN_THROUGHPUT': str(args.rate_mbps / 4),
+            'PROBE_DEGRADED_AFTER': str(DEGRADED_AFTER),
+            # Associated with the weaker access point of net-0
+            'FAKE_NMCLI_IN_USE': '1',
+        })
+        sys.path.insert(0, WEB_DIR)
+        import app as web_app
+        probes, reconnect = web_app.probes, web_app.reconnect
+        client = web_app.app.test_client()
+        web_app.start_background()
+        deadline = time.time() + 10
+        while not (reconnect.stats()['last_good'] or {}).get('uuid') and time.time() < deadline:
+            time.sleep(0.05)
+
+        def run(throughput=False):
+            start = time.perf_counter()
+            resp = client.post('/api/probe', json={'throughput': throughput, 'wait': 10})
+            elapsed = (time.perf_counter() - start) * 1000
+            assert resp.status_code == 200, (resp.status_code, resp.get_json())
+            return resp.get_json()['result'], elapsed
+
+        durations, dns_ms = [], []
+        for _ in range(args.probes):
+            result, elapsed = run()
+            assert not result['problems'], result
+            durations.append(elapsed)
+            dns_ms.append(result['dns'][0]['latency_ms'])
+        print(f'healthy link, {args.probes} probes: p50 {statistics.median(durations):.0f} ms per probe, '
+              f'DNS p50 {statistics.median(dns_ms):.2f} ms, gateway avg '
+              f"{result['gateway']['avg_ms']} ms, loss {result['gateway']['loss']}%")
+        result, elapsed = run(throughput=True)
+        assert not result['problems'], result
+        print(f"throughput test: {result['throughput']['mbps']} Mbit/s "
+              f"({result['throughput']['bytes']} bytes in {elapsed:.0f} ms, paced at {args.rate_mbps:g})")
+
+        probes.MIN_INTERVAL = 10
+        resp = client.post('/api/probe', json={})
+        assert resp.status_code == 429, resp.status_code
+        print(f"rate limited: 429, Retry-After {resp.headers['Retry-After']} s")
+        probes.MIN_INTERVAL = 0
+
+        # Enough samples for a confident ranking of the access points
+        fields = 'IN-USE,BSSID,SSID,CHAN,FREQ,RATE,SIGNAL,SECURITY,BARS'
+        output = web_app.run_nmcli(['-t', '-f', fields, 'device', 'wifi', 'list', '--rescan', 'no'])
+        access_points = web_app.nmcli_parser.parse_access_points(output, fields)
+        for i in range(3):
+            # One sample per second at most
+            web_app.signal_history.record(access_points, timestamp=time.time() - 10 + i)
+        os.environ['FAKE_PING_LOSS'] = '60'
+        before = count_lines(log_path)
+        for i in range(DEGRADED_AFTER):
+            result, _ = run()
+            assert result['degraded'] == (i == DEGRADED_AFTER - 1), result
+        start = time.perf_counter()
+        while reconnect.stats()['last_roam'] is None and time.perf_counter() - start < 10:
+            time.sleep(0.01)
+        roam = reconnect.stats()['last_roam']
+        assert roam is not None and roam['error'] is None, reconnect.stats()
+        connection = reconnect.stats()['last_good']['connection']
+        assert connection != 'net-0' and roam['ssid'] == 'net-0', (connection, roam)
+        assert roam['bssid'] == 'AA:BB:CC:00:00:00', roam
+        with open(log_path) as f:
+            ups = [line.strip() for line in f.read().splitlines()[before:] if line.startswith('connection up')]
+        print(f"60% loss: degraded after {DEGRADED_AFTER} probes ({result['problems'][0]}); "
+              f"re-associated in {(time.perf_counter() - start) * 1000:.0f} ms: {ups[-1]}")
+        os.environ['FAKE_PING_LOSS'] = '0'
+        result, _ = run()
+        assert not result['degraded'] and not probes.is_degraded()
+        print('one clean probe: degraded cleared')
+
+        http.rate_mbps = args.rate_mbps / 10
+        result, _ = run(throughput=True)
+        assert result['problems'] and result['problems'][0].startswith('throughput'), result
+        print(f"slow link: {result['problems']}")
+        http.rate_mbps = args.rate_mbps
+
+        dns.drop = True
+        result, elapsed = run()
+        assert result['problems'] == ['no DNS server answered'], result
+        print(f"DNS down: {result['problems']} after {elapsed:.0f} ms")
+        dns.drop = False
+
+        history = client.get('/api/probe/history?limit=5').get_json()
+        print(f"history: {len(probes.history())} results kept, last 5 problems: "
+              f"{[r['problems'] for r in history]}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""nmcli calls and activations for declarative provisioning.
+
+Applies a document of --networks Wi-Fi profiles through
+POST /api/wifi/provision against the fake nmcli (with a profile store)
+and reports, per scenario, the nmcli calls made on profiles (status
+queries left out) and how many of them were activations
+(`connection up`):
+
+- first apply: every profile is added, one activation
+- same document again: nothing changes, no activation
+- one network changed: one modify, no activation (it is not the active one)
+- prune: profiles not in the document are deleted
+- failing activation: the changes are rolled back
+- a profile saved as "net-0 1" for net-0 (as `device wifi connect`
+  names copies): it is matched by SSID, not added again or pruned
+- fields that are not strings are rejected with 400 before any nmcli call
+
+For comparison the same networks are also connected one by one through
+POST /api/wifi/connect, the only way before.
+
+Usage: python3 benchmarks/bench_provision.py [--networks N]
+"""
+import argparse
+import copy
+import json
+import os
+import sys
+import tempfile
+import time
+
+from bench_status import WEB_DIR, install_fake_nmcli
+
+
+def read_log(path, start):
+    with open(path) as f:
+        return f.read().splitlines()[start:]
+
+
+def profile_calls(calls):
+    # Leave out the status queries (device show, active connections)
+    return [line for line in calls if 'device show' not in line and '--active' not in line]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--networks', type=int, default=10)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        log_path = install_fake_nmcli(tmpdir)
+        profiles_path = os.path.join(tmpdir, 'profiles.json')
+        os.environ['FAKE_NMCLI_PROFILES'] = profiles_path
+        os.environ['FAKE_NMCLI_APS'] = str(args.networks * 2)
+        sys.path.insert(0, WEB_DIR)
+        import app as web_app
+        client = web_app.app.test_client()
+        web_app.wifi_scan.get_latest()
+
+        document = {'networks': [
+            {'ssid': f'net-{i}', 'password': f'secret-{i}', 'priority': args.networks - i}
+            for i in range(args.networks)
+        ]}
+
+        def run(name, doc, expect_status=200):
+            start_line = len(read_log(log_path, 0))
+            start = time.perf_counter()
+            resp = client.post('/api/wifi/provision', json=doc)
+            elapsed = (time.perf_counter() - start) * 1000
+            calls = profile_calls(read_log(log_path, start_line))
+            ups = sum(1 for line in calls if line.startswith('connection up'))
+            body = resp.get_json()
+            assert resp.status_code == expect_status, (name, resp.status_code, body)
+            actions = {}
+            for step in (body.get('plan') or {}).get('steps', []):
+                actions[step['action']] = actions.get(step['action'], 0) + 1
+            print(f'{name:<26} {elapsed:>8.1f} {len(calls):>6} {ups:>4}  '
+                  f'{json.dumps(actions) if actions else body.get("error")}')
+            return body, calls, ups
+
+        print(f'{args.networks} networks')
+        print(f'{"scenario":<26} {"ms":>8} {"nmcli":>6} {"up":>4}  result')
+        _, _, ups = run('first apply', document)
+        assert ups == 1
+        _, calls, ups = run('same document', document)
+        assert ups == 0 and len(calls) == 3, calls
+
+        changed = copy.deepcopy(document)
+        changed['networks'][-1]['priority'] = 100
+        changed['networks'][-1]['autoconnect'] = False
+        _, calls, ups = run('one network changed', changed)
+        assert ups == 0 and sum(1 for c in calls if c.startswith('connection modify')) == 1
+
+        pruned = copy.deepcopy(changed)
+        pruned['networks'] = pruned['networks'][:-2]
+        pruned['prune'] = True
+        _, calls, _ = run('prune two', pruned)
+        assert sum(1 for c in calls if c.startswith('connection delete')) == 2
+
+        with open(profiles_path) as f:
+            before = json.load(f)
+        os.environ['FAKE_NMCLI_FAIL'] = 'connection up'
+        failing = copy.deepcopy(pruned)
+        failing['networks'][0]['method'] = 'manual'
+        failing['networks'][0]['ip'] = '192.168.10.5/24'
+        failing['networks'][0]['gateway'] = '192.168.10.1'
+        failing['networks'].append({'ssid': 'new-net', 'password': 'x' * 8, 'priority': 999})
+        run('failing activation', failing, expect_status=500)
+        del os.environ['FAKE_NMCLI_FAIL']
+        with open(profiles_path) as f:
+            assert json.load(f) == before, 'changes were not rolled back'
+        print('rollback left the saved profiles unchanged')
+
+        for profile in before.values():
+            if profile['name'] == 'net-0':
+                profile['name'] = 'net-0 1'
+        with open(profiles_path, 'w') as f:
+            json.dump(before, f)
+        body, calls, _ = run('saved as "net-0 1"', pruned)
+        net0 = next(step for step in body['plan']['steps'] if step['ssid'] == 'net-0')
+        assert net0['action'] == 'unchanged', net0
+        assert not any(c.startswith(('connection add', 'connection delete')) for c in calls), calls
+        with open(profiles_path) as f:
+            assert 'net-0 1' in [p['name'] for p in json.load(f).values()]
+
+        for field, value in (('ssid', 5), ('password', ['x']), ('bssid', {}), ('ip', 1),
+                             ('gateway', True), ('dns', 8.8)):
+            network = dict(document['networks'][0], method='manual', ip='192.168.1.5/24', gateway='192.168.1.1')
+            network[field] = value
+            start_line = len(read_log(log_path, 0))
+            for url, body in (('/api/wifi/connect', network), ('/api/wifi/provision', {'networks': [network]})):
+                resp = client.post(url, json=body)
+                assert resp.status_code == 400, (url, field, resp.status_code)
+                assert resp.get_json()['error'].endswith(f'{field} must be a string'), resp.get_json()
+            assert not profile_calls(read_log(log_path, start_line)), field
+        print('non-string fields rejected with 400')
+
+        os.remove(profiles_path)
+        start_line = len(read_log(log_path, 0))
+        start = time.perf_counter()
+        for network in document['networks']:
+            resp = client.post('/api/wifi/connect', json=dict(network, method='manual',
+                                                             ip='192.168.1.5/24', gateway='192.168.1.1'))
+            assert resp.status_code == 200, resp.get_json()
+        elapsed = (time.perf_counter() - start) * 1000
+        calls = profile_calls(read_log(log_path, start_line))
+        ups = sum(1 for line in calls if line.startswith('connection up'))
+        print(f'{"connect one by one":<26} {elapsed:>8.1f} {len(calls):>6} {ups:>4}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""Measure how fast the auto-reconnect monitor recovers from a Wi-Fi drop.
+
+Runs the reconnect monitor against the fake nmcli: the Wi-Fi device is
+marked disconnected, `nmcli monitor` reports the change and the time
+until the device is connected again is recorded. A second phase makes
+`connection up` fail and prints the backoff between attempts.
+
+Usage: python3 benchmarks/bench_reconnect.py [--drops N]
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+from bench_status import WEB_DIR, install_fake_nmcli
+
+
+def wait_for(predicate, timeout):
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def read_state(path):
+    with open(path) as f:
+        return f.read().strip()
+
+
+def write_state(path, state):
+    with open(path, 'w') as f:
+        f.write(state)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--drops', type=int, default=10)
+    parser.add_argument('--failures', type=int, default=4, help='failed attempts to observe in phase 2')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        install_fake_nmcli(tmpdir)
+        state_path = os.path.join(tmpdir, 'wifi-state')
+        write_state(state_path, 'connected')
+        os.environ['FAKE_NMCLI_STATE'] = state_path
+        os.environ['RECONNECT_BACKOFF_BASE'] = '0.5'
+        sys.path.insert(0, WEB_DIR)
+        import app as web_app
+        reconnect = web_app.reconnect
+        web_app.start_background()
+
+        if not wait_for(lambda: (reconnect.stats()['last_good'] or {}).get('bssid'), 10):
+            sys.exit('monitor did not pick up the connected network')
+        print(f"last good: {reconnect.stats()['last_good']}")
+
+        timings = []
+        for _ in range(args.drops):
+            start = time.perf_counter()
+            write_state(state_path, 'disconnected')
+            if not wait_for(lambda: read_state(state_path) == 'connected'
+                            and reconnect.stats()['status'] == 'idle', 10):
+                sys.exit(f'not reconnected: {reconnect.stats()}')
+            timings.append((time.perf_counter() - start) * 1000)
+            time.sleep(0.3)
+        print(f'drop -> connected over {args.drops} drops: '
+              f'p50 {statistics.median(timings):.0f} ms, max {max(timings):.0f} ms')
+
+        os.environ['FAKE_NMCLI_FAIL'] = 'connection up'
+        write_state(state_path, 'disconnected')
+        attempts = []
+        last = reconnect.stats()['attempts']
+        while len(attempts) < args.failures:
+            wait_for(lambda: reconnect.stats()['attempts'] > last, 30)
+            last = reconnect.stats()['attempts']
+            attempts.append(time.perf_counter())
+        gaps = [f'{b - a:.2f}s' for a, b in zip(attempts, attempts[1:])]
+        print(f'gaps between failed attempts: {", ".join(gaps)}')
+        del os.environ['FAKE_NMCLI_FAIL']
+        wait_for(lambda: reconnect.stats()['status'] == 'idle', 150)
+        stats = reconnect.stats()
+        print(f"drops {stats['drops']}, attempts {stats['attempts']}, "
+              f"successes {stats['successes']}, failures {stats['failures']}")
+
+
+if __name__ == '__main__':
+    main()
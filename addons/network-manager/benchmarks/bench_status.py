@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""Benchmark /api/status against the fake nmcli.
+
+Reports nmcli spawns and latency per request for a growing number of
+interfaces. The spawn count should stay flat regardless of device count.
+
+With --cached the status watcher is started first, so requests should be
+answered from the snapshot without spawning nmcli at all.
+
+Without the watcher, --concurrent requests then miss the snapshot at
+the same time; they must share one direct query (the nmcli calls of a
+single request), not run one each.
+
+Usage: python3 benchmarks/bench_status.py [--requests N] [--cached] [--concurrent N]
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+WEB_DIR = os.path.join(HERE, '..', 'common', 'rootfs', 'app', 'web')
+
+
+def install_fake_nmcli(tmpdir):
+    bin_dir = os.path.join(tmpdir, 'bin')
+    os.makedirs(bin_dir)
+    os.symlink(os.path.join(HERE, 'fake_nmcli.py'), os.path.join(bin_dir, 'nmcli'))
+    os.chmod(os.path.join(HERE, 'fake_nmcli.py'), 0o755)
+    os.environ['PATH'] = bin_dir + os.pathsep + os.environ['PATH']
+    log_path = os.path.join(tmpdir, 'nmcli.log')
+    os.environ['FAKE_NMCLI_LOG'] = log_path
+    # Keep the app's audit log out of /var/log
+    os.environ.setdefault('AUDIT_LOG_PATH', os.path.join(tmpdir, 'audit.jsonl'))
+    return log_path
+
+
+def count_lines(path):
+    if not os.path.exists(path):
+        return 0
+    with open(path) as f:
+        return sum(1 for _ in f)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--requests', type=int, default=20)
+    parser.add_argument('--cached', action='store_true', help='start the status watcher first')
+    parser.add_argument('--concurrent', type=int, default=16)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        log_path = install_fake_nmcli(tmpdir)
+        sys.path.insert(0, WEB_DIR)
+        import app as web_app
+        client = web_app.app.test_client()
+        if args.cached:
+            web_app.status_cache.start()
+
+        print(f'{"devices":>8} {"spawns/req":>11} {"p50 ms":>8} {"max ms":>8}')
+        for devices in (1, 10, 40):
+            os.environ['FAKE_NMCLI_DEVICES'] = str(devices)
+            web_app.status_cache.invalidate()
+            client.get('/api/status')
+            before = count_lines(log_path)
+            timings = []
+            for _ in range(args.requests):
+                start = time.perf_counter()
+                resp = client.get('/api/status')
+                timings.append((time.perf_counter() - start) * 1000)
+                assert resp.status_code == 200, resp.data
+            spawns = (count_lines(log_path) - before) / args.requests
+            print(f'{devices:>8} {spawns:>11.1f} {statistics.median(timings):>8.1f} {max(timings):>8.1f}')
+
+        if not args.cached:
+            status_cache = web_app.status_cache
+            load = status_cache._loader
+
+            def slow_load():
+                # Long enough for every request to arrive while it runs
+                time.sleep(0.2)
+                return load()
+
+            status_cache.set_loader(slow_load)
+            before = count_lines(log_path)
+            status_cache.get_snapshot()
+            single = count_lines(log_path) - before
+
+            barrier = threading.Barrier(args.concurrent)
+            results = []
+
+            def request():
+                barrier.wait()
+                results.append(status_cache.get_snapshot()[0]['devices'])
+
+            threads = [threading.Thread(target=request) for _ in range(args.concurrent)]
+            before = count_lines(log_path)
+            start = time.perf_counter()
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            elapsed = (time.perf_counter() - start) * 1000
+            spawns = count_lines(log_path) - before
+            print(f'{args.concurrent} concurrent misses: {spawns} nmcli spawns '
+                  f'(one query: {single}) in {elapsed:.0f} ms')
+            assert len(results) == args.concurrent and all(r == results[0] for r in results)
+            assert spawns == single, spawns
+
+
+if __name__ == '__main__':
+    main()
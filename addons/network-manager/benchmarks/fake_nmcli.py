@@ -0,0 +1,292 @@
+#!/usr/bin/env python3
+"""Scriptable stand-in for nmcli used by the benchmarks.
+
+Environment:
+    FAKE_NMCLI_DEVICES  number of devices to report (default 4)
+    FAKE_NMCLI_APS      number of access points in wifi list (default 30)
+    FAKE_NMCLI_SCAN_DELAY  extra seconds a `--rescan yes` list takes (default 0.5)
+    FAKE_NMCLI_DELAY    seconds to sleep per invocation (default 0.005)
+    FAKE_NMCLI_LOG      file that gets one line appended per invocation
+    FAKE_NMCLI_FAIL     subcommand that exits with an error, e.g. "connection up"
+    FAKE_NMCLI_STATE    file holding the state of wlan0 (default "connected");
+                        `connection up` and `device wifi connect` write
+                        "connected" to it and `nmcli monitor` prints a line
+                        whenever it changes
+    FAKE_NMCLI_GATEWAY  IPv4 gateway of every device (default 192.168.0.1)
+    FAKE_NMCLI_DNS      comma-separated DNS servers of every device
+                        (default 192.168.0.1)
+    FAKE_NMCLI_PROFILES JSON file of saved profiles; when set, `connection
+                        show/add/modify/delete/up` work on it instead of the
+                        generated conn-N profiles, and the profile brought
+                        up last is the only active connection.
+                        `device wifi connect` adds a profile like nmcli
+                        does ("SSID", then "SSID 1", "SSID 2" ...)
+    FAKE_NMCLI_IN_USE   index of the access point `wifi list` marks in use
+                        (default 0); the generated profiles are all for
+                        its SSID, net-<index // 2>
+    FAKE_NMCLI_CONNECT_SCAN_DELAY  extra seconds `device wifi connect` takes
+                        to look the SSID up in a scan (default 0)
+"""
+import json
+import os
+import sys
+import time
+import uuid as uuid_module
+
+
+def device_name(i):
+    return 'wlan0' if i == 0 else f'eth{i - 1}'
+
+
+def device_type(i):
+    return 'wifi' if i == 0 else 'ethernet'
+
+
+def wifi_state():
+    path = os.environ.get('FAKE_NMCLI_STATE')
+    if not path or not os.path.exists(path):
+        return 'connected'
+    with open(path) as f:
+        return f.read().strip() or 'connected'
+
+
+def set_wifi_state(state):
+    path = os.environ.get('FAKE_NMCLI_STATE')
+    if path:
+        with open(path, 'w') as f:
+            f.write(state)
+
+
+def device_show(count, only=None):
+    lines = []
+    for i in range(count):
+        name = device_name(i)
+        if only and name != only:
+            continue
+        lines.append(f'GENERAL.DEVICE:{name}')
+        lines.append(f'GENERAL.TYPE:{device_type(i)}')
+        state = wifi_state() if i == 0 else 'connected'
+        codes = {'connected': 100, 'disconnected': 30}
+        lines.append(f'GENERAL.STATE:{codes.get(state, 50)} ({state})')
+        lines.append(f'GENERAL.CONNECTION:{f"conn-{i}" if state == "connected" else ""}')
+        lines.append(f'IP4.ADDRESS[1]:192.168.{i % 250}.10/24')
+        lines.append(f"IP4.GATEWAY:{os.environ.get('FAKE_NMCLI_GATEWAY', '192.168.0.1')}")
+        for n, server in enumerate(os.environ.get('FAKE_NMCLI_DNS', '192.168.0.1').split(','), 1):
+            lines.append(f'IP4.DNS[{n}]:{server}')
+        lines.append(f'IP6.ADDRESS[1]:fe80\\:\\:{i:x}/64')
+    return lines
+
+
+def device_status(count):
+    return [f'{device_name(i)}:{device_type(i)}:connected:conn-{i}' for i in range(count)]
+
+
+def active_connections(count):
+    return [f'conn-{i}:0000{i:04d}-0000-0000-0000-000000000000:{device_type(i)}:{device_name(i)}'
+            for i in range(count)]
+
+
+def wifi_list(count, fields):
+    lines = []
+    for i in range(count):
+        values = {
+            'IN-USE': '*' if i == int(os.environ.get('FAKE_NMCLI_IN_USE', '0')) else '',
+            'SSID': f'net-{i // 2}',
+            'BSSID': f'AA\\:BB\\:CC\\:00\\:00\\:{i % 256:02X}',
+            'CHAN': '6' if i % 2 else '36',
+            'FREQ': '2437 MHz' if i % 2 else '5180 MHz',
+            'RATE': '130 Mbit/s' if i % 2 else '540 Mbit/s',
+            'SIGNAL': str(100 - i % 100),
+            'SECURITY': 'WPA2' if i % 3 else '',
+            'BARS': '****',
+        }
+        lines.append(':'.join(values[f] for f in fields.split(',')))
+    return lines
+
+
+def saved_profiles(count, fields):
+    lines = []
+    for i in range(count):
+        values = {'NAME': f'conn-{i}', 'UUID': f'1111{i:04d}-0000-0000-0000-000000000000',
+                  'TYPE': '802-11-wireless', 'TIMESTAMP': '0'}
+        lines.append(':'.join(values[f] for f in fields.split(',')))
+    return lines
+
+
+def load_profiles():
+    path = os.environ['FAKE_NMCLI_PROFILES']
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_profiles(store):
+    with open(os.environ['FAKE_NMCLI_PROFILES'], 'w') as f:
+        json.dump(store, f)
+
+
+def escape(value):
+    return value.replace('\\', '\\\\').replace(':', '\\:')
+
+
+def profile_command(argv):
+    """`connection show/add/modify/delete` against FAKE_NMCLI_PROFILES; None if not handled."""
+    store = load_profiles()
+    args = argv[argv.index('connection') + 1:]
+    if args[0] == 'show' and '--active' in argv:
+        return [f"{escape(p['name'])}:{uid}:{p['type']}:wlan0" for uid, p in store.items() if p.get('active')]
+    if args[0] == 'show':
+        ids = args[1:]
+        if not ids:
+            fields = argv[argv.index('-f') + 1].split(',')
+            return [':'.join(escape(str({'NAME': p['name'], 'UUID': uid, 'TYPE': p['type'],
+                                         'TIMESTAMP': p.get('timestamp', 0)}[f])) for f in fields)
+                    for uid, p in store.items()]
+        keys = argv[argv.index('-f') + 1].split(',')
+        lines = []
+        for uid in ids:
+            profile = store.get(uid)
+            if profile is None:
+                continue
+            for key in keys:
+                value = uid if key == 'connection.uuid' else profile['settings'].get(key, '')
+                lines.append(f'{key}:{escape(value)}')
+        return lines
+    if args[0] == 'add':
+        name = args[args.index('con-name') + 1]
+        uid = str(uuid_module.uuid4())
+        props = args[args.index('ssid') + 2:]
+        settings = dict(zip(props[::2], props[1::2]))
+        settings['802-11-wireless.ssid'] = args[args.index('ssid') + 1]
+        store[uid] = {'name': name, 'type': '802-11-wireless', 'settings': settings}
+        save_profiles(store)
+        return [f"Connection '{name}' ({uid}) successfully added."]
+    if args[0] == 'modify':
+        profile = store[args[1]]
+        props = args[2:]
+        if props[:1] == ['remove']:
+            prefix = 'wifi-sec.' if props[1] == '802-11-wireless-security' else props[1] + '.'
+            profile['settings'] = {k: v for k, v in profile['settings'].items() if not k.startswith(prefix)}
+        else:
+            profile['settings'].update(zip(props[::2], props[1::2]))
+        save_profiles(store)
+        return []
+    if args[0] == 'up' and args[1] in store:
+        for uid, profile in store.items():
+            profile['active'] = uid == args[1]
+        store[args[1]]['timestamp'] = int(time.time())
+        save_profiles(store)
+        set_wifi_state('connected')
+        return []
+    if args[0] == 'delete':
+        store.pop(args[1], None)
+        save_profiles(store)
+        return []
+    return None
+
+
+def wifi_connect(argv):
+    """`device wifi connect <ssid> [password P]` against FAKE_NMCLI_PROFILES."""
+    time.sleep(float(os.environ.get('FAKE_NMCLI_CONNECT_SCAN_DELAY', '0')))
+    store = load_profiles()
+    args = argv[argv.index('connect') + 1:]
+    ssid = args[0]
+    names = {p['name'] for p in store.values()}
+    name, n = ssid, 0
+    while name in names:
+        n += 1
+        name = f'{ssid} {n}'
+    settings = {'802-11-wireless.ssid': ssid, 'ipv4.method': 'auto'}
+    if 'password' in args:
+        settings.update({'wifi-sec.key-mgmt': 'wpa-psk', 'wifi-sec.psk': args[args.index('password') + 1]})
+    uid = str(uuid_module.uuid4())
+    for profile in store.values():
+        profile['active'] = False
+    store[uid] = {'name': name, 'type': '802-11-wireless', 'settings': settings, 'active': True,
+                  'timestamp': int(time.time())}
+    save_profiles(store)
+    set_wifi_state('connected')
+    return [f"Device 'wlan0' successfully activated with '{uid}'."]
+
+
+def main(argv):
+    if os.environ.get('FAKE_NMCLI_LOG'):
+        with open(os.environ['FAKE_NMCLI_LOG'], 'a') as f:
+            f.write(' '.join(argv) + '\n')
+    time.sleep(float(os.environ.get('FAKE_NMCLI_DELAY', '0.005')))
+
+    count = int(os.environ.get('FAKE_NMCLI_DEVICES', '4'))
+    words = [a for a in argv if not a.startswith('-')]
+    # Drop the values of -f/-m options
+    for opt in ('-f', '-m', '-g'):
+        if opt in argv:
+            value = argv[argv.index(opt) + 1]
+            if value in words:
+                words.remove(value)
+
+    fail = os.environ.get('FAKE_NMCLI_FAIL')
+    if fail and ' '.join(words).startswith(fail):
+        sys.stderr.write(f'Error: {fail} failed (fake).\n')
+        return 4
+
+    lines = None
+    if os.environ.get('FAKE_NMCLI_PROFILES') and words[:1] == ['connection']:
+        lines = profile_command(argv)
+    elif os.environ.get('FAKE_NMCLI_PROFILES') and words[:3] == ['device', 'wifi', 'connect']:
+        lines = wifi_connect(argv)
+    if lines is not None:
+        pass
+    elif words[:3] == ['device', 'wifi', 'list']:
+        if 'yes' in words:
+            time.sleep(float(os.environ.get('FAKE_NMCLI_SCAN_DELAY', '0.5')))
+        lines = wifi_list(int(os.environ.get('FAKE_NMCLI_APS', '30')), argv[argv.index('-f') + 1])
+    elif words[:2] == ['device', 'show']:
+        lines = device_show(count, words[2] if len(words) > 2 else None)
+        if '-f' in argv:
+            fields = argv[argv.index('-f') + 1].split(',')
+            lines = [l for l in lines if l.split(':', 1)[0].split('[')[0] in fields]
+    elif words[:2] == ['device', 'disconnect']:
+        set_wifi_state('disconnected')
+        lines = []
+    elif words[:1] == ['device']:
+        lines = device_status(count)
+    elif words[:2] == ['connection', 'show'] and '--active' in argv:
+        lines = active_connections(count)
+    elif words[:2] == ['connection', 'show'] and len(words) == 2:
+        lines = saved_profiles(count, argv[argv.index('-f') + 1])
+    elif words[:2] == ['connection', 'show']:
+        ssid = f"net-{int(os.environ.get('FAKE_NMCLI_IN_USE', '0')) // 2}"
+        lines = []
+        for uid in words[2:]:
+            values = {'connection.uuid': uid, '802-11-wireless.ssid': ssid}
+            lines.extend(f'{key}:{values.get(key, "")}' for key in argv[argv.index('-f') + 1].split(','))
+    elif words[:2] == ['connection', 'add']:
+        lines = ["Connection 'fake' (22220000-0000-0000-0000-000000000000) successfully added."]
+    elif words[:2] == ['connection', 'up'] or words[:3] == ['device', 'wifi', 'connect']:
+        set_wifi_state('connected')
+        lines = []
+    elif words[:1] == ['connection']:
+        lines = []
+    elif words[:1] == ['monitor']:
+        # Reports FAKE_NMCLI_STATE changes; without it the watcher just stays attached
+        last = wifi_state()
+        for _ in range(36000):
+            time.sleep(0.1)
+            state = wifi_state()
+            if state != last:
+                last = state
+                sys.stdout.write(f'wlan0: {state}\n')
+                sys.stdout.flush()
+        return 0
+    elif words[:2] == ['general', 'status']:
+        lines = ['connected:full']
+    else:
+        return 0
+
+    sys.stdout.write('\n'.join(lines) + '\n')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,39 @@
+#!/usr/bin/env python3
+"""Scriptable stand-in for iputils ping used by the benchmarks.
+
+Prints the summary lines of `ping -q` for the requested count.
+
+Environment:
+    FAKE_PING_RTT   average round-trip time in ms (default 1.0)
+    FAKE_PING_LOSS  percentage of echoes lost (default 0)
+    FAKE_PING_LOG   file that gets one line appended per invocation
+"""
+import os
+import sys
+import time
+
+
+def main(argv):
+    if os.environ.get('FAKE_PING_LOG'):
+        with open(os.environ['FAKE_PING_LOG'], 'a') as f:
+            f.write(' '.join(argv) + '\n')
+    count = int(argv[argv.index('-c') + 1]) if '-c' in argv else 4
+    address = argv[-1]
+    rtt = float(os.environ.get('FAKE_PING_RTT', '1.0'))
+    loss = float(os.environ.get('FAKE_PING_LOSS', '0'))
+    received = count - round(count * loss / 100)
+    time.sleep(count * rtt / 1000)
+
+    print(f'PING {address} ({address}) 56(84) bytes of data.')
+    print()
+    print(f'--- {address} ping statistics ---')
+    print(f'{count} packets transmitted, {received} received, '
+          f'{round(100 * (count - received) / count)}% packet loss, time {round(count * rtt)}ms')
+    if received:
+        print(f'rtt min/avg/max/mdev = {rtt * 0.8:.3f}/{rtt:.3f}/{rtt * 1.2:.3f}/{rtt * 0.1:.3f} ms')
+    # Like iputils: exit 1 when no reply came back
+    return 0 if received else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
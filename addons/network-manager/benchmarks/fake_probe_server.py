@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""Local stand-in for the hosts the connectivity probes talk to.
+
+- DNS: answers every UDP query with an empty NOERROR response after
+  `delay` seconds, or not at all while `drop` is set
+- HTTP: GET /blob?size=N returns N zero bytes, paced to `rate_mbps`
+  Mbit/s when that is set (0 = as fast as possible)
+
+Both run on 127.0.0.1 in daemon threads. Run directly to point a live
+add-on at them (PROBE_DNS_PORT, PROBE_THROUGHPUT_URL):
+
+    python3 benchmarks/fake_probe_server.py [--dns-port N] [--http-port N] [--rate-mbps X]
+"""
+import argparse
+import socket
+import threading
+import time
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+CHUNK_SIZE = 64 * 1024
+
+
+class DnsServer:
+    def __init__(self, port=0):
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.bind(('127.0.0.1', port))
+        self.port = self.sock.getsockname()[1]
+        self.delay = 0.0
+        self.drop = False
+        self.queries = 0
+        threading.Thread(target=self._serve, daemon=True).start()
+
+    def _serve(self):
+        while True:
+            data, client = self.sock.recvfrom(512)
+            self.queries += 1
+            if self.drop or len(data) < 12:
+                continue
+            if self.delay:
+                time.sleep(self.delay)
+            # Same id and question, QR + RD + RA set, no answers
+            self.sock.sendto(data[:2] + b'\x81\x80' + data[4:6] + b'\x00\x00\x00\x00\x00\x00' + data[12:],
+                             client)
+
+
+class _BlobHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        url = urllib.parse.urlparse(self.path)
+        if url.path != '/blob':
+            self.send_error(404)
+            return
+        size = int(urllib.parse.parse_qs(url.query).get('size', ['1000000'])[0])
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/octet-stream')
+        self.send_header('Content-Length', str(size))
+        self.end_headers()
+        rate = self.server.rate_mbps
+        start = time.perf_counter()
+        sent = 0
+        chunk = b'\0' * CHUNK_SIZE
+        while sent < size:
+            part = chunk[:min(CHUNK_SIZE, size - sent)]
+            try:
+                self.wfile.write(part)
+            except OSError:
+                return
+            sent += len(part)
+            if rate:
+                # Pace the body so the client measures about `rate` Mbit/s
+                ahead = sent * 8 / (rate * 1e6) - (time.perf_counter() - start)
+                if ahead > 0:
+                    time.sleep(ahead)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_http(port=0, rate_mbps=0):
+    server = ThreadingHTTPServer(('127.0.0.1', port), _BlobHandler)
+    server.daemon_threads = True
+    server.rate_mbps = rate_mbps
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--dns-port', type=int, default=5353)
+    parser.add_argument('--http-port', type=int, default=8080)
+    parser.add_argument('--rate-mbps', type=float, default=0)
+    args = parser.parse_args()
+    dns = DnsServer(args.dns_port)
+    http = start_http(args.http_port, args.rate_mbps)
+    print(f'DNS on 127.0.0.1:{dns.port}, throughput URL '
+          f'http://127.0.0.1:{http.server_address[1]}/blob?size=5000000')
+    while True:
+        time.sleep(3600)
+
+
+if __name__ == '__main__':
+    main()
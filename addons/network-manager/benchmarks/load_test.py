@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""Load test for the web app: development server vs. gunicorn.
+
+Starts the app against the fake nmcli in each serving mode and hammers
+one endpoint (default /api/status) from N concurrent keep-alive clients,
+reporting throughput and latency percentiles. FAKE_NMCLI_DELAY makes
+every nmcli call slow, which is where the dev server falls behind.
+
+Usage: python3 benchmarks/load_test.py [--clients 50] [--duration 10]
+           [--mode development|production|both] [--path /api/status]
+"""
+import argparse
+import http.client
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from bench_status import WEB_DIR, install_fake_nmcli
+
+PORT = 18201
+
+
+def start_server(mode, port):
+    env = dict(os.environ, WEB_PORT=str(port), WEB_SERVER=mode)
+    if mode == 'development':
+        cmd = [sys.executable, 'app.py']
+    else:
+        cmd = [sys.executable, '-m', 'gunicorn', '--config', 'gunicorn.conf.py', 'app:app']
+    process = subprocess.Popen(cmd, cwd=WEB_DIR, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.time() + 15
+    while time.time() < deadline:
+        try:
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=1)
+            conn.request('GET', '/readyz')
+            if conn.getresponse().status == 200:
+                return process
+        except OSError:
+            time.sleep(0.2)
+    process.kill()
+    raise RuntimeError(f'{mode} server did not become ready')
+
+
+def client(port, path, stop_at, latencies, errors):
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+    while time.time() < stop_at:
+        start = time.perf_counter()
+        try:
+            conn.request('GET', path)
+            resp = conn.getresponse()
+            resp.read()
+            if resp.status != 200:
+                errors.append(resp.status)
+                continue
+        except (OSError, http.client.HTTPException) as e:
+            errors.append(type(e).__name__)
+            conn.close()
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+            continue
+        latencies.append(time.perf_counter() - start)
+    conn.close()
+
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * q))]
+
+
+def run(mode, args):
+    process = start_server(mode, PORT)
+    try:
+        latencies = []
+        errors = []
+        stop_at = time.time() + args.duration
+        threads = [threading.Thread(target=client, args=(PORT, args.path, stop_at, latencies, errors))
+                   for _ in range(args.clients)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        process.terminate()
+        process.wait(timeout=60)
+
+    latencies.sort()
+    print(f'{mode:>12} {len(latencies) / args.duration:>9.1f} '
+          f'{percentile(latencies, 0.5) * 1000:>8.1f} {percentile(latencies, 0.99) * 1000:>8.1f} '
+          f'{len(errors):>7}')
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--clients', type=int, default=50)
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--path', default='/api/status')
+    parser.add_argument('--mode', choices=('development', 'production', 'both'), default='both')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        install_fake_nmcli(tmpdir)
+        print(f'{args.clients} clients, {args.duration:.0f}s, GET {args.path}')
+        print(f'{"mode":>12} {"req/s":>9} {"p50 ms":>8} {"p99 ms":>8} {"errors":>7}')
+        modes = ('development', 'production') if args.mode == 'both' else (args.mode,)
+        for mode in modes:
+            run(mode, args)
+
+
+if __name__ == '__main__':
+    main()
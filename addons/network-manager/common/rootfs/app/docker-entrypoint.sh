@@ -15,6 +15,28 @@ if ! /app/config-validator.sh; then
     exit 1
 fi
 
+# 先启动 Web 管理界面，让端口尽早开始监听：下面的检查可能要等待数十秒，
+# 期间 /healthz 已可访问，/readyz 在能读取 NetworkManager 状态前返回 503
+# production: gunicorn 多线程模式；development: Flask 开发服务器
+if [ "${WEB_SERVER:-production}" = "development" ]; then
+    log INFO "启动 Web 管理界面 (Port 8201, 开发服务器)..."
+    python3 /app/web/app.py &
+else
+    log INFO "启动 Web 管理界面 (Port 8201, gunicorn)..."
+    gunicorn --config /app/web/gunicorn.conf.py --chdir /app/web app:app &
+fi
+WEB_PID=$!
+log DEBUG "Web 服务 PID: $WEB_PID"
+
+# 收到停止信号时转发给子进程，让 Web 服务完成正在进行的操作后再退出
+shutdown() {
+    log INFO "正在停止服务..."
+    kill -TERM $WEB_PID 2>/dev/null || true
+    wait $WEB_PID 2>/dev/null || true
+    exit 0
+}
+trap shutdown TERM INT
+
 # 检查 NetworkManager（通过 nmcli 连接到宿主机的 NetworkManager）
 # 注意：NetworkManager 服务在宿主机上运行，容器只需要 nmcli 客户端
 if ! check_network_manager; then
@@ -22,6 +44,7 @@ if ! check_network_manager; then
     log ERROR "1. 宿主机上 NetworkManager 服务正在运行"
     log ERROR "2. D-Bus socket 已正确挂载"
     log ERROR "3. 容器有足够的权限访问 D-Bus"
+    kill -TERM $WEB_PID 2>/dev/null || true
     exit 1
 fi
 
@@ -33,37 +56,22 @@ if ! check_wifi_device; then
     log WARNING "未找到 WiFi 设备，某些功能可能不可用"
 fi
 
-# 执行初始化配置
-if [ -n "$INITIAL_WIFI_SSID" ]; then
-    log INFO "执行初始化 WiFi 连接..."
-    
-    /app/network-manager.sh connect \
-        --ssid "$INITIAL_WIFI_SSID" \
-        --password "${INITIAL_WIFI_PASSWORD:-}" \
-        --ip-method "${DEFAULT_IP_METHOD:-dhcp}" \
-        --ip-address "${INITIAL_WIFI_IP_ADDRESS:-}" \
-        --gateway "${INITIAL_WIFI_GATEWAY:-}" \
-        --dns "${INITIAL_WIFI_DNS:-}" || {
-        log WARNING "初始化 WiFi 连接失败，继续运行..."
-    }
+# 初始化配置由 Web 服务在启动后应用（web/provisioning.py）：WIFI_NETWORKS_FILE
+# 中的全部网络，或 INITIAL_WIFI_* 指定的单个网络。已是目标状态时不重新激活
+if [ -n "$WIFI_NETWORKS_FILE" ] && [ -f "$WIFI_NETWORKS_FILE" ]; then
+    log INFO "将由 Web 服务应用 $WIFI_NETWORKS_FILE 中的 WiFi 配置"
+elif [ -n "$INITIAL_WIFI_SSID" ]; then
+    log INFO "将由 Web 服务连接初始 WiFi: $INITIAL_WIFI_SSID"
 fi
 
-# 启动监控服务（如果启用）
+# 自动重连由 Web 服务中的监控线程负责（web/reconnect.py），
+# 它订阅 NetworkManager 的状态变化，不再轮询 nmcli
 if [ "$AUTO_RECONNECT" = "true" ]; then
-    log INFO "启动自动重连监控服务..."
-    /app/network-manager.sh monitor &
-    MONITOR_PID=$!
-    log DEBUG "监控服务 PID: $MONITOR_PID"
+    log INFO "自动重连已启用"
 fi
 
 log INFO "Network Manager 启动完成"
 
-# 启动 Web 管理界面
-log INFO "启动 Web 管理界面 (Port 8201)..."
-python3 /app/web/app.py &
-WEB_PID=$!
-log DEBUG "Web 服务 PID: $WEB_PID"
-
 # 如果提供了命令，执行它；否则保持容器运行
 if [ $# -eq 0 ]; then
     # 没有提供命令，保持容器运行
@@ -292,7 +292,7 @@ delete_connection() {
     fi
 }
 
-# 监控连接
+# 监控连接（命令行调试用；容器内的自动重连由 web/reconnect.py 负责）
 monitor() {
     log INFO "开始监控网络连接..."
     
@@ -1,129 +1,216 @@
-from flask import Flask, render_template, request, jsonify
+from flask import Flask, Response, g, render_template, request, jsonify, stream_with_context
 import subprocess
 import json
+import os
 import re
+import threading
+import time
+
+import audit
+import events
+import executor
+import http_cache
+import known_networks
+import metrics
+import nmcli_parser
+import probes
+import profiles
+import provisioning
+import reconnect
+import signal_history
+import status_cache
+import wifi_scan
 
 app = Flask(__name__)
 
+# Upper bound for ?wait= on job long-polls
+SCAN_JOB_MAX_WAIT = 30
+# Desired-state document applied on start (see provisioning.py)
+NETWORKS_FILE = os.environ.get('WIFI_NETWORKS_FILE', '')
+# Seconds warm_up() waits for NetworkManager to answer
+STARTUP_NM_WAIT = 30
+
+server_state = {
+    'draining': False,
+    'warmed_up': False,
+}
+
 def run_nmcli(args):
     try:
-        result = subprocess.run(['nmcli'] + args, capture_output=True, text=True, check=True)
-        return result.stdout.strip()
-    except subprocess.CalledProcessError as e:
+        return executor.run(args)
+    except (subprocess.CalledProcessError, subprocess.TimeoutExpired):
         return None
 
-def parse_wifi_list(output):
-    lines = output.split('\n')
-    networks = []
-    if len(lines) < 2:
-        return networks
-    
-    # nmcli -t -f SSID,SIGNAL,SECURITY,BARS device wifi list
-    # The output format with -t is colon separated, but fields might contain colons (less likely for these fields but SSID can)
-    # Actually using -t is better for parsing.
-    # Command: nmcli -t -f SSID,SIGNAL,SECURITY,BARS device wifi list
-    
-    for line in lines:
-        if not line:
-            continue
-        # We need a robust way to parse. Let's assume -t output:
-        # SSID:SIGNAL:SECURITY:BARS
-        # Escaping might be an issue, but usually : is escaped as \:
-        # For simplicity, we can just split by : if we are careful, or run without -t and parse columns.
-        # Let's use the tabular output from nmcli -t
-        parts = line.split(':')
-        if len(parts) >= 3:
-            ssid = parts[0]
-            # Skip empty SSIDs
-            if not ssid:
-                continue
-                
-            # Handle potential duplicate SSIDs by keeping the one with stronger signal? 
-            # Or just return all unique SSIDs.
-            
-            # Reconstruct if split caused issues (unlikely with selected fields unless SSID has :)
-            # A safer way might be to use CSV output if available, but nmcli doesn't standardly output CSV.
-            # Let's just join the first N-3 parts as SSID in case SSID has colons.
-            ssid = ":".join(parts[:-3])
-            signal = parts[-3]
-            security = parts[-2]
-            bars = parts[-1]
-            
-            networks.append({
-                'ssid': ssid,
-                'signal': signal,
-                'security': security,
-                'bars': bars
-            })
-            
-    # Deduplicate by SSID, keeping strongest signal
-    unique_networks = {}
-    for net in networks:
-        ssid = net['ssid']
-        if ssid not in unique_networks:
-            unique_networks[ssid] = net
-        else:
-            if int(net['signal']) > int(unique_networks[ssid]['signal']):
-                unique_networks[ssid] = net
-    
-    return list(unique_networks.values())
-
-def parse_wifi_list_with_inuse(output):
-    lines = output.split('\n')
-    networks = []
-    if len(lines) < 1:
-        return networks
-    
-    # nmcli -t -f IN-USE,SSID,SIGNAL,SECURITY,BARS device wifi list
-    # IN-USE is '*' or empty
-    
-    for line in lines:
-        if not line:
-            continue
-            
-        parts = line.split(':')
-        # IN-USE:SSID:SIGNAL:SECURITY:BARS
-        # But SSID can contain colons.
-        # We know IN-USE is first, SIGNAL/SECURITY/BARS are last 3.
-        # Everything in between is SSID.
-        
-        if len(parts) >= 5:
-            in_use = parts[0] == '*'
-            signal = parts[-3]
-            security = parts[-2]
-            bars = parts[-1]
-            ssid = ":".join(parts[1:-3])
-            
-            # Skip empty SSIDs
-            if not ssid:
-                continue
-            
-            networks.append({
-                'ssid': ssid,
-                'signal': signal,
-                'security': security,
-                'bars': bars,
-                'in_use': in_use
-            })
-            
-    # Deduplicate by SSID, keeping strongest signal
-    # If one is in_use, we should prefer keeping that info? 
-    # Actually, we filter out in_use later, so it matters less, 
-    # but let's keep the one that is in use if duplicates exist.
-    unique_networks = {}
-    for net in networks:
-        ssid = net['ssid']
-        if ssid not in unique_networks:
-            unique_networks[ssid] = net
-        else:
-            # If new one is in use, replace
-            if net['in_use']:
-                unique_networks[ssid] = net
-            # If current is not in use, and new one is stronger, replace
-            elif not unique_networks[ssid]['in_use'] and int(net['signal']) > int(unique_networks[ssid]['signal']):
-                unique_networks[ssid] = net
-                
-    return list(unique_networks.values())
+BSSID_RE = re.compile(r'^[0-9A-Fa-f]{2}(:[0-9A-Fa-f]{2}){5}$')
+# Passed to nmcli as arguments; anything else is rejected before it gets there
+STRING_FIELDS = ('ssid', 'password', 'bssid', 'ip', 'gateway', 'dns', 'method', 'band')
+DEVICE_SHOW_FIELDS = 'GENERAL.DEVICE,GENERAL.TYPE,GENERAL.STATE,GENERAL.CONNECTION,IP4.ADDRESS,IP6.ADDRESS'
+VIRTUAL_DEVICE_TYPES = ('bridge', 'loopback', 'tun', 'veth', 'dummy', 'bond', 'team', 'wifi-p2p')
+VIRTUAL_DEVICE_PREFIXES = ('docker', 'br-', 'veth', 'lo', 'virbr', 'tun', 'tap', 'vnet', 'p2p-dev-')
+
+metrics.describe('http_request_duration_seconds', 'histogram', 'API request latency per route')
+metrics.describe('status_cache_reads_total', 'counter', 'Status snapshot reads by result (hit/miss/shared)')
+metrics.describe('scan_cache_reads_total', 'counter', 'Scan result reads by result (hit/miss)')
+metrics.describe('wifi_scan_networks', 'histogram', 'Networks returned per scan')
+metrics.describe('wifi_connect_total', 'counter', 'Connect attempts by method and result')
+metrics.describe('wifi_provision_total', 'counter', 'Provisioning runs by result')
+metrics.add_collector(executor.metric_lines)
+metrics.add_collector(probes.metric_lines)
+metrics.add_collector(lambda: [
+    '# HELP sse_subscribers Connected server-sent event subscribers',
+    '# TYPE sse_subscribers gauge',
+    f'sse_subscribers {events.subscriber_count()}',
+    '# HELP sse_rejected_total Event streams refused because SSE_MAX_SUBSCRIBERS were open',
+    '# TYPE sse_rejected_total counter',
+    f'sse_rejected_total {events.rejected_count()}',
+])
+audit.set_error_formatter(executor.describe_error)
+
+@app.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+    metrics.start_profile(request.headers.get('X-Profile') == '1')
+
+@app.after_request
+def record_request(response):
+    elapsed = time.perf_counter() - g.request_start
+    route = request.url_rule.rule if request.url_rule else 'unmatched'
+    metrics.observe('http_request_duration_seconds', elapsed,
+                    {'route': route, 'method': request.method, 'status': response.status_code})
+    timings = metrics.finish_profile()
+    if timings is not None:
+        response.headers['Server-Timing'] = metrics.server_timing(timings, elapsed)
+    return response
+
+@app.route('/healthz')
+def liveness():
+    """Liveness: the process is up and serving requests."""
+    return jsonify({'status': 'ok'})
+
+@app.route('/readyz')
+def readiness():
+    """Readiness: NetworkManager answers and the app is not shutting down."""
+    if server_state['draining']:
+        return jsonify({'status': 'draining'}), 503
+    try:
+        snapshot, source = status_cache.get_snapshot()
+    except Exception as e:
+        return jsonify({'status': 'unavailable', 'error': str(e)}), 503
+    return jsonify({'status': 'ready', 'source': source, 'watching': status_cache.is_watching(),
+                    'warmed_up': server_state['warmed_up']})
+
+def start_background():
+    """Start background services; called once per serving process."""
+    # Listener first, so the reconnect monitor sees the initial refresh
+    reconnect.start()
+    status_cache.start()
+    wifi_scan.start()
+    probes.start()
+    # The port is already listening; warming up must not hold up requests
+    threading.Thread(target=warm_up, name='warm-up', daemon=True).start()
+
+def warm_up():
+    """Prime what the first requests need, then apply the startup networks.
+
+    The container starts the web service before NetworkManager is known
+    to answer, so this waits for it (like the entrypoint used to) before
+    the first scan and the provisioning job.
+    """
+    try:
+        app.jinja_env.get_template('index.html')
+        signal_history.load()
+        if not wait_for_network_manager():
+            print(f"NetworkManager did not answer within {STARTUP_NM_WAIT}s")
+            return
+        # Lists NetworkManager's AP cache, no rescan; the status snapshot is
+        # kept by the watcher from here on
+        wifi_scan.get_latest()
+        prune_duplicate_profiles()
+        if NETWORKS_FILE and os.path.exists(NETWORKS_FILE):
+            provision_from_file(NETWORKS_FILE)
+        elif os.environ.get('INITIAL_WIFI_SSID'):
+            provision_initial_network()
+    except Exception as e:
+        print(f"Warm-up failed: {e}")
+    finally:
+        server_state['warmed_up'] = True
+
+def wait_for_network_manager():
+    deadline = time.time() + STARTUP_NM_WAIT
+    while True:
+        try:
+            status_cache.get_snapshot()
+            return True
+        except Exception:
+            if time.time() >= deadline:
+                return False
+            time.sleep(1)
+
+def active_uuids():
+    """UUIDs of the active connections in the status snapshot."""
+    snapshot, _ = status_cache.get_snapshot()
+    return {conn['uuid'] for conn in snapshot['active_connections']}
+
+def prune_duplicate_profiles():
+    """Delete the "SSID 1", "SSID 2" ... copies earlier connects left behind."""
+    try:
+        known_networks.prune(active_uuids())
+    except Exception as e:
+        print(f"Pruning duplicate profiles failed: {e}")
+
+def provision_from_file(path):
+    try:
+        with open(path) as f:
+            document = json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"Reading {path} failed: {e}")
+        return
+    error = validate_provision(document)
+    if error:
+        print(f"Ignoring {path}: {error}")
+        return
+    job = executor.submit_job('provision', do_provision, document)
+    print(f"Applying {len(document['networks'])} networks from {path} (job {job['id']})")
+
+def provision_initial_network():
+    """Apply the INITIAL_WIFI_* network as a one-network document.
+
+    Provisioning leaves an unchanged, already active profile alone, so a
+    restart does not drop the link to connect it again.
+    """
+    static = os.environ.get('DEFAULT_IP_METHOD') == 'static' or os.environ.get('INITIAL_WIFI_IP_ADDRESS')
+    network = {
+        'ssid': os.environ['INITIAL_WIFI_SSID'],
+        'password': os.environ.get('INITIAL_WIFI_PASSWORD') or None,
+        'method': 'manual' if static else 'auto',
+        'ip': os.environ.get('INITIAL_WIFI_IP_ADDRESS', ''),
+        'gateway': os.environ.get('INITIAL_WIFI_GATEWAY', ''),
+        'dns': os.environ.get('INITIAL_WIFI_DNS', ''),
+    }
+    document = {'networks': [network], 'activate': network['ssid']}
+    error = validate_provision(document)
+    if error:
+        print(f"Ignoring INITIAL_WIFI_* settings: {error}")
+        return
+    job = executor.submit_job('provision', do_provision, document)
+    print(f"Connecting to {network['ssid']} (job {job['id']})")
+
+def begin_shutdown():
+    """Stop reporting ready and close event streams; requests in flight still finish."""
+    server_state['draining'] = True
+    events.close_all()
+
+def shutdown(timeout=30):
+    """Graceful shutdown: wait for queued and running nmcli jobs to finish."""
+    begin_shutdown()
+    signal_history.save()
+    if not executor.shutdown(timeout):
+        print("Shutdown timeout reached with nmcli operations still running")
+    audit.flush()
+
+@app.route('/metrics')
+def get_metrics():
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
 
 @app.route('/')
 def index():
@@ -131,200 +218,582 @@ def index():
 
 @app.route('/api/wifi/scan')
 def scan_wifi():
-    # nmcli -t -f SSID,SIGNAL,SECURITY,BARS device wifi list
-    # We allow rescan.
+    """Return the last scan result right away.
+
+    A background rescan is started when the result is older than the
+    minimum rescan interval; X-Scan-Job names it so clients can poll it.
+    With ?extended=1 every SSID lists all of its access points (BSSID,
+    channel, frequency, band, rate, signal). Answers If-None-Match with
+    304 while the result is unchanged (see http_cache).
+    """
     try:
-        subprocess.run(['nmcli', 'device', 'wifi', 'rescan'], check=False) # Rescan might fail if too frequent
-        
-        # Use IN-USE field to identify connected networks
-        # IN-USE field value '*' indicates currently in use
-        output_with_inuse = run_nmcli(['-t', '-f', 'IN-USE,SSID,SIGNAL,SECURITY,BARS', 'device', 'wifi', 'list'])
-        if output_with_inuse:
-            networks = parse_wifi_list_with_inuse(output_with_inuse)
-            # Filter out connected networks and remove in_use field
-            filtered_networks = []
-            for net in networks:
-                if not net.get('in_use', False):
-                    # Remove in_use field, frontend doesn't need this info
-                    filtered_net = {
-                        'ssid': net['ssid'],
-                        'signal': net['signal'],
-                        'security': net['security'],
-                        'bars': net['bars']
-                    }
-                    filtered_networks.append(filtered_net)
-            return jsonify(filtered_networks)
-              
-        # Fallback: if IN-USE field is unavailable (older nmcli versions)
-        output = run_nmcli(['-t', '-f', 'SSID,SIGNAL,SECURITY,BARS', 'device', 'wifi', 'list'])
-        if output is None:
-            return jsonify({'error': 'Failed to scan WiFi'}), 500
-        
-        networks = parse_wifi_list(output)
-        return jsonify(networks)
+        if wifi_scan.is_stale():
+            wifi_scan.request_scan()
+        extended = request.args.get('extended') == '1'
+        networks, scanned_at, version = wifi_scan.get_versioned(extended)
+        response = http_cache.json_response('scan-extended' if extended else 'scan', version, networks)
+        response.headers['X-Scan-Age'] = f"{time.time() - scanned_at:.3f}"
+        job_id = wifi_scan.running_job_id()
+        if job_id is not None:
+            response.headers['X-Scan-Job'] = str(job_id)
+        return response
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/wifi/scan', methods=['POST'])
+def start_wifi_scan():
+    """Start a rescan job (or join the running one) without waiting for it."""
+    return jsonify(wifi_scan.request_scan()), 202
+
+@app.route('/api/wifi/scan/jobs/<int:job_id>')
+def get_wifi_scan_job(job_id):
+    """Poll a scan job; ?wait=N long-polls up to N seconds for it to finish."""
+    wait = min(request.args.get('wait', 0, type=float), SCAN_JOB_MAX_WAIT)
+    job = wifi_scan.get_job(job_id, wait=wait)
+    if job is None:
+        return jsonify({'error': 'Scan job not found'}), 404
+    if job['status'] == 'done':
+        networks, scanned_at = wifi_scan.get_latest()
+        job['networks'] = networks
+        job['age'] = round(time.time() - scanned_at, 3)
+    return jsonify(job)
+
+def list_wifi(rescan):
+    """Return (networks, access points grouped by SSID) for wifi_scan."""
+    # nmcli -t -f IN-USE,BSSID,SSID,CHAN,FREQ,RATE,SIGNAL,SECURITY,BARS device wifi list --rescan yes|no
+    # With --rescan yes nmcli waits for the scan to finish, so a single call does both.
+    fields = 'IN-USE,BSSID,SSID,CHAN,FREQ,RATE,SIGNAL,SECURITY,BARS'
+    output_with_inuse = run_nmcli(['-t', '-f', fields, 'device', 'wifi', 'list',
+                                   '--rescan', 'yes' if rescan else 'no'])
+    if output_with_inuse is None and rescan:
+        # Rescan might fail if too frequent, list what NetworkManager already has
+        output_with_inuse = run_nmcli(['-t', '-f', fields, 'device', 'wifi', 'list', '--rescan', 'no'])
+
+    # Use IN-USE field to identify connected networks
+    # IN-USE field value '*' indicates currently in use
+    if output_with_inuse:
+        access_points = nmcli_parser.parse_access_points(output_with_inuse, fields)
+        # Every access point, connected one included, goes into the signal history
+        signal_history.record(access_points)
+        networks = nmcli_parser.best_per_ssid(access_points)
+    else:
+        access_points = []
+        # Fallback: if IN-USE field is unavailable (older nmcli versions)
+        fields = 'SSID,SIGNAL,SECURITY,BARS'
+        output = run_nmcli(['-t', '-f', fields, 'device', 'wifi', 'list'])
+        if output is None:
+            raise RuntimeError('Failed to scan WiFi')
+        networks = nmcli_parser.parse_wifi_list(output, fields)
+
+    # Filter out connected networks, frontend doesn't need the in_use field
+    return [
+        {'ssid': net.ssid, 'signal': net.signal, 'security': net.security, 'bars': net.bars,
+         'bssid': net.bssid, 'band': signal_history.band_for(net.freq)}
+        for net in networks if not net.in_use
+    ], group_access_points(access_points)
+
+def group_access_points(access_points):
+    """Extended scan result: one entry per SSID with all of its radios, strongest first."""
+    groups = []
+    for ssid, aps in nmcli_parser.group_by_ssid(access_points).items():
+        aps.sort(key=lambda ap: ap.signal, reverse=True)
+        radios = [
+            {'bssid': ap.bssid, 'chan': ap.chan, 'freq': ap.freq, 'band': signal_history.band_for(ap.freq),
+             'rate': ap.rate, 'signal': ap.signal, 'in_use': ap.in_use}
+            for ap in aps
+        ]
+        groups.append({
+            'ssid': ssid,
+            'security': aps[0].security,
+            'signal': aps[0].signal,
+            'in_use': any(ap.in_use for ap in aps),
+            'bands': sorted({radio['band'] for radio in radios if radio['band']}),
+            'access_points': radios,
+        })
+    return groups
+
+wifi_scan.set_scanner(list_wifi)
+
+@app.route('/api/wifi/history')
+def get_signal_history_ssids():
+    """SSIDs that have signal history, with their number of access points."""
+    return jsonify(signal_history.ssids())
+
+@app.route('/api/wifi/history/<path:ssid>')
+def get_signal_history(ssid):
+    """Signal statistics for an SSID; ?window=N uses the last N seconds, ?samples=1 adds the series."""
+    window = request.args.get('window', type=float)
+    include_samples = request.args.get('samples') == '1'
+    result = signal_history.stats(ssid, window=window, include_samples=include_samples)
+    if result is None:
+        return jsonify({'error': 'No signal history for this SSID'}), 404
+    return jsonify(result)
+
+@app.route('/api/wifi/recommend')
+def recommend_access_point():
+    """Access points ranked by signal history (?ssid= to limit to one network)."""
+    ranked = signal_history.recommend(ssid=request.args.get('ssid') or None,
+                                      window=request.args.get('window', type=float),
+                                      limit=request.args.get('limit', 10, type=int))
+    return jsonify(ranked)
+
 @app.route('/api/wifi/connect', methods=['POST'])
 def connect_wifi():
     """Connect to WiFi network
-    
-    For DHCP mode: use nmcli device wifi connect directly
-    For Static IP mode: use two-step operation to avoid parameter errors
-        1. Connect with DHCP first to establish connection
-        2. Modify connection configuration to static IP
-        3. Reactivate connection to apply new config
+
+    For DHCP mode: bring a saved profile of the SSID up by UUID (see
+    known_networks.py), or use nmcli device wifi connect for a new network
+    For Static IP mode: create (or update) the profile with all ipv4
+    settings in one call and activate it once, see profiles.py
+
+    With "async": true the connection runs as a job: the job is returned
+    right away (202) and its result is polled from /api/jobs/<id>.
     """
-    data = request.json
+    data = request.json or {}
+    error = validate_connect(data)
+    if error:
+        return jsonify({'error': error}), 400
+
+    if data.get('async'):
+        return start_job('connect', do_connect, data)
+
+    try:
+        return jsonify(do_connect(data))
+    except executor.QueueFull as e:
+        return jsonify({'error': str(e)}), 503
+    except (subprocess.CalledProcessError, subprocess.TimeoutExpired) as e:
+        return jsonify({'error': f"Connection failed: {executor.describe_error(e)}"}), 500
+    except Exception as e:
+        return jsonify({'error': f"Unknown error: {str(e)}"}), 500
+
+def validate_connect(data):
+    if not isinstance(data, dict):
+        return 'Request body must be a JSON object'
+    for field in STRING_FIELDS:
+        if data.get(field) is not None and not isinstance(data[field], str):
+            return f'{field} must be a string'
+    if not data.get('ssid'):
+        return 'SSID is required'
+    if data.get('bssid') and not BSSID_RE.match(data['bssid']):
+        return 'BSSID must look like AA:BB:CC:DD:EE:FF'
+    if data.get('band') and data['band'] not in signal_history.BAND_BONUS:
+        return f"Band must be one of {', '.join(signal_history.BAND_BONUS)}"
+    if data.get('method', 'auto') == 'manual' and (not data.get('ip') or not data.get('gateway')):
+        return 'IP and Gateway are required for static IP configuration'
+    return None
+
+def do_connect(data):
+    # The request as sent (password redacted) and the nmcli calls it made
+    with audit.operation('wifi.connect', data) as op:
+        op['result'] = connect_network(data)
+    return op['result']
+
+def connect_network(data):
     ssid = data.get('ssid')
     password = data.get('password')
     method = data.get('method', 'auto') # auto or manual
-    
-    if not ssid:
-        return jsonify({'error': 'SSID is required'}), 400
+    # Pin the profile to one access point: given directly, or the best one on the requested band
+    bssid = data.get('bssid') or best_bssid_on_band(ssid, data.get('band'))
 
     try:
         if method == 'manual':
-            # Static IP mode: two-step operation
-            ip = data.get('ip')
-            gateway = data.get('gateway')
-            dns = data.get('dns')
-            
-            if not ip or not gateway:
-                return jsonify({'error': 'IP and Gateway are required for static IP configuration'}), 400
-            
-            # Step 1: Connect with DHCP first
-            cmd_connect = ['nmcli', 'device', 'wifi', 'connect', ssid]
-            if password:
-                cmd_connect.extend(['password', password])
-            
-            result = subprocess.run(cmd_connect, capture_output=True, text=True, check=True)
-            
-            # Step 2: Modify connection to static IP
-            # Note: connection name is usually the SSID
-            connection_name = ssid
-            
-            # Modify IP method to manual
-            subprocess.run(['nmcli', 'connection', 'modify', connection_name, 
-                          'ipv4.method', 'manual'], 
-                          check=True, capture_output=True, text=True)
-            
-            # Set IP address
-            subprocess.run(['nmcli', 'connection', 'modify', connection_name, 
-                          'ipv4.addresses', ip], 
-                          check=True, capture_output=True, text=True)
-            
-            # Set Gateway
-            subprocess.run(['nmcli', 'connection', 'modify', connection_name, 
-                          'ipv4.gateway', gateway], 
-                          check=True, capture_output=True, text=True)
-            
-            # Set DNS (if provided)
-            if dns:
-                # Remove spaces and handle comma separated DNS
-                dns_clean = dns.replace(' ', '')
-                subprocess.run(['nmcli', 'connection', 'modify', connection_name, 
-                              'ipv4.dns', dns_clean], 
-                              check=True, capture_output=True, text=True)
-            
-            # Step 3: Reactivate connection to apply new config
-            subprocess.run(['nmcli', 'connection', 'up', connection_name], 
-                          check=True, capture_output=True, text=True)
-            
-            return jsonify({'status': 'success', 'message': 'Connected and configured with static IP'})
+            settings = profiles.ipv4_settings('manual', data.get('ip'), data.get('gateway'), data.get('dns'))
+            key_mgmt = key_mgmt_for(ssid)
+            settings += profiles.security_settings(password, key_mgmt)
+            settings += profiles.wireless_settings(bssid)
+            # The saved profile of this SSID, whatever its name
+            uuid = profiles.apply_and_activate(ssid, settings, uuid=known_networks.uuid_for(ssid))
+            known_networks.note_connected(uuid, ssid, ipv4_method='manual', bssid=(bssid or '').upper(),
+                                          **({'security': key_mgmt} if password else {}))
+            message = 'Connected and configured with static IP'
         else:
-            # DHCP mode: connect directly
-            cmd = ['nmcli', 'device', 'wifi', 'connect', ssid]
-            if password:
-                cmd.extend(['password', password])
-            
-            subprocess.run(cmd, check=True, capture_output=True, text=True)
-            return jsonify({'status': 'success', 'message': 'Connected'})
-            
-    except subprocess.CalledProcessError as e:
-        error_msg = e.stderr if e.stderr else str(e)
-        return jsonify({'error': f"Connection failed: {error_msg}"}), 500
+            known = known_networks.lookup(ssid)
+            if known is not None:
+                # Known network: activate the saved profile, no scan lookup, no new profile
+                known_networks.activate(known, password, bssid, key_mgmt_for)
+            else:
+                # DHCP mode: connect directly
+                cmd = ['device', 'wifi', 'connect', ssid]
+                if password:
+                    cmd.extend(['password', password])
+                if bssid:
+                    cmd.extend(['bssid', bssid])
+                executor.run(cmd)
+                # nmcli added a profile for it
+                known_networks.invalidate()
+            message = 'Connected'
+    except Exception:
+        metrics.inc('wifi_connect_total', {'method': method, 'result': 'failure'})
+        raise
+    finally:
+        # Device state changed (or may have), don't serve the old snapshot
+        status_cache.invalidate()
+
+    metrics.inc('wifi_connect_total', {'method': method, 'result': 'success'})
+    if bssid:
+        message += f' via {bssid}'
+    elif data.get('band'):
+        message += f" (no {data['band']} access point seen, band preference ignored)"
+    return {'status': 'success', 'message': message, 'bssid': bssid}
+
+def best_bssid_on_band(ssid, band):
+    """Best-ranked access point of `ssid` on `band` from the signal history, or None."""
+    if not band:
+        return None
+    for entry in signal_history.recommend(ssid=ssid, limit=signal_history.MAX_BSSIDS):
+        if entry['band'] == band:
+            return entry['bssid']
+    return None
+
+def key_mgmt_for(ssid):
+    """Pick wifi-sec.key-mgmt from the last scan: 'sae' for WPA3-only networks."""
+    networks, _ = wifi_scan.get_latest()
+    for net in networks:
+        if net['ssid'] == ssid:
+            security = net['security']
+            if 'WPA3' in security and 'WPA2' not in security and 'WPA1' not in security:
+                return 'sae'
+            break
+    return 'wpa-psk'
+
+@app.route('/api/wifi/known')
+def get_known_networks():
+    """Saved Wi-Fi profiles by SSID (best first), and the duplicates prune would delete"""
+    try:
+        # Active profiles are kept, as prune() does at warm-up
+        duplicates = known_networks.duplicates(active_uuids()) if known_networks.ENABLED else []
+        return jsonify({'enabled': known_networks.ENABLED, 'profiles': known_networks.all_profiles(),
+                        'duplicates': duplicates})
+    except (subprocess.CalledProcessError, subprocess.TimeoutExpired) as e:
+        return jsonify({'error': executor.describe_error(e)}), 500
+
+@app.route('/api/wifi/provision', methods=['POST'])
+def provision_wifi():
+    """Bring the saved Wi-Fi profiles to a desired state in one batch
+
+    The body is a desired-state document (see provisioning.py). Only the
+    differences to the saved profiles are applied and at most one
+    profile is activated at the end. "dry_run": true returns the plan
+    without changing anything; "async": true runs it as a job.
+    """
+    document = request.json or {}
+    error = validate_provision(document)
+    if error:
+        return jsonify({'error': error}), 400
+
+    if document.get('async') and not document.get('dry_run'):
+        return start_job('provision', do_provision, document)
+
+    try:
+        return jsonify(do_provision(document))
+    except executor.QueueFull as e:
+        return jsonify({'error': str(e)}), 503
+    except (subprocess.CalledProcessError, subprocess.TimeoutExpired) as e:
+        return jsonify({'error': f"Provisioning failed, changes rolled back: {executor.describe_error(e)}"}), 500
     except Exception as e:
         return jsonify({'error': f"Unknown error: {str(e)}"}), 500
 
+def validate_provision(document):
+    if not isinstance(document, dict):
+        return 'Request body must be a JSON object'
+    networks = document.get('networks')
+    if not isinstance(networks, list):
+        return 'networks must be a list'
+    seen = set()
+    for i, network in enumerate(networks):
+        if not isinstance(network, dict):
+            return f'networks[{i}] must be an object'
+        error = validate_connect(network)
+        if error:
+            return f'networks[{i}]: {error}'
+        if network.get('band'):
+            return f'networks[{i}]: band is not supported here, pin an access point with bssid'
+        if network['ssid'] in seen:
+            return f"networks[{i}]: duplicate SSID {network['ssid']}"
+        seen.add(network['ssid'])
+        priority = network.get('priority', 0)
+        if not isinstance(priority, int) or isinstance(priority, bool):
+            return f'networks[{i}]: priority must be an integer'
+        if not isinstance(network.get('autoconnect', True), bool):
+            return f'networks[{i}]: autoconnect must be true or false'
+    activate = document.get('activate')
+    if activate not in (None, False) and activate not in seen:
+        return 'activate must be the SSID of one of the networks, or false'
+    return None
+
+def do_provision(document):
+    with audit.operation('wifi.provision', document) as op:
+        op['result'] = apply_provision(document)
+    return op['result']
+
+def apply_provision(document):
+    # Grouped access points, unlike the scan list, include the connected network
+    groups, _ = wifi_scan.get_access_points()
+    try:
+        active = active_uuids()
+    except Exception:
+        active = set()
+    plan = provisioning.plan(document, visible_ssids={group['ssid'] for group in groups},
+                             active_uuids=active, key_mgmt_for=key_mgmt_for)
+    if document.get('dry_run'):
+        return {'status': 'success', 'dry_run': True, 'plan': provisioning.describe(plan)}
+
+    # No reconnect attempts while profiles change under the monitor
+    reconnect.hold()
+    try:
+        activated = provisioning.apply(plan)
+    except Exception:
+        metrics.inc('wifi_provision_total', {'result': 'failure'})
+        raise
+    finally:
+        status_cache.invalidate()
+        known_networks.invalidate()
+        try:
+            # Let the monitor see the new state before it may act again
+            status_cache.refresh()
+        except Exception as e:
+            print(f"Status refresh after provisioning failed: {e}")
+        reconnect.release()
+    metrics.inc('wifi_provision_total', {'result': 'success'})
+    return {'status': 'success', 'activated': activated, 'plan': provisioning.describe(plan)}
+
 @app.route('/api/wifi/disconnect', methods=['POST'])
 def disconnect_wifi():
-    """Disconnect WiFi connection"""
-    data = request.json
+    """Disconnect WiFi connection ("async": true runs it as a job)"""
+    data = request.json or {}
     device = data.get('device')
-    
+
     if not device:
         return jsonify({'error': 'Device is required'}), 400
-    
+
+    if data.get('async'):
+        return start_job('disconnect', do_disconnect, device)
+
+    try:
+        return jsonify(do_disconnect(device))
+    except executor.QueueFull as e:
+        return jsonify({'error': str(e)}), 503
+    except (subprocess.CalledProcessError, subprocess.TimeoutExpired) as e:
+        return jsonify({'error': f"Failed to disconnect: {executor.describe_error(e)}"}), 500
+
+def do_disconnect(device):
+    # A requested disconnect must not be undone by the reconnect monitor
+    reconnect.pause()
+    try:
+        with audit.operation('wifi.disconnect', {'device': device}):
+            # Use nmcli device disconnect command
+            executor.run(['device', 'disconnect', device])
+        return {'status': 'success'}
+    finally:
+        status_cache.invalidate()
+
+def start_job(kind, fn, *args):
+    try:
+        return jsonify(executor.submit_job(kind, fn, *args)), 202
+    except executor.QueueFull as e:
+        return jsonify({'error': str(e)}), 503
+
+@app.route('/api/jobs/<int:job_id>')
+def get_job(job_id):
+    """Poll a connect/disconnect job; ?wait=N long-polls up to N seconds."""
+    wait = min(request.args.get('wait', 0, type=float), SCAN_JOB_MAX_WAIT)
+    job = executor.get_job(job_id, wait=wait)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job)
+
+@app.route('/api/jobs/<int:job_id>', methods=['DELETE'])
+def cancel_job(job_id):
+    job = executor.cancel_job(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job)
+
+@app.route('/api/executor/stats')
+def get_executor_stats():
+    return jsonify(executor.stats())
+
+@app.route('/api/reconnect')
+def get_reconnect_stats():
+    """Auto-reconnect state: last good network/BSSID, drops, attempts, backoff."""
+    return jsonify(reconnect.stats())
+
+@app.route('/api/probe')
+def get_probe_stats():
+    """Link quality: latest probe, degraded flag, thresholds, next scheduled probe."""
+    return jsonify(probes.stats())
+
+@app.route('/api/probe', methods=['POST'])
+def run_probe():
+    """Probe the link now (rate limited).
+
+    {"throughput": true} adds a throughput test against PROBE_THROUGHPUT_URL;
+    "wait": N waits up to N seconds for the result (200), otherwise the
+    probe runs in the background (202). Too soon after the last probe the
+    answer is 429 with the last result.
+    """
+    data = request.json or {}
+    throughput = bool(data.get('throughput'))
+    if throughput and not probes.THROUGHPUT_URL:
+        return jsonify({'error': 'PROBE_THROUGHPUT_URL is not set'}), 400
+    wait = data.get('wait') or 0
+    if isinstance(wait, bool) or not isinstance(wait, (int, float)):
+        return jsonify({'error': 'wait must be a number of seconds'}), 400
+    wait = min(wait, SCAN_JOB_MAX_WAIT)
+    outcome = probes.request_probe(throughput=throughput, wait=wait)
+    if outcome['status'] == 'rate_limited':
+        response = jsonify(outcome)
+        response.headers['Retry-After'] = str(max(1, round(outcome['retry_after'])))
+        return response, 429
+    return jsonify(outcome), 200 if outcome['status'] == 'done' else 202
+
+@app.route('/api/probe/history')
+def get_probe_history():
+    """Recorded probe results, oldest first (?limit=N for the last N)."""
+    return jsonify(probes.history(request.args.get('limit', probes.HISTORY, type=int)))
+
+@app.route('/api/audit')
+def get_audit_log():
+    """Stream audit records as JSON lines (application/x-ndjson), oldest first.
+
+    Filters: ?type= (repeat or comma-separate for several), ?since= and
+    ?until= (Unix seconds), ?outcome=success|failure, ?limit=N.
+    """
+    types = {t for value in request.args.getlist('type') for t in value.split(',') if t}
     try:
-        # Use nmcli device disconnect command
-        subprocess.run(['nmcli', 'device', 'disconnect', device], 
-                      check=True, capture_output=True, text=True)
-        return jsonify({'status': 'success'})
-    except subprocess.CalledProcessError as e:
-        return jsonify({'error': f"Failed to disconnect: {e.stderr}"}), 500
+        since, until = time_arg('since'), time_arg('until')
+    except ValueError:
+        return jsonify({'error': 'since and until must be Unix timestamps'}), 400
+    records = audit.query(types=types or None, since=since, until=until,
+                          outcome=request.args.get('outcome') or None,
+                          limit=request.args.get('limit', type=int))
+    return Response(stream_with_context(records), mimetype='application/x-ndjson')
+
+def time_arg(name):
+    # Unlike args.get(type=float), a bad value is an error instead of no filter
+    value = request.args.get(name)
+    return float(value) if value else None
+
+@app.route('/api/audit/stats')
+def get_audit_stats():
+    """Audit log state: file sizes, records written, pending and dropped."""
+    return jsonify(audit.stats())
 
 @app.route('/api/status')
 def get_status():
-    # Get device status
-    # nmcli -t -f DEVICE,TYPE,STATE,CONNECTION device status
+    # Answered from the status snapshot; see status_cache for how it is kept fresh
     try:
-        output = run_nmcli(['-t', '-f', 'DEVICE,TYPE,STATE,CONNECTION,IP4.ADDRESS', 'device', 'status'])
-        # Note: IP4.ADDRESS might need device show for more details
-        
-        # Better: nmcli -t -f DEVICE,TYPE,STATE,CONNECTION device
-        dev_output = run_nmcli(['-t', '-f', 'DEVICE,TYPE,STATE,CONNECTION', 'device'])
-        
-        devices = []
-        if dev_output:
-             for line in dev_output.split('\n'):
-                if not line: continue
-                parts = line.split(':')
-                if len(parts) >= 4:
-                    dev_name = parts[0]
-                    dev_type = parts[1]
-                    state = parts[2]
-                    conn = parts[3]
-                    
-                    # Filtering logic
-                    # 1. Skip if type is explicitly unwanted
-                    if dev_type in ['bridge', 'loopback', 'tun', 'veth', 'dummy', 'bond', 'team', 'wifi-p2p']:
-                        continue
-                        
-                    # 2. Skip based on name prefixes commonly used for virtual interfaces
-                    if dev_name.startswith(('docker', 'br-', 'veth', 'lo', 'virbr', 'tun', 'tap', 'vnet', 'p2p-dev-')):
-                        continue
-                        
-                    # 3. Explicitly allow wifi, ethernet, gsm, cdma (and maybe others that are physical)
-                    # or just rely on the exclusions above. 
-                    # Let's be safer: if it's not wifi/ethernet/gsm/cdma, double check.
-                    # But for now, the exclusion list is robust for the user's request.
-                    
-                    # Get IP for this device
-                    ip_info = query_ip(dev_name)
-                    
-                    devices.append({
-                        'device': dev_name,
-                        'type': dev_type,
-                        'state': state,
-                        'connection': conn,
-                        'ip': ip_info
-                    })
-        return jsonify(devices)
+        snapshot, source = status_cache.get_snapshot()
+        return snapshot_response('status', snapshot['devices'], snapshot, source)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-def query_ip(interface):
-    # nmcli -t -f IP4.ADDRESS device show <interface>
+@app.route('/api/connections/active')
+def get_active_connections():
     try:
-        out = run_nmcli(['-t', '-f', 'IP4.ADDRESS', 'device', 'show', interface])
-        if out:
-            # might have multiple lines or multiple IPs
-            # Just take the first one
-            return out.split('\n')[0].strip()
-    except:
-        pass
-    return ""
+        snapshot, source = status_cache.get_snapshot()
+        return snapshot_response('connections', snapshot['active_connections'], snapshot, source)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/status/invalidate', methods=['POST'])
+def invalidate_status():
+    status_cache.invalidate()
+    return jsonify({'status': 'success'})
+
+def snapshot_response(key, payload, snapshot, source):
+    response = http_cache.json_response(key, snapshot['version'], payload)
+    response.headers['X-Snapshot-Updated-At'] = f"{snapshot['updated_at']:.3f}"
+    response.headers['X-Snapshot-Age'] = f"{time.time() - snapshot['updated_at']:.3f}"
+    response.headers['X-Snapshot-Source'] = source
+    return response
+
+def query_devices():
+    # One bulk query for every device instead of one `device show` per interface:
+    # nmcli -t -m multiline -f GENERAL.DEVICE,GENERAL.TYPE,GENERAL.STATE,GENERAL.CONNECTION,IP4.ADDRESS,IP6.ADDRESS device show
+    output = run_nmcli(['-t', '-m', 'multiline', '-f', DEVICE_SHOW_FIELDS, 'device', 'show'])
+    if output is None:
+        raise RuntimeError('Failed to query device status')
+
+    devices = []
+    for dev in nmcli_parser.parse_device_show(output):
+        # Filtering logic
+        # 1. Skip if type is explicitly unwanted
+        if dev['type'] in VIRTUAL_DEVICE_TYPES:
+            continue
+
+        # 2. Skip based on name prefixes commonly used for virtual interfaces
+        if dev['device'].startswith(VIRTUAL_DEVICE_PREFIXES):
+            continue
+
+        devices.append(dev)
+    return devices
+
+def query_active_connections():
+    # nmcli -t -f NAME,UUID,TYPE,DEVICE connection show --active
+    output = run_nmcli(['-t', '-f', 'NAME,UUID,TYPE,DEVICE', 'connection', 'show', '--active'])
+    if output is None:
+        raise RuntimeError('Failed to query active connections')
+
+    return [conn._asdict() for conn in nmcli_parser.parse_active_connections(output)]
+
+def load_status():
+    return {
+        'devices': query_devices(),
+        'active_connections': query_active_connections(),
+    }
+
+status_cache.set_loader(load_status)
+
+@app.route('/api/events')
+def stream_events():
+    """Server-sent events: a snapshot first, then device and scan diffs."""
+    if server_state['draining']:
+        return jsonify({'error': 'Server is shutting down'}), 503
+    subscriber = events.subscribe()
+    if subscriber is None:
+        # Each stream holds a server thread; keep the rest for the API
+        response = jsonify({'error': f'Too many event streams open (at most {events.MAX_SUBSCRIBERS})'})
+        response.headers['Retry-After'] = str(events.RETRY_AFTER)
+        return response, 503
+    try:
+        snapshot, _ = status_cache.get_snapshot()
+        networks, _ = wifi_scan.get_latest()
+        initial = events.format_event('snapshot', {
+            'devices': snapshot['devices'],
+            'networks': networks,
+        })
+    except Exception as e:
+        events.unsubscribe(subscriber)
+        return jsonify({'error': str(e)}), 500
+
+    response = Response(stream_with_context(events.stream(subscriber, initial)),
+                        mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+def publish_device_changes(previous, current):
+    if previous['updated_at'] is None:
+        # First load, subscribers got it as part of their snapshot
+        return
+    diff = events.diff_records(previous['devices'], current['devices'], 'device',
+                               ('type', 'state', 'connection', 'ip4', 'ip6'))
+    if diff:
+        events.publish('device', diff)
+
+def publish_scan_changes(previous, networks):
+    if previous is None:
+        return
+    diff = events.diff_records(previous, networks, 'ssid', ('signal', 'security', 'bars'))
+    if diff:
+        events.publish('scan', diff)
+
+status_cache.add_listener(publish_device_changes)
+status_cache.add_listener(known_networks.note_active)
+wifi_scan.add_listener(publish_scan_changes)
 
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=8201)
+    # Development server; production runs under gunicorn (see gunicorn.conf.py)
+    start_background()
+    app.run(host='0.0.0.0', port=int(os.environ.get('WEB_PORT', '8201')))
@@ -0,0 +1,280 @@
+"""Append-only audit log of network operations.
+
+Connect, disconnect, provisioning, reconnect and roaming each leave one
+JSON line in AUDIT_LOG_PATH: end time (`ts`) and start time, type,
+parameters and error (secrets redacted), duration, outcome, and every
+nmcli call the operation made on its thread with its own duration (see
+record_command(), called by executor.run).
+
+record() only appends to an in-memory batch. A writer thread appends the
+batch to the file every AUDIT_LOG_FLUSH_INTERVAL seconds, or as soon as
+AUDIT_LOG_BATCH records are waiting, with a single write. When the file
+reaches AUDIT_LOG_MAX_BYTES it is rotated to `<path>.1` ... `<path>.N`
+(N = AUDIT_LOG_BACKUPS) and the oldest file is dropped, so the log never
+grows past (N + 1) files of about that size. If the disk cannot keep up,
+at most MAX_PENDING records wait and newer ones are dropped and counted.
+
+query() streams matching records oldest first, line by line, and skips
+whole files that lie outside the requested time range; nothing is
+loaded into memory beyond the line being matched. An empty
+AUDIT_LOG_PATH turns the log off.
+
+hacs-installer carries a copy of this module; the parts listed in
+scripts/check_shared_modules.py must stay identical to this one.
+"""
+import contextlib
+import json
+import os
+import re
+import threading
+import time
+
+import metrics
+
+PATH = os.environ.get('AUDIT_LOG_PATH', '/var/log/network-manager/audit.jsonl')
+MAX_BYTES = int(os.environ.get('AUDIT_LOG_MAX_BYTES', str(5 * 1024 * 1024)))
+BACKUPS = int(os.environ.get('AUDIT_LOG_BACKUPS', '3'))
+FLUSH_INTERVAL = float(os.environ.get('AUDIT_LOG_FLUSH_INTERVAL', '1'))
+BATCH_SIZE = int(os.environ.get('AUDIT_LOG_BATCH', '100'))
+MAX_PENDING = 10000
+# nmcli calls kept per operation; a large provisioning run makes many
+MAX_COMMANDS = 100
+# Bytes read from the end of a file to find its last record
+TAIL_BYTES = 64 * 1024
+
+REDACTED = '***'
+SECRET_KEY_RE = re.compile(r'pass|psk|secret|token|credential', re.I)
+# `token=...`, `password: ...` and the like inside free-form error text
+SECRET_TEXT_RE = re.compile(r'((?:token|password|secret|authorization)["\']?\s*[:=]\s*)(?:bearer\s+)?[^\s&"\']+',
+                            re.I)
+
+metrics.describe('audit_records_total', 'counter', 'Audit log records by type and outcome')
+metrics.describe('audit_records_dropped_total', 'counter', 'Audit log records dropped because writing fell behind')
+
+_lock = threading.Lock()
+_write_lock = threading.Lock()
+_wake = threading.Event()
+_local = threading.local()
+_pending = []
+_state = {
+    'started': False,
+    'size': None,
+}
+_stats = {
+    'written': 0,
+    'dropped': 0,
+    'rotations': 0,
+    'write_errors': 0,
+    'last_error': None,
+}
+_describe_error = str
+
+
+def set_error_formatter(fn):
+    """fn(exception) -> message stored in failed records (executor.describe_error)."""
+    global _describe_error
+    _describe_error = fn
+
+
+def redact(value):
+    """Copy of `value` with the values of secret-looking keys replaced (None is kept)."""
+    if isinstance(value, dict):
+        return {k: REDACTED if SECRET_KEY_RE.search(str(k)) and value[k] not in (None, '') else redact(value[k])
+                for k in value}
+    if isinstance(value, (list, tuple)):
+        return [redact(v) for v in value]
+    return value
+
+
+def redact_text(text):
+    """`text` with the values after token=, password: and the like replaced."""
+    return SECRET_TEXT_RE.sub(lambda m: m.group(1) + REDACTED, text) if text else text
+
+
+def record(op_type, params=None, outcome='success', duration=None, error=None, **fields):
+    """Queue one record for the writer; never blocks on I/O."""
+    if not PATH:
+        return
+    entry = {'ts': round(time.time(), 3), 'type': op_type, 'outcome': outcome, 'duration': duration,
+             'params': redact(params or {}), 'error': redact_text(error)}
+    entry.update(fields)
+    metrics.inc('audit_records_total', {'type': op_type, 'outcome': outcome})
+    with _lock:
+        if len(_pending) >= MAX_PENDING:
+            _stats['dropped'] += 1
+            metrics.inc('audit_records_dropped_total')
+            return
+        _pending.append(entry)
+        full = len(_pending) >= BATCH_SIZE
+        if not _state['started']:
+            _state['started'] = True
+            threading.Thread(target=_writer, name='audit-writer', daemon=True).start()
+    if full:
+        _wake.set()
+
+
+@contextlib.contextmanager
+def operation(op_type, params=None):
+    """Record the block as one operation, with the nmcli calls made inside it.
+
+    Yields a dict; whatever the block puts under 'result' is recorded
+    with it. An exception marks the record failed and is re-raised.
+    """
+    op = {'commands': [], 'result': None}
+    outer = getattr(_local, 'operation', None)
+    _local.operation = op
+    started_at = time.time()
+    start = time.perf_counter()
+    outcome, error = 'success', None
+    try:
+        yield op
+    except BaseException as e:
+        outcome, error = 'failure', _describe_error(e)
+        raise
+    finally:
+        _local.operation = outer
+        record(op_type, params, outcome, round(time.perf_counter() - start, 3), error,
+               started_at=round(started_at, 3), commands=op['commands'], result=op['result'])
+
+
+def record_command(command, seconds, ok):
+    """Note one nmcli call on the operation running on this thread, if any."""
+    op = getattr(_local, 'operation', None)
+    if op is not None and len(op['commands']) < MAX_COMMANDS:
+        op['commands'].append({'command': command, 'duration': round(seconds, 3), 'ok': ok})
+
+
+def _files():
+    """Log files, oldest first."""
+    return [f'{PATH}.{i}' for i in range(BACKUPS, 0, -1)] + [PATH]
+
+
+def _rotate():
+    for i in range(BACKUPS - 1, 0, -1):
+        if os.path.exists(f'{PATH}.{i}'):
+            os.replace(f'{PATH}.{i}', f'{PATH}.{i + 1}')
+    if BACKUPS > 0:
+        os.replace(PATH, f'{PATH}.1')
+    else:
+        os.remove(PATH)
+    _state['size'] = 0
+    _stats['rotations'] += 1
+
+
+def flush():
+    """Write everything queued so far."""
+    with _write_lock:
+        with _lock:
+            batch = _pending[:]
+            del _pending[:]
+        if not batch or not PATH:
+            return
+        data = ''.join(json.dumps(entry, separators=(',', ':'), ensure_ascii=False, default=str) + '\n'
+                       for entry in batch).encode()
+        try:
+            if _state['size'] is None:
+                os.makedirs(os.path.dirname(PATH) or '.', exist_ok=True)
+                _state['size'] = os.path.getsize(PATH) if os.path.exists(PATH) else 0
+            # Rotate between batches, so a record is never split across files
+            if _state['size'] and _state['size'] + len(data) > MAX_BYTES:
+                _rotate()
+            with open(PATH, 'ab') as f:
+                f.write(data)
+            _state['size'] += len(data)
+            _stats['written'] += len(batch)
+        except OSError as e:
+            # The batch is lost; the next one tries again
+            _state['size'] = None
+            _stats['write_errors'] += 1
+            _stats['dropped'] += len(batch)
+            if _stats['last_error'] != str(e):
+                print(f"Writing the audit log failed: {e}")
+            _stats['last_error'] = str(e)
+
+
+def _writer():
+    while True:
+        _wake.wait(FLUSH_INTERVAL)
+        _wake.clear()
+        flush()
+
+
+def _ts(line):
+    try:
+        return json.loads(line)['ts']
+    except (ValueError, KeyError, TypeError):
+        return None
+
+
+def _time_span(f):
+    """(ts of the first record, ts of the last record) of an open log file."""
+    first = _ts(f.readline())
+    end = f.seek(0, os.SEEK_END)
+    f.seek(max(0, end - TAIL_BYTES))
+    lines = f.read().splitlines()
+    return first, _ts(lines[-1]) if lines else None
+
+
+def _matches(line, types, since, until, outcome):
+    try:
+        entry = json.loads(line)
+    except ValueError:
+        return False
+    ts = entry.get('ts', 0)
+    return ((not types or entry.get('type') in types)
+            and (since is None or ts >= since)
+            and (until is None or ts <= until)
+            and (not outcome or entry.get('outcome') == outcome))
+
+
+def query(types=None, since=None, until=None, outcome=None, limit=None):
+    """Yield matching records as JSON lines (bytes), oldest first.
+
+    `types` is a collection of record types, `since`/`until` bound the
+    record time (Unix seconds, inclusive). Files are read line by line,
+    and a rotated file whose records all lie outside [since, until] is
+    not read past its first and last line.
+    """
+    if not PATH:
+        return
+    flush()
+    # Cheap test on the raw line before parsing it
+    needles = [json.dumps({'type': t}, separators=(',', ':'), ensure_ascii=False)[1:-1].encode()
+               for t in types] if types else None
+    # Without filters the lines are passed on unparsed
+    parse = bool(types or since is not None or until is not None or outcome)
+    count = 0
+    for path in _files():
+        try:
+            f = open(path, 'rb')
+        except FileNotFoundError:
+            continue
+        with f:
+            if since is not None or until is not None:
+                first, last = _time_span(f)
+                if since is not None and last is not None and last < since:
+                    continue
+                if until is not None and first is not None and first > until:
+                    # Later files are newer still
+                    return
+                f.seek(0)
+            for line in f:
+                if needles and not any(needle in line for needle in needles):
+                    continue
+                if parse and not _matches(line, types, since, until, outcome):
+                    continue
+                yield line if line.endswith(b'\n') else line + b'\n'
+                count += 1
+                if limit is not None and count >= limit:
+                    return
+
+
+def stats():
+    with _lock:
+        pending = len(_pending)
+    sizes = {}
+    for path in _files():
+        with contextlib.suppress(OSError):
+            sizes[os.path.basename(path)] = os.path.getsize(path)
+    return dict(_stats, enabled=bool(PATH), path=PATH, max_bytes=MAX_BYTES, backups=BACKUPS,
+                pending=pending, files=sizes)
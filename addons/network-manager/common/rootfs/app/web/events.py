@@ -0,0 +1,129 @@
+"""Fan-out of status and scan changes to server-sent event subscribers.
+
+The status watcher and the scan scheduler publish diffs here; every
+subscriber gets its own bounded queue. A subscriber that falls behind
+(queue full) is dropped rather than slowing down the publisher; its
+EventSource reconnects and starts again from a fresh snapshot.
+
+Every open stream holds one server thread for as long as it lasts, so
+at most SSE_MAX_SUBSCRIBERS are open at once (by default a quarter of
+WEB_THREADS); subscribe() refuses the rest and the route answers 503
+with Retry-After, leaving the other threads to the API.
+"""
+import json
+import os
+import queue
+import threading
+
+SUBSCRIBER_QUEUE_SIZE = 100
+MAX_SUBSCRIBERS = int(os.environ.get('SSE_MAX_SUBSCRIBERS',
+                                     str(max(1, int(os.environ.get('WEB_THREADS', '16')) // 4))))
+# Seconds a refused client is asked to wait before trying again
+RETRY_AFTER = 15
+# Seconds between keep-alive comments on an idle stream
+KEEPALIVE_INTERVAL = 15
+# Queued by close_all() to wake a waiting stream
+_CLOSE = object()
+
+_lock = threading.Lock()
+_subscribers = set()
+_stats = {
+    'rejected': 0,
+}
+
+
+class Subscriber:
+    __slots__ = ('queue', 'dropped')
+
+    def __init__(self):
+        self.queue = queue.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        self.dropped = False
+
+
+def subscribe():
+    """A new subscriber, or None when MAX_SUBSCRIBERS streams are open."""
+    subscriber = Subscriber()
+    with _lock:
+        if len(_subscribers) >= MAX_SUBSCRIBERS:
+            _stats['rejected'] += 1
+            return None
+        _subscribers.add(subscriber)
+    return subscriber
+
+
+def unsubscribe(subscriber):
+    with _lock:
+        _subscribers.discard(subscriber)
+
+
+def subscriber_count():
+    return len(_subscribers)
+
+
+def rejected_count():
+    return _stats['rejected']
+
+
+def close_all():
+    """End every open stream (used on shutdown); clients reconnect elsewhere."""
+    with _lock:
+        subscribers = list(_subscribers)
+        _subscribers.clear()
+    for subscriber in subscribers:
+        subscriber.dropped = True
+        try:
+            subscriber.queue.put_nowait(_CLOSE)
+        except queue.Full:
+            pass
+
+
+def publish(event_type, data):
+    if not _subscribers:
+        return
+    message = format_event(event_type, data)
+    with _lock:
+        subscribers = list(_subscribers)
+    for subscriber in subscribers:
+        try:
+            subscriber.queue.put_nowait(message)
+        except queue.Full:
+            subscriber.dropped = True
+            unsubscribe(subscriber)
+
+
+def format_event(event_type, data):
+    return f"event: {event_type}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n"
+
+
+def stream(subscriber, initial=None):
+    """Yield SSE messages for a subscriber until it is dropped or disconnects."""
+    try:
+        if initial is not None:
+            yield initial
+        while not subscriber.dropped:
+            try:
+                message = subscriber.queue.get(timeout=KEEPALIVE_INTERVAL)
+            except queue.Empty:
+                yield ': keep-alive\n\n'
+                continue
+            if message is _CLOSE:
+                break
+            yield message
+    finally:
+        unsubscribe(subscriber)
+
+
+def diff_records(old, new, key, fields):
+    """Compare two record lists by `key`; returns None when nothing changed."""
+    old_by_key = {record[key]: record for record in old or []}
+    new_by_key = {record[key]: record for record in new or []}
+
+    added = [record for k, record in new_by_key.items() if k not in old_by_key]
+    removed = [k for k in old_by_key if k not in new_by_key]
+    changed = [
+        record for k, record in new_by_key.items()
+        if k in old_by_key and any(record.get(f) != old_by_key[k].get(f) for f in fields)
+    ]
+    if not (added or removed or changed):
+        return None
+    return {'added': added, 'removed': removed, 'changed': changed}
@@ -0,0 +1,349 @@
+"""Bounded execution layer for nmcli.
+
+Every nmcli call runs on a fixed-size worker pool with a per-command
+timeout, and at most NMCLI_QUEUE_DEPTH calls may wait for a worker; past
+that QueueFull is raised instead of piling up request threads. Long
+operations (connect, disconnect) are submitted as jobs that the API
+returns immediately and clients poll; a queued job can be cancelled and
+a running one has its nmcli process killed.
+
+Per-command latency histograms are kept for /api/executor/stats.
+"""
+import os
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import audit
+import metrics
+
+MAX_WORKERS = int(os.environ.get('NMCLI_WORKERS', '4'))
+MAX_QUEUE_DEPTH = int(os.environ.get('NMCLI_QUEUE_DEPTH', '32'))
+DEFAULT_TIMEOUT = 15
+# Commands that wait on the radio or on link activation get longer
+COMMAND_TIMEOUTS = {
+    'device wifi connect': 60,
+    'device wifi list': 30,
+    'connection up': 60,
+    'connection down': 30,
+    'device disconnect': 30,
+}
+# Number of finished jobs kept for polling
+JOB_HISTORY = 50
+LATENCY_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+class QueueFull(Exception):
+    pass
+
+
+class JobCancelled(Exception):
+    pass
+
+
+_pool = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix='nmcli')
+_slots = threading.BoundedSemaphore(MAX_WORKERS + MAX_QUEUE_DEPTH)
+_local = threading.local()
+
+_lock = threading.Lock()
+_jobs = {}
+_job_state = {}
+_counters = {
+    'job_counter': 0,
+    'in_flight': 0,
+    'rejected': 0,
+}
+_latency = {}
+
+
+def command_key(args):
+    """'nmcli -t -f X device wifi list' -> 'device wifi list'."""
+    words = []
+    skip = False
+    for arg in args:
+        if skip:
+            skip = False
+        elif arg in ('-f', '-m', '-g', '--fields', '--mode', '--get-values'):
+            skip = True
+        elif not arg.startswith('-'):
+            words.append(arg)
+    depth = 3 if words[1:2] == ['wifi'] else 2
+    return ' '.join(words[:depth])
+
+
+def _observe(key, seconds):
+    with _lock:
+        stats = _latency.get(key)
+        if stats is None:
+            stats = _latency[key] = {
+                'count': 0,
+                'errors': 0,
+                'sum': 0.0,
+                'buckets': [0] * (len(LATENCY_BUCKETS) + 1),
+            }
+        stats['count'] += 1
+        stats['sum'] += seconds
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if seconds <= bound:
+                stats['buckets'][i] += 1
+                break
+        else:
+            stats['buckets'][-1] += 1
+
+
+def _count_error(key):
+    with _lock:
+        if key in _latency:
+            _latency[key]['errors'] += 1
+
+
+def _execute(args, timeout):
+    key = command_key(args)
+    if timeout is None:
+        timeout = COMMAND_TIMEOUTS.get(key, DEFAULT_TIMEOUT)
+    job_state = getattr(_local, 'job_state', None)
+
+    start = time.perf_counter()
+    process = subprocess.Popen(['nmcli'] + args, stdout=subprocess.PIPE,
+                               stderr=subprocess.PIPE, text=True)
+    if job_state is not None:
+        job_state['process'] = process
+    try:
+        stdout, stderr = process.communicate(timeout=timeout)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.communicate()
+        _observe(key, time.perf_counter() - start)
+        _count_error(key)
+        raise
+    finally:
+        if job_state is not None:
+            job_state['process'] = None
+    _observe(key, time.perf_counter() - start)
+
+    if process.returncode != 0:
+        if job_state is not None and job_state['cancel']:
+            # Killed by cancel_job()
+            raise JobCancelled()
+        _count_error(key)
+        raise subprocess.CalledProcessError(process.returncode, ['nmcli'] + args, stdout, stderr)
+    return stdout.strip()
+
+
+def _submit(fn, *args):
+    if not _slots.acquire(blocking=False):
+        with _lock:
+            _counters['rejected'] += 1
+        raise QueueFull('Too many pending nmcli operations')
+    with _lock:
+        _counters['in_flight'] += 1
+
+    def release(_):
+        with _lock:
+            _counters['in_flight'] -= 1
+        _slots.release()
+
+    try:
+        future = _pool.submit(fn, *args)
+    except Exception:
+        release(None)
+        raise
+    future.add_done_callback(release)
+    return future
+
+
+def run(args, timeout=None):
+    """Run `nmcli <args>` on the pool and return its stdout.
+
+    Raises CalledProcessError on a non-zero exit, TimeoutExpired when the
+    command takes longer than its timeout and QueueFull when the queue
+    is at its limit. Called from inside a job, the command runs inline on
+    the job's worker.
+    """
+    start = time.perf_counter()
+    ok = False
+    try:
+        if getattr(_local, 'in_worker', False):
+            output = _execute(args, timeout)
+        else:
+            output = _submit(_execute, args, timeout).result()
+        ok = True
+        return output
+    finally:
+        # Includes the wait for a worker
+        elapsed = time.perf_counter() - start
+        key = command_key(args)
+        metrics.record_timing(f'nmcli {key}', elapsed)
+        audit.record_command(key, elapsed, ok)
+
+
+def describe_error(e):
+    if isinstance(e, subprocess.CalledProcessError):
+        return (e.stderr or '').strip() or str(e)
+    if isinstance(e, subprocess.TimeoutExpired):
+        return f'nmcli timed out after {e.timeout}s'
+    return str(e)
+
+
+def _run_job(job_id, fn, args):
+    with _lock:
+        state = _job_state[job_id]
+        if state['cancel']:
+            return
+        _jobs[job_id].update(status='running', started_at=time.time())
+    _local.in_worker = True
+    _local.job_state = state
+    try:
+        result = fn(*args)
+        update = {'status': 'succeeded', 'result': result}
+    except JobCancelled:
+        update = {'status': 'cancelled'}
+    except Exception as e:
+        update = {'status': 'cancelled'} if state['cancel'] else {'status': 'failed', 'error': describe_error(e)}
+    finally:
+        _local.in_worker = False
+        _local.job_state = None
+    _finish_job(job_id, **update)
+
+
+def _finish_job(job_id, **kwargs):
+    with _lock:
+        job = _jobs[job_id]
+        if job['finished_at'] is not None:
+            return
+        job.update(kwargs, finished_at=time.time())
+        if job['started_at'] is not None:
+            job['duration'] = round(job['finished_at'] - job['started_at'], 3)
+        done = _job_state[job_id]['done']
+        # Drop the oldest finished jobs
+        finished = [i for i in sorted(_jobs) if _jobs[i]['finished_at'] is not None]
+        for old_id in finished[:-JOB_HISTORY]:
+            _jobs.pop(old_id, None)
+            _job_state.pop(old_id, None)
+    done.set()
+
+
+def submit_job(kind, fn, *args):
+    """Queue fn(*args) as a job and return the job without waiting for it."""
+    with _lock:
+        _counters['job_counter'] += 1
+        job_id = _counters['job_counter']
+        _jobs[job_id] = {
+            'id': job_id,
+            'kind': kind,
+            'status': 'queued',
+            'result': None,
+            'error': None,
+            'created_at': time.time(),
+            'started_at': None,
+            'finished_at': None,
+            'duration': None,
+        }
+        _job_state[job_id] = {
+            'cancel': False,
+            'process': None,
+            'done': threading.Event(),
+            'future': None,
+        }
+    try:
+        future = _submit(_run_job, job_id, fn, args)
+    except QueueFull:
+        with _lock:
+            _jobs.pop(job_id)
+            _job_state.pop(job_id)
+        raise
+    with _lock:
+        _job_state[job_id]['future'] = future
+        return dict(_jobs[job_id])
+
+
+def get_job(job_id, wait=0):
+    """Return the job, waiting up to `wait` seconds for it to finish (long-poll)."""
+    with _lock:
+        state = _job_state.get(job_id)
+    if state is not None and wait > 0:
+        state['done'].wait(wait)
+    with _lock:
+        job = _jobs.get(job_id)
+        return dict(job) if job else None
+
+
+def cancel_job(job_id):
+    """Cancel a queued job or kill the nmcli process of a running one."""
+    with _lock:
+        job = _jobs.get(job_id)
+        state = _job_state.get(job_id)
+        if job is None or job['finished_at'] is not None:
+            return dict(job) if job else None
+        state['cancel'] = True
+        queued = job['status'] == 'queued'
+        future = state['future']
+        process = state['process']
+
+    if queued:
+        if future is not None:
+            future.cancel()
+        _finish_job(job_id, status='cancelled')
+    elif process is not None:
+        process.kill()
+        # Give the job a moment to observe the kill and finish as cancelled
+        return get_job(job_id, wait=1)
+    return get_job(job_id)
+
+
+def stats():
+    with _lock:
+        return {
+            'workers': MAX_WORKERS,
+            'max_queue_depth': MAX_QUEUE_DEPTH,
+            'in_flight': _counters['in_flight'],
+            'rejected': _counters['rejected'],
+            'buckets': list(LATENCY_BUCKETS) + ['+Inf'],
+            'commands': {
+                key: {
+                    'count': s['count'],
+                    'errors': s['errors'],
+                    'sum': round(s['sum'], 6),
+                    'buckets': list(s['buckets']),
+                }
+                for key, s in _latency.items()
+            },
+        }
+
+
+def metric_lines():
+    """Prometheus exposition of the executor state and nmcli latencies."""
+    s = stats()
+    lines = [
+        '# HELP nmcli_in_flight nmcli calls running or waiting for a worker',
+        '# TYPE nmcli_in_flight gauge',
+        f"nmcli_in_flight {s['in_flight']}",
+        '# HELP nmcli_rejected_total nmcli calls rejected because the queue was full',
+        '# TYPE nmcli_rejected_total counter',
+        f"nmcli_rejected_total {s['rejected']}",
+        '# HELP nmcli_command_errors_total nmcli calls that failed or timed out',
+        '# TYPE nmcli_command_errors_total counter',
+    ]
+    for key, c in s['commands'].items():
+        lines.append(f"nmcli_command_errors_total{metrics.format_labels((('command', key),))} {c['errors']}")
+    lines += [
+        '# HELP nmcli_command_duration_seconds nmcli subprocess duration per subcommand',
+        '# TYPE nmcli_command_duration_seconds histogram',
+    ]
+    for key, c in s['commands'].items():
+        lines += metrics.histogram_lines('nmcli_command_duration_seconds', (('command', key),),
+                                         LATENCY_BUCKETS, c['buckets'][:-1], c['sum'], c['count'])
+    return lines
+
+
+def shutdown(timeout):
+    """Stop accepting work and wait up to `timeout` seconds for in-flight calls and jobs."""
+    _pool.shutdown(wait=False)
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        with _lock:
+            if _counters['in_flight'] == 0:
+                return True
+        time.sleep(0.1)
+    return False
@@ -0,0 +1,40 @@
+"""gunicorn settings for the production serving mode (WEB_SERVER=production).
+
+One worker process with a thread per connection: the status snapshot,
+scan results, jobs and SSE subscribers live in process memory and must
+not be split across workers. Threads keep a slow nmcli call from
+stalling other clients.
+"""
+import os
+import signal
+
+bind = f"0.0.0.0:{os.environ.get('WEB_PORT', '8201')}"
+workers = 1
+worker_class = 'gthread'
+threads = int(os.environ.get('WEB_THREADS', '16'))
+# Keep idle browser/ingress connections open long enough to be reused
+keepalive = int(os.environ.get('WEB_KEEPALIVE', '5'))
+# SSE streams stay open for minutes; this only bounds a stuck worker
+timeout = 120
+# Time given to in-flight requests and nmcli jobs after SIGTERM
+graceful_timeout = int(os.environ.get('WEB_GRACEFUL_TIMEOUT', '30'))
+errorlog = '-'
+
+
+def post_worker_init(worker):
+    from app import begin_shutdown, start_background
+    start_background()
+
+    handle_exit = worker.handle_exit
+
+    def on_term(sig, frame):
+        # Report not-ready and end SSE streams so the worker can drain
+        begin_shutdown()
+        handle_exit(sig, frame)
+
+    signal.signal(signal.SIGTERM, on_term)
+
+
+def worker_exit(server, worker):
+    from app import shutdown
+    shutdown(graceful_timeout)
@@ -0,0 +1,81 @@
+"""Conditional and compressed JSON responses for polled routes.
+
+Routes answered from an in-memory snapshot (status_cache, wifi_scan)
+pass a cheap version stamp of that snapshot along with the payload. The
+serialized body is kept per route key until the version changes, so
+repeated polls cost no JSON encoding, and the version becomes a weak
+ETag: a request whose If-None-Match matches gets an empty 304.
+
+Bodies of at least GZIP_MIN_SIZE bytes are gzip-compressed for clients
+that accept it; the compressed body is cached alongside the plain one.
+Responses carry `Cache-Control: no-cache`, so browsers revalidate every
+poll instead of reusing a stale copy.
+
+hacs-installer carries a copy of this module; the parts listed in
+scripts/check_shared_modules.py must stay identical to this one.
+"""
+import gzip
+import os
+import threading
+
+from flask import Response, current_app, request
+
+import metrics
+
+GZIP_MIN_SIZE = int(os.environ.get('HTTP_GZIP_MIN_SIZE', '1024'))
+GZIP_LEVEL = 6
+
+# Versions restart at 0 with the process; this keeps ETags from a
+# previous run from matching
+_instance = os.urandom(4).hex()
+_lock = threading.Lock()
+_bodies = {}
+
+metrics.describe('http_cache_responses_total', 'counter',
+                 'Cached JSON responses by key and result (not_modified/hit/miss)')
+
+
+def _entry(key, version, payload):
+    with _lock:
+        entry = _bodies.get(key)
+    if entry is not None and entry['version'] == version:
+        metrics.inc('http_cache_responses_total', {'key': key, 'result': 'hit'})
+        return entry
+    metrics.inc('http_cache_responses_total', {'key': key, 'result': 'miss'})
+    entry = {'version': version, 'body': (current_app.json.dumps(payload) + '\n').encode(), 'gzip': None}
+    with _lock:
+        _bodies[key] = entry
+    return entry
+
+
+def _accepts_gzip():
+    return request.accept_encodings['gzip'] > 0
+
+
+def json_response(key, version, payload):
+    """jsonify(payload) for the snapshot `version`, cached under `key`.
+
+    `key` names the route (and variant) so different payloads of one
+    snapshot do not share a body; `payload` is only serialized when the
+    version changed since the last request for that key.
+    """
+    etag = f'{_instance}-{key}-{version}'
+    if request.if_none_match.contains_weak(etag):
+        metrics.inc('http_cache_responses_total', {'key': key, 'result': 'not_modified'})
+        response = Response(status=304)
+    else:
+        entry = _entry(key, version, payload)
+        body = entry['body']
+        compress = len(body) >= GZIP_MIN_SIZE and _accepts_gzip()
+        if compress:
+            if entry['gzip'] is None:
+                # mtime=0 keeps the output identical for identical bodies
+                entry['gzip'] = gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+            body = entry['gzip']
+        response = Response(body, mimetype=current_app.json.mimetype)
+        if compress:
+            response.headers['Content-Encoding'] = 'gzip'
+    response.set_etag(etag, weak=True)
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['Vary'] = 'Accept-Encoding'
+    return response
@@ -0,0 +1,277 @@
+"""Index of the saved Wi-Fi profiles by SSID.
+
+Built from one `nmcli connection show` listing (name, UUID, time of the
+last successful activation) and one bulk `connection show <uuid>...` for
+the SSID, key management, IPv4 method and BSSID pin of every Wi-Fi
+profile.
+Profiles are matched on their SSID (802-11-wireless.ssid), not on their
+name. The index is kept in sync instead of being re-read per request:
+
+- a connect through the app updates the entry of the profile it used
+  (note_connected()); provisioning and profiles added by
+  `device wifi connect` make it reload (invalidate())
+- a Wi-Fi profile seen active in the status snapshot gets its
+  last_success time bumped; an unknown one makes it reload
+- it is re-read at most every WIFI_PROFILE_INDEX_MAX_AGE seconds, for
+  profiles changed with nmcli outside the app
+
+Joining a known network is then `connection up <uuid>` with the secrets
+already stored (see activate()): no scan lookup and no new profile,
+where `device wifi connect` adds "SSID 1", "SSID 2" ... next to the
+existing one. prune() deletes such copies: of the profiles of one SSID
+named after it (the SSID itself or "SSID <n>") only the best one is
+kept, the active one first, then the most recently connected. Profiles
+with other names are left alone.
+
+WIFI_PROFILE_INDEX=false turns the index off: lookup() finds nothing and
+the callers fall back to `device wifi connect` and lookups by name.
+"""
+import os
+import re
+import threading
+import time
+
+import executor
+import metrics
+import nmcli_parser
+import profiles
+
+ENABLED = os.environ.get('WIFI_PROFILE_INDEX', 'true') == 'true'
+MAX_AGE = int(os.environ.get('WIFI_PROFILE_INDEX_MAX_AGE', '300'))
+PRUNE = os.environ.get('WIFI_PRUNE_DUPLICATES', 'true') == 'true'
+DETAIL_KEYS = ('connection.uuid', '802-11-wireless.ssid', 'wifi-sec.key-mgmt', 'ipv4.method',
+               '802-11-wireless.bssid')
+
+metrics.describe('wifi_profile_index_lookups_total', 'counter', 'Known-network lookups by result (hit/miss)')
+metrics.describe('wifi_profile_index_loads_total', 'counter', 'Reloads of the known-network index')
+metrics.describe('wifi_profiles_pruned_total', 'counter', 'Duplicate Wi-Fi profiles deleted')
+
+_lock = threading.Lock()
+_index = {
+    'by_uuid': None,
+    'by_ssid': {},
+    'loaded_at': 0,
+    # Bumped by invalidate() so a load that started earlier is not kept
+    'generation': 0,
+}
+
+
+def _load():
+    """{uuid: entry} for every saved Wi-Fi profile."""
+    output = executor.run(['-t', '-f', 'NAME,UUID,TYPE,TIMESTAMP', 'connection', 'show'])
+    listed = [(name, uuid, timestamp)
+              for name, uuid, conn_type, timestamp in nmcli_parser.iter_terse(output, 4)
+              if conn_type == profiles.WIFI_TYPE]
+    if not listed:
+        return {}
+    output = executor.run(['-t', '-m', 'multiline', '-f', ','.join(DETAIL_KEYS),
+                           'connection', 'show'] + [uuid for _, uuid, _ in listed])
+    details = {record['connection.uuid']: record
+               for record in nmcli_parser.iter_multiline(output, 'connection.uuid')}
+    entries = {}
+    for name, uuid, timestamp in listed:
+        record = details.get(uuid, {})
+        entries[uuid] = {
+            'uuid': uuid,
+            'name': name,
+            'ssid': record.get('802-11-wireless.ssid') or name,
+            'security': record.get('wifi-sec.key-mgmt', ''),
+            # Not set means NetworkManager's default
+            'ipv4_method': record.get('ipv4.method') or 'auto',
+            'bssid': _bssid(record.get('802-11-wireless.bssid')),
+            'last_success': int(timestamp) if timestamp.isdigit() and timestamp != '0' else None,
+        }
+    return entries
+
+
+def _bssid(value):
+    """Normalised BSSID pin, '' for none."""
+    value = (value or '').strip().upper()
+    return '' if value == '--' else value
+
+
+def _rank(entry):
+    # Most recently connected first; the profile named after the SSID wins a tie
+    return (-(entry['last_success'] or 0), entry['name'] != entry['ssid'], entry['name'])
+
+
+def _group(entries):
+    """{ssid: [entry, ...]}, best first."""
+    by_ssid = {}
+    for entry in entries.values():
+        by_ssid.setdefault(entry['ssid'], []).append(entry)
+    for group in by_ssid.values():
+        group.sort(key=_rank)
+    return by_ssid
+
+
+def _store(entries):
+    """Called with _lock held."""
+    _index['by_uuid'] = entries
+    _index['by_ssid'] = _group(entries)
+
+
+def _current():
+    """The current index, reloaded when it was invalidated or is too old."""
+    with _lock:
+        if _index['by_uuid'] is not None and time.time() - _index['loaded_at'] < MAX_AGE:
+            return _index
+        generation = _index['generation']
+    entries = _load()
+    metrics.inc('wifi_profile_index_loads_total')
+    with _lock:
+        if generation == _index['generation']:
+            _store(entries)
+            _index['loaded_at'] = time.time()
+            return _index
+    # Changed while loading: use what was read, the next call loads again
+    return {'by_uuid': entries, 'by_ssid': _group(entries)}
+
+
+def refresh():
+    """Read the profiles again now; returns {ssid: [entry, ...]}, best first."""
+    invalidate()
+    return {ssid: [dict(entry) for entry in group] for ssid, group in _current()['by_ssid'].items()}
+
+
+def invalidate():
+    """Drop the index; the next lookup reads the profiles again."""
+    with _lock:
+        _index['by_uuid'] = None
+        _index['generation'] += 1
+
+
+def lookup(ssid):
+    """The best saved profile for `ssid` (a copy of its entry), or None."""
+    if not ENABLED:
+        return None
+    group = _current()['by_ssid'].get(ssid)
+    metrics.inc('wifi_profile_index_lookups_total', {'result': 'hit' if group else 'miss'})
+    return dict(group[0]) if group else None
+
+
+def uuid_for(ssid):
+    """UUID of the best saved profile for `ssid`, or None.
+
+    With the index turned off this is the lookup by profile name.
+    """
+    if not ENABLED:
+        return profiles.find_wifi_profile(ssid)
+    entry = lookup(ssid)
+    return entry['uuid'] if entry else None
+
+
+def ssid_for(uuid):
+    """SSID of the saved profile `uuid` (which may be named anything), or None."""
+    if ENABLED:
+        entry = _current()['by_uuid'].get(uuid)
+        if entry is not None:
+            return entry['ssid']
+    output = executor.run(['-t', '-m', 'multiline', '-f', '802-11-wireless.ssid', 'connection', 'show', uuid])
+    record = next(nmcli_parser.iter_multiline(output, '802-11-wireless.ssid'), {})
+    return record.get('802-11-wireless.ssid') or None
+
+
+def all_profiles():
+    """All indexed profiles, grouped by SSID, best first."""
+    if not ENABLED:
+        return []
+    return [dict(entry) for group in _current()['by_ssid'].values() for entry in group]
+
+
+def note_connected(uuid, ssid, **settings):
+    """Record a successful activation of `uuid` (added with name `ssid` if new).
+
+    `settings` may update 'security', 'ipv4_method' and 'bssid'.
+    """
+    with _lock:
+        if _index['by_uuid'] is None:
+            return
+        entries = dict(_index['by_uuid'])
+        entry = dict(entries.get(uuid) or {'uuid': uuid, 'name': ssid, 'ssid': ssid,
+                                           'security': '', 'ipv4_method': 'auto', 'bssid': ''})
+        entry.update(settings, last_success=int(time.time()))
+        entries[uuid] = entry
+        _store(entries)
+
+
+def note_active(previous, current):
+    """status_cache listener: bump last_success of newly active Wi-Fi profiles."""
+    before = {c['uuid'] for c in previous['active_connections']}
+    for conn in current['active_connections']:
+        if conn['type'] != profiles.WIFI_TYPE or conn['uuid'] in before:
+            continue
+        with _lock:
+            if _index['by_uuid'] is None:
+                return
+            known = conn['uuid'] in _index['by_uuid']
+        if known:
+            note_connected(conn['uuid'], conn['name'])
+        else:
+            # Added outside the app (or by `device wifi connect`)
+            invalidate()
+
+
+def _stored_psk(uuid):
+    output = executor.run(['-t', '-m', 'multiline', '--show-secrets', '-f', 'wifi-sec.psk',
+                           'connection', 'show', uuid])
+    record = next(nmcli_parser.iter_multiline(output, 'wifi-sec.psk'), {})
+    return record.get('wifi-sec.psk', '')
+
+
+def activate(entry, password=None, bssid=None, key_mgmt_for=None):
+    """Bring the saved profile `entry` up by UUID for a DHCP connect.
+
+    Like the static IP path, `bssid` pins the profile to one access point
+    and None clears an earlier pin. The profile is only modified when it
+    has to be: a password that differs from the stored one, a static IPv4
+    setup or a different pin. Otherwise this is a single `connection up`
+    with the secrets already stored.
+    """
+    settings = []
+    changes = {'ipv4_method': 'auto', 'bssid': _bssid(bssid)}
+    if entry['ipv4_method'] != 'auto':
+        settings += profiles.ipv4_settings('auto')
+    if password and password != _stored_psk(entry['uuid']):
+        changes['security'] = entry['security'] or (key_mgmt_for(entry['ssid']) if key_mgmt_for else 'wpa-psk')
+        settings += profiles.security_settings(password, changes['security'])
+    if changes['bssid'] != entry.get('bssid', ''):
+        settings += profiles.wireless_settings(bssid)
+    if settings:
+        # One modify and one activation, rolled back if the activation fails
+        profiles.apply_and_activate(entry['ssid'], settings, uuid=entry['uuid'])
+    else:
+        executor.run(['connection', 'up', entry['uuid']])
+    note_connected(entry['uuid'], entry['ssid'], **changes)
+
+
+def duplicates(active_uuids=()):
+    """Profiles that prune() would delete."""
+    extra = []
+    for ssid, group in _current()['by_ssid'].items():
+        copies = re.compile(rf'{re.escape(ssid)}( \d+)?')
+        named = [entry for entry in group if copies.fullmatch(entry['name'])]
+        # group is sorted best first; an active copy is kept over it
+        named.sort(key=lambda entry: entry['uuid'] not in active_uuids)
+        extra.extend(dict(entry) for entry in named[1:])
+    return extra
+
+
+def prune(active_uuids=()):
+    """Delete duplicate profiles of one SSID; returns the deleted entries."""
+    if not ENABLED or not PRUNE:
+        return []
+    deleted = []
+    for entry in duplicates(active_uuids):
+        try:
+            executor.run(['connection', 'delete', entry['uuid']])
+            deleted.append(entry)
+        except Exception as e:
+            print(f"Deleting duplicate profile {entry['name']} ({entry['uuid']}) failed: "
+                  f"{executor.describe_error(e)}")
+    if deleted:
+        metrics.inc('wifi_profiles_pruned_total', value=len(deleted))
+        invalidate()
+        print(f"Deleted {len(deleted)} duplicate Wi-Fi profiles: "
+              f"{', '.join(entry['name'] for entry in deleted)}")
+    return deleted
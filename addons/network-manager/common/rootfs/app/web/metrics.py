@@ -0,0 +1,127 @@
+"""Prometheus-style metrics and per-request profiling.
+
+Counters and histograms are plain dicts behind one lock and rendered in
+the Prometheus text format by render(). Other modules can contribute
+extra series through add_collector().
+
+Profiling is per request and off unless the request carries
+`X-Profile: 1` or NM_PROFILE=1 is set: while active, timed sections
+(nmcli calls) are recorded on a thread-local list and returned as a
+Server-Timing header. When inactive, record_timing() is a single
+attribute lookup.
+"""
+import os
+import threading
+
+PROFILE_ALWAYS = os.environ.get('NM_PROFILE', '') in ('1', 'true')
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+_lock = threading.Lock()
+_help = {}
+_counters = {}
+_histograms = {}
+_collectors = []
+_local = threading.local()
+
+
+def describe(name, metric_type, text):
+    _help[name] = (metric_type, text)
+
+
+def _key(name, labels):
+    return name, tuple(sorted(labels.items())) if labels else ()
+
+
+def inc(name, labels=None, value=1):
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+
+def observe(name, value, labels=None, buckets=DEFAULT_BUCKETS):
+    key = _key(name, labels)
+    with _lock:
+        hist = _histograms.get(key)
+        if hist is None:
+            hist = _histograms[key] = {'buckets': buckets, 'counts': [0] * len(buckets), 'sum': 0.0, 'count': 0}
+        hist['sum'] += value
+        hist['count'] += 1
+        for i, bound in enumerate(hist['buckets']):
+            if value <= bound:
+                hist['counts'][i] += 1
+                break
+
+
+def add_collector(collector):
+    """collector() returns an iterable of exposition lines."""
+    _collectors.append(collector)
+
+
+def format_labels(labels):
+    if not labels:
+        return ''
+    parts = []
+    for k, v in labels:
+        v = str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        parts.append(f'{k}="{v}"')
+    return '{' + ','.join(parts) + '}'
+
+
+def histogram_lines(name, labels, bounds, counts, total, count):
+    """Exposition lines for one histogram; `counts` are per bucket (not cumulative)."""
+    lines = []
+    cumulative = 0
+    for bound, n in zip(bounds, counts):
+        cumulative += n
+        lines.append(f'{name}_bucket{format_labels(labels + (("le", bound),))} {cumulative}')
+    lines.append(f'{name}_bucket{format_labels(labels + (("le", "+Inf"),))} {count}')
+    lines.append(f'{name}_sum{format_labels(labels)} {total:.6f}')
+    lines.append(f'{name}_count{format_labels(labels)} {count}')
+    return lines
+
+
+def render():
+    with _lock:
+        counters = dict(_counters)
+        histograms = {k: dict(v, counts=list(v['counts'])) for k, v in _histograms.items()}
+
+    series = {}
+    for (name, labels), value in counters.items():
+        series.setdefault(name, []).append(f'{name}{format_labels(labels)} {value}')
+    for (name, labels), h in histograms.items():
+        series.setdefault(name, []).extend(
+            histogram_lines(name, labels, h['buckets'], h['counts'], h['sum'], h['count']))
+
+    lines = []
+    for name in sorted(series):
+        if name in _help:
+            metric_type, text = _help[name]
+            lines.append(f'# HELP {name} {text}')
+            lines.append(f'# TYPE {name} {metric_type}')
+        lines.extend(series[name])
+    for collector in _collectors:
+        lines.extend(collector())
+    return '\n'.join(lines) + '\n'
+
+
+def start_profile(enabled):
+    _local.timings = [] if (enabled or PROFILE_ALWAYS) else None
+
+
+def record_timing(name, seconds):
+    timings = getattr(_local, 'timings', None)
+    if timings is not None:
+        timings.append((name, seconds))
+
+
+def finish_profile():
+    timings = getattr(_local, 'timings', None)
+    _local.timings = None
+    return timings
+
+
+def server_timing(timings, total):
+    """Format a Server-Timing header value (durations in ms)."""
+    entries = [f'{name.replace(" ", "-")};dur={seconds * 1000:.2f}' for name, seconds in timings]
+    entries.append(f'total;dur={total * 1000:.2f}')
+    return ', '.join(entries)
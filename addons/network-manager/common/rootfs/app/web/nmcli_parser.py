@@ -0,0 +1,240 @@
+"""Parsers for nmcli terse (-t) output, shared by all routes.
+
+In terse mode nmcli separates fields with ':' and escapes ':' and '\\'
+inside values as '\\:' and '\\\\'. Lines without a backslash take the plain
+str.split() fast path. Lines with escapes (every line of a scan that
+asks for BSSID) hide them behind placeholders and still use str.split();
+only lines that contain NUL or an unexpected escape are walked
+character by character.
+"""
+from collections import namedtuple
+
+# bssid, freq (MHz), chan and rate (Mbit/s) are only filled in when the
+# scan asked for BSSID/FREQ/CHAN/RATE
+WifiNetwork = namedtuple('WifiNetwork',
+                         ('ssid', 'signal', 'security', 'bars', 'in_use', 'bssid', 'freq', 'chan', 'rate'),
+                         defaults=('', 0, 0, 0))
+ActiveConnection = namedtuple('ActiveConnection', ('name', 'uuid', 'type', 'device'))
+
+
+def unescape(value):
+    if '\\' not in value:
+        return value
+    out = []
+    chars = iter(value)
+    for ch in chars:
+        if ch == '\\':
+            ch = next(chars, '\\')
+        out.append(ch)
+    return ''.join(out)
+
+
+def split_terse(line):
+    """Split one terse line into unescaped fields."""
+    if '\\' not in line:
+        return line.split(':')
+    if '\0' not in line:
+        hidden = line.replace('\\\\', '\0\1').replace('\\:', '\0\2')
+        if '\\' not in hidden:
+            return [field.replace('\0\2', ':').replace('\0\1', '\\') if '\0' in field else field
+                    for field in hidden.split(':')]
+    fields = []
+    current = []
+    chars = iter(line)
+    for ch in chars:
+        if ch == '\\':
+            current.append(next(chars, '\\'))
+        elif ch == ':':
+            fields.append(''.join(current))
+            current = []
+        else:
+            current.append(ch)
+    fields.append(''.join(current))
+    return fields
+
+
+def iter_terse(output, field_count):
+    """Yield the fields of every terse line that has `field_count` fields."""
+    for line in output.split('\n'):
+        if not line:
+            continue
+        fields = split_terse(line)
+        if len(fields) == field_count:
+            yield fields
+
+
+def iter_multiline(output, first_key):
+    """Yield one dict per record of `-m multiline` output.
+
+    A new record starts at every `first_key` line. Indexed keys such as
+    IP4.ADDRESS[1], IP4.ADDRESS[2] are collected into a list under the
+    bare key (IP4.ADDRESS).
+    """
+    record = None
+    for line in output.split('\n'):
+        key, sep, value = line.partition(':')
+        if not sep:
+            continue
+        value = unescape(value)
+        if key == first_key:
+            if record is not None:
+                yield record
+            record = {key: value}
+        elif record is None:
+            continue
+        elif key.endswith(']'):
+            if value:
+                record.setdefault(key[:key.index('[')], []).append(value)
+        else:
+            record[key] = value
+    if record is not None:
+        yield record
+
+
+def _to_int(value):
+    try:
+        return int(value)
+    except ValueError:
+        return 0
+
+
+WIFI_COLUMNS = ('SSID', 'SIGNAL', 'SECURITY', 'BARS', 'IN-USE', 'BSSID', 'FREQ', 'CHAN', 'RATE')
+
+
+def _wifi_columns(fields):
+    """(field count, index of each of WIFI_COLUMNS) for a `device wifi list` -f list.
+
+    The index is None for a column not in `fields`; SSID and SIGNAL are required.
+    """
+    names = fields.split(',')
+    for required in ('SSID', 'SIGNAL'):
+        if required not in names:
+            raise ValueError(f'{required} missing from the fields {fields!r}')
+    return len(names), tuple(names.index(name) if name in names else None for name in WIFI_COLUMNS)
+
+
+def parse_access_points(output, fields):
+    """Parse `nmcli -t -f <fields> device wifi list` into one WifiNetwork per access point.
+
+    `fields` is the -f list, which must contain SSID and SIGNAL. Hidden
+    networks (empty SSID) are skipped.
+    """
+    count, (ssid_i, signal_i, security_i, bars_i, in_use_i, bssid_i, freq_i, chan_i, rate_i) = \
+        _wifi_columns(fields)
+
+    access_points = []
+    for parts in iter_terse(output, count):
+        ssid = parts[ssid_i]
+        if not ssid:
+            continue
+        access_points.append(WifiNetwork(
+            ssid,
+            _to_int(parts[signal_i]),
+            parts[security_i] if security_i is not None else '',
+            parts[bars_i] if bars_i is not None else '',
+            in_use_i is not None and parts[in_use_i] == '*',
+            parts[bssid_i] if bssid_i is not None else '',
+            # "2437 MHz"
+            _to_int(parts[freq_i].partition(' ')[0]) if freq_i is not None else 0,
+            _to_int(parts[chan_i]) if chan_i is not None else 0,
+            # "270 Mbit/s"
+            _to_int(parts[rate_i].partition(' ')[0]) if rate_i is not None else 0,
+        ))
+    return access_points
+
+
+def best_per_ssid(access_points):
+    """One WifiNetwork per SSID: the access point in use wins, otherwise the strongest signal."""
+    networks = {}
+    for ap in access_points:
+        current = networks.get(ap.ssid)
+        if current is not None:
+            if current.in_use or (not ap.in_use and ap.signal <= current.signal):
+                continue
+        networks[ap.ssid] = ap
+    return list(networks.values())
+
+
+def group_by_ssid(access_points):
+    """Group access points by SSID in one pass: {ssid: [WifiNetwork, ...]}, insertion ordered."""
+    groups = {}
+    for ap in access_points:
+        group = groups.get(ap.ssid)
+        if group is None:
+            groups[ap.ssid] = [ap]
+        else:
+            group.append(ap)
+    return groups
+
+
+def parse_wifi_list(output, fields):
+    """Parse `nmcli -t -f <fields> device wifi list` into WifiNetwork records.
+
+    `fields` is the -f list, which must contain SSID and SIGNAL. Networks
+    are deduplicated by SSID in the same pass (see best_per_ssid); only
+    the surviving records are built.
+    """
+    count, (ssid_i, signal_i, security_i, bars_i, in_use_i, bssid_i, freq_i, _, _) = _wifi_columns(fields)
+
+    networks = {}
+    for parts in iter_terse(output, count):
+        ssid = parts[ssid_i]
+        # Skip empty SSIDs (hidden networks)
+        if not ssid:
+            continue
+        signal = _to_int(parts[signal_i])
+        in_use = in_use_i is not None and parts[in_use_i] == '*'
+
+        current = networks.get(ssid)
+        if current is not None:
+            if current.in_use or (not in_use and signal <= current.signal):
+                continue
+        networks[ssid] = WifiNetwork(
+            ssid,
+            signal,
+            parts[security_i] if security_i is not None else '',
+            parts[bars_i] if bars_i is not None else '',
+            in_use,
+            parts[bssid_i] if bssid_i is not None else '',
+            _to_int(parts[freq_i].partition(' ')[0]) if freq_i is not None else 0,
+        )
+    return list(networks.values())
+
+
+def parse_device_show(output):
+    """Parse `nmcli -t -m multiline -f GENERAL.*,IP4.ADDRESS,IP6.ADDRESS device show`."""
+    devices = []
+    for record in iter_multiline(output, 'GENERAL.DEVICE'):
+        state = record.get('GENERAL.STATE', '')
+        # "100 (connected)" -> "connected"
+        if state.endswith(')') and ' (' in state:
+            state = state[state.index(' (') + 2:-1]
+        ip4 = record.get('IP4.ADDRESS', [])
+        devices.append({
+            'device': record['GENERAL.DEVICE'],
+            'type': record.get('GENERAL.TYPE', ''),
+            'state': state,
+            'connection': record.get('GENERAL.CONNECTION', ''),
+            # Keep 'ip' as the first IPv4 address for the frontend
+            'ip': ip4[0] if ip4 else '',
+            'ip4': ip4,
+            'ip6': record.get('IP6.ADDRESS', []),
+        })
+    return devices
+
+
+def parse_active_connections(output):
+    """Parse `nmcli -t -f NAME,UUID,TYPE,DEVICE connection show --active`."""
+    return [ActiveConnection(*parts) for parts in iter_terse(output, 4)]
+
+
+def parse_ip4_config(output):
+    """Parse `nmcli -t -m multiline -f GENERAL.DEVICE,IP4.GATEWAY,IP4.DNS device show <dev>`.
+
+    Returns (gateway or None, [dns servers]).
+    """
+    record = next(iter_multiline(output, 'GENERAL.DEVICE'), {})
+    gateway = record.get('IP4.GATEWAY', '')
+    if gateway in ('', '--'):
+        gateway = None
+    return gateway, record.get('IP4.DNS', [])
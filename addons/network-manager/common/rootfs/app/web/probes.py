@@ -0,0 +1,376 @@
+"""Connectivity and throughput probes for the active connection.
+
+A background prober checks the connected device (Wi-Fi first) every
+PROBE_INTERVAL seconds; 0 turns the schedule off, POST /api/probe still
+works:
+
+- gateway: PROBE_PING_COUNT pings to the IPv4 gateway of the device,
+  giving packet loss and min/avg/max round-trip time
+- dns: one A query for PROBE_DNS_NAME sent over UDP straight to every
+  DNS server of the device and timed, so no resolver cache answers it
+- throughput (optional): download up to PROBE_THROUGHPUT_BYTES from
+  PROBE_THROUGHPUT_URL. It is meant to be a host on the local network
+  (NAS, router) and runs at most every PROBE_THROUGHPUT_INTERVAL seconds
+  on the schedule, so it does not eat into an uplink.
+
+Requested probes are rate limited: within PROBE_MIN_INTERVAL of the last
+one (or of the last throughput test, when one is asked for) the request
+is refused with the last result. Results are kept in a ring buffer of
+PROBE_HISTORY entries.
+
+A probe finds problems when the gateway loses PROBE_MAX_LOSS percent of
+the pings or more, gateway or DNS latency is above PROBE_MAX_LATENCY ms,
+no DNS server answers, or throughput is under PROBE_MIN_THROUGHPUT
+Mbit/s. After PROBE_DEGRADED_AFTER such probes in a row the link is
+flagged degraded; one clean probe clears the flag. Listeners get
+(previous, current) results after every probe, which reconnect uses to
+move a degraded link to a better access point.
+"""
+import os
+import random
+import re
+import socket
+import struct
+import subprocess
+import threading
+import time
+import urllib.request
+from collections import deque
+
+import executor
+import metrics
+import nmcli_parser
+import status_cache
+
+INTERVAL = int(os.environ.get('PROBE_INTERVAL', '60'))
+MIN_INTERVAL = int(os.environ.get('PROBE_MIN_INTERVAL', '10'))
+HISTORY = int(os.environ.get('PROBE_HISTORY', '120'))
+PING_COUNT = int(os.environ.get('PROBE_PING_COUNT', '5'))
+# Seconds to wait for a ping reply or a DNS answer
+TIMEOUT = float(os.environ.get('PROBE_TIMEOUT', '2'))
+DNS_NAME = os.environ.get('PROBE_DNS_NAME', 'example.com')
+DNS_PORT = int(os.environ.get('PROBE_DNS_PORT', '53'))
+THROUGHPUT_URL = os.environ.get('PROBE_THROUGHPUT_URL', '')
+THROUGHPUT_BYTES = int(os.environ.get('PROBE_THROUGHPUT_BYTES', '5000000'))
+THROUGHPUT_INTERVAL = int(os.environ.get('PROBE_THROUGHPUT_INTERVAL', '900'))
+# Upper bound for one throughput test, connection included
+THROUGHPUT_TIMEOUT = 30
+MAX_LOSS = float(os.environ.get('PROBE_MAX_LOSS', '20'))
+MAX_LATENCY = float(os.environ.get('PROBE_MAX_LATENCY', '150'))
+MIN_THROUGHPUT = float(os.environ.get('PROBE_MIN_THROUGHPUT', '0'))
+DEGRADED_AFTER = int(os.environ.get('PROBE_DEGRADED_AFTER', '3'))
+CHUNK_SIZE = 64 * 1024
+RTT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2)
+
+PING_COUNTS_RE = re.compile(r'(\d+) packets transmitted, (\d+) (?:packets )?received')
+PING_RTT_RE = re.compile(r'= ([\d.]+)/([\d.]+)/([\d.]+)')
+
+metrics.describe('probe_runs_total', 'counter', 'Connectivity probes by outcome (ok/problem/skipped/error)')
+metrics.describe('probe_gateway_rtt_seconds', 'histogram', 'Average gateway round-trip time per probe')
+metrics.describe('probe_dns_seconds', 'histogram', 'DNS query time per server')
+
+_lock = threading.Lock()
+_done = threading.Condition(_lock)
+_wake = threading.Event()
+_results = deque(maxlen=HISTORY)
+_state = {
+    'started': False,
+    'running': False,
+    'requested': False,
+    'throughput_requested': False,
+    'next_at': None,
+    'last_at': 0,
+    'last_throughput_at': 0,
+    # Probes with problems in a row
+    'bad_streak': 0,
+    'degraded_since': None,
+}
+_listeners = []
+
+
+def add_listener(listener):
+    """listener(previous, current) is called after every probe; previous may be None."""
+    _listeners.append(listener)
+
+
+def _link():
+    """The connected device to probe, Wi-Fi first; None when nothing is connected."""
+    snapshot, _ = status_cache.get_snapshot()
+    connected = [device for device in snapshot['devices'] if device['state'] == 'connected']
+    connected.sort(key=lambda device: device['type'] != 'wifi')
+    return connected[0] if connected else None
+
+
+def ping(address, count=PING_COUNT):
+    """Loss and round-trip times to `address`; loss is None when ping could not run."""
+    result = {'address': address, 'sent': count, 'received': 0, 'loss': None,
+              'min_ms': None, 'avg_ms': None, 'max_ms': None, 'error': None}
+    cmd = ['ping', '-n', '-q', '-c', str(count), '-i', '0.2', '-W', str(max(1, round(TIMEOUT))), address]
+    try:
+        process = subprocess.run(cmd, capture_output=True, text=True, timeout=count * 0.2 + TIMEOUT + 5)
+    except (OSError, subprocess.TimeoutExpired) as e:
+        result['error'] = str(e)
+        return result
+    # ping exits non-zero when nothing came back but still prints the summary
+    counts = PING_COUNTS_RE.search(process.stdout)
+    if counts is None:
+        result['error'] = (process.stderr or process.stdout).strip() or f'ping exited with {process.returncode}'
+        return result
+    sent, received = int(counts.group(1)), int(counts.group(2))
+    result.update(sent=sent, received=received,
+                  loss=round(100 * (sent - received) / sent, 1) if sent else 100.0)
+    rtt = PING_RTT_RE.search(process.stdout)
+    if rtt:
+        result.update(min_ms=float(rtt.group(1)), avg_ms=float(rtt.group(2)), max_ms=float(rtt.group(3)))
+    return result
+
+
+def _dns_query(name, query_id):
+    # Header: id, flags (recursion desired), one question; then QNAME, QTYPE A, QCLASS IN
+    header = struct.pack('>HHHHHH', query_id, 0x0100, 1, 0, 0, 0)
+    qname = b''.join(bytes([len(label)]) + label.encode('ascii') for label in name.split('.') if label)
+    return header + qname + b'\x00' + struct.pack('>HH', 1, 1)
+
+
+def query_dns(server, name=DNS_NAME, port=DNS_PORT):
+    """Time one A query to `server`; any answer, NXDOMAIN included, means it is reachable."""
+    result = {'server': server, 'latency_ms': None, 'rcode': None, 'error': None}
+    query_id = random.getrandbits(16)
+    family = socket.AF_INET6 if ':' in server else socket.AF_INET
+    try:
+        with socket.socket(family, socket.SOCK_DGRAM) as sock:
+            sock.settimeout(TIMEOUT)
+            start = time.perf_counter()
+            sock.sendto(_dns_query(name, query_id), (server, port))
+            while True:
+                data, _ = sock.recvfrom(512)
+                # Ignore stray datagrams that are not the answer to this query
+                if len(data) >= 12 and struct.unpack('>H', data[:2])[0] == query_id:
+                    break
+            result['latency_ms'] = round((time.perf_counter() - start) * 1000, 2)
+            result['rcode'] = data[3] & 0x0F
+    except socket.timeout:
+        result['error'] = 'timeout'
+    except OSError as e:
+        result['error'] = str(e)
+    return result
+
+
+def measure_throughput(url=None, limit=THROUGHPUT_BYTES):
+    """Download up to `limit` bytes from `url` and report the rate in Mbit/s."""
+    url = url or THROUGHPUT_URL
+    result = {'url': url, 'bytes': 0, 'seconds': None, 'mbps': None, 'error': None}
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(url, timeout=THROUGHPUT_TIMEOUT) as response:
+            while result['bytes'] < limit and time.perf_counter() - start < THROUGHPUT_TIMEOUT:
+                chunk = response.read(min(CHUNK_SIZE, limit - result['bytes']))
+                if not chunk:
+                    break
+                result['bytes'] += len(chunk)
+    except (OSError, ValueError) as e:
+        result['error'] = str(e)
+        return result
+    elapsed = time.perf_counter() - start
+    result['seconds'] = round(elapsed, 3)
+    if result['bytes']:
+        result['mbps'] = round(result['bytes'] * 8 / elapsed / 1e6, 2)
+    else:
+        result['error'] = 'no data received'
+    return result
+
+
+def problems(result):
+    """What is wrong with the link according to one probe result."""
+    found = []
+    gateway = result['gateway']
+    if gateway is not None and gateway['loss'] is not None:
+        if gateway['loss'] >= MAX_LOSS:
+            found.append(f"gateway loss {gateway['loss']:g}%")
+        elif gateway['avg_ms'] is not None and gateway['avg_ms'] > MAX_LATENCY:
+            found.append(f"gateway latency {gateway['avg_ms']:g} ms")
+    answered = [server['latency_ms'] for server in result['dns'] if server['latency_ms'] is not None]
+    if result['dns'] and not answered:
+        found.append('no DNS server answered')
+    elif answered and min(answered) > MAX_LATENCY:
+        found.append(f'DNS latency {min(answered):g} ms')
+    throughput = result['throughput']
+    if throughput is not None:
+        if throughput['error']:
+            found.append(f"throughput test failed: {throughput['error']}")
+        elif MIN_THROUGHPUT and throughput['mbps'] < MIN_THROUGHPUT:
+            found.append(f"throughput {throughput['mbps']:g} Mbit/s")
+    return found
+
+
+def probe(throughput=False):
+    """Probe the current link once, record the result and return it."""
+    result = {'at': time.time(), 'device': None, 'connection': None,
+              'gateway': None, 'dns': [], 'throughput': None, 'error': None}
+    try:
+        link = _link()
+        if link is None:
+            result['error'] = 'no connected device'
+        else:
+            result.update(device=link['device'], connection=link['connection'])
+            output = executor.run(['-t', '-m', 'multiline', '-f', 'GENERAL.DEVICE,IP4.GATEWAY,IP4.DNS',
+                                   'device', 'show', link['device']])
+            gateway, dns_servers = nmcli_parser.parse_ip4_config(output)
+            if gateway:
+                result['gateway'] = ping(gateway)
+            result['dns'] = [query_dns(server) for server in dns_servers]
+            if throughput and THROUGHPUT_URL:
+                result['throughput'] = measure_throughput()
+    except Exception as e:
+        result['error'] = executor.describe_error(e)
+    return _record(result)
+
+
+def _record(result):
+    # A probe that could not look at the link says nothing about its quality
+    measured = result['error'] is None
+    found = problems(result) if measured else []
+    with _lock:
+        previous = _results[-1] if _results else None
+        if not measured or not found:
+            _state['bad_streak'] = 0
+            _state['degraded_since'] = None
+        else:
+            _state['bad_streak'] += 1
+            if _state['bad_streak'] >= DEGRADED_AFTER and _state['degraded_since'] is None:
+                _state['degraded_since'] = result['at']
+        result['problems'] = found
+        result['degraded'] = _state['degraded_since'] is not None
+        _results.append(result)
+        _state['last_at'] = result['at']
+        if result['throughput'] is not None:
+            _state['last_throughput_at'] = result['at']
+        _done.notify_all()
+
+    if result['error']:
+        outcome = 'skipped' if result['device'] is None else 'error'
+    else:
+        outcome = 'problem' if found else 'ok'
+    metrics.inc('probe_runs_total', {'result': outcome})
+    if result['gateway'] is not None and result['gateway']['avg_ms'] is not None:
+        metrics.observe('probe_gateway_rtt_seconds', result['gateway']['avg_ms'] / 1000, buckets=RTT_BUCKETS)
+    for server in result['dns']:
+        if server['latency_ms'] is not None:
+            metrics.observe('probe_dns_seconds', server['latency_ms'] / 1000, buckets=RTT_BUCKETS)
+
+    for listener in _listeners:
+        try:
+            listener(previous, result)
+        except Exception as e:
+            print(f"Probe listener failed: {e}")
+    return result
+
+
+def request_probe(throughput=False, wait=0):
+    """Ask the prober for a probe now.
+
+    Returns {'status': 'rate_limited' | 'running' | 'done', 'result': ...}:
+    rate_limited with the last result and 'retry_after' seconds, done
+    with the new result when it finished within `wait` seconds.
+    """
+    now = time.time()
+    with _lock:
+        last = _state['last_throughput_at'] if throughput else _state['last_at']
+        if now - last < MIN_INTERVAL:
+            return {'status': 'rate_limited', 'retry_after': round(MIN_INTERVAL - (now - last), 1),
+                    'result': _results[-1] if _results else None}
+        _state['requested'] = True
+        _state['throughput_requested'] = _state['throughput_requested'] or throughput
+    _wake.set()
+    with _done:
+        finished = _done.wait_for(lambda: _results and _results[-1]['at'] >= now, timeout=wait)
+        if finished:
+            return {'status': 'done', 'result': _results[-1]}
+    return {'status': 'running', 'result': None}
+
+
+def _loop():
+    while True:
+        with _lock:
+            due = _state['next_at']
+            requested = _state['requested']
+        if not requested:
+            _wake.wait(None if due is None else max(0, due - time.time()))
+        _wake.clear()
+        now = time.time()
+        with _lock:
+            scheduled = due is not None and now >= due
+            if not _state['requested'] and not scheduled:
+                continue
+            throughput = _state['throughput_requested'] or bool(
+                scheduled and THROUGHPUT_URL and now - _state['last_throughput_at'] >= THROUGHPUT_INTERVAL)
+            _state.update(requested=False, throughput_requested=False, running=True)
+            if INTERVAL > 0:
+                _state['next_at'] = now + INTERVAL
+        try:
+            probe(throughput)
+        finally:
+            with _lock:
+                _state['running'] = False
+
+
+def is_degraded():
+    with _lock:
+        return _state['degraded_since'] is not None
+
+
+def history(limit=HISTORY):
+    """The last `limit` results, oldest first."""
+    with _lock:
+        results = list(_results)
+    return results[-limit:] if limit > 0 else []
+
+
+def stats():
+    with _lock:
+        next_at = _state['next_at']
+        return {
+            'interval': INTERVAL,
+            'running': _state['running'],
+            'degraded': _state['degraded_since'] is not None,
+            'degraded_since': _state['degraded_since'],
+            'bad_streak': _state['bad_streak'],
+            'next_probe_in': None if next_at is None else round(max(0, next_at - time.time()), 3),
+            'throughput_url': THROUGHPUT_URL or None,
+            'thresholds': {
+                'max_loss': MAX_LOSS,
+                'max_latency_ms': MAX_LATENCY,
+                'min_throughput_mbps': MIN_THROUGHPUT,
+                'degraded_after': DEGRADED_AFTER,
+            },
+            'latest': _results[-1] if _results else None,
+        }
+
+
+def metric_lines():
+    with _lock:
+        degraded = _state['degraded_since'] is not None
+        throughput = next((r['throughput'] for r in reversed(_results) if r['throughput'] is not None), None)
+    lines = [
+        '# HELP link_degraded 1 while the probes flag the active link as degraded',
+        '# TYPE link_degraded gauge',
+        f'link_degraded {int(degraded)}',
+    ]
+    if throughput is not None and throughput['mbps'] is not None:
+        lines += [
+            '# HELP probe_throughput_mbps Result of the last throughput test',
+            '# TYPE probe_throughput_mbps gauge',
+            f"probe_throughput_mbps {throughput['mbps']}",
+        ]
+    return lines
+
+
+def start():
+    """Start the prober; the first scheduled probe runs PROBE_INTERVAL seconds from now."""
+    with _lock:
+        if _state['started']:
+            return
+        _state['started'] = True
+        if INTERVAL > 0:
+            _state['next_at'] = time.time() + INTERVAL
+    threading.Thread(target=_loop, name='link-prober', daemon=True).start()
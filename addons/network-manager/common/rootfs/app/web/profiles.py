@@ -0,0 +1,100 @@
+"""Wi-Fi connection profile builder.
+
+Creates or updates a profile with all of its settings in a single nmcli
+call and activates it exactly once. If activation fails the change is
+rolled back: a newly added profile is deleted, an existing one gets its
+previous values for the properties that were changed.
+"""
+import re
+import subprocess
+
+import executor
+import nmcli_parser
+
+WIFI_TYPE = '802-11-wireless'
+
+
+def nmcli(args):
+    """Run nmcli, raising CalledProcessError (with stderr) on failure."""
+    return executor.run(args)
+
+
+def wifi_profiles():
+    """(name, uuid) of every saved Wi-Fi profile."""
+    output = nmcli(['-t', '-f', 'NAME,UUID,TYPE', 'connection', 'show'])
+    return [(name, uuid) for name, uuid, conn_type in nmcli_parser.iter_terse(output, 3)
+            if conn_type == WIFI_TYPE]
+
+
+def find_wifi_profile(ssid):
+    """Return the UUID of the saved Wi-Fi profile named after `ssid`, or None."""
+    for name, uuid in wifi_profiles():
+        if name == ssid:
+            return uuid
+    return None
+
+
+def ipv4_settings(method, ip='', gateway='', dns=''):
+    """Build the ipv4.* property list for `nmcli connection add/modify`."""
+    if method != 'manual':
+        return ['ipv4.method', 'auto', 'ipv4.addresses', '', 'ipv4.gateway', '', 'ipv4.dns', '']
+    # Remove spaces and handle comma separated DNS
+    dns_clean = (dns or '').replace(' ', '')
+    return ['ipv4.method', 'manual', 'ipv4.addresses', ip,
+            'ipv4.gateway', gateway, 'ipv4.dns', dns_clean]
+
+
+def security_settings(password, key_mgmt='wpa-psk'):
+    if not password:
+        return []
+    return ['wifi-sec.key-mgmt', key_mgmt, 'wifi-sec.psk', password]
+
+
+def wireless_settings(bssid=None):
+    """Lock the profile to one access point, or clear the lock when bssid is empty."""
+    return ['802-11-wireless.bssid', bssid or '']
+
+
+def _read_settings(uuid, keys):
+    """Current values of `keys` as a property/value list, secrets included."""
+    output = nmcli(['-t', '-m', 'multiline', '--show-secrets', '-f', ','.join(keys),
+                    'connection', 'show', uuid])
+    record = next(nmcli_parser.iter_multiline(output, keys[0]), {})
+    previous = []
+    for key in keys:
+        previous.extend([key, record.get(key, '')])
+    return previous
+
+
+def add_profile(ssid, settings):
+    """Add a Wi-Fi profile named after `ssid` in one call and return its UUID."""
+    output = nmcli(['connection', 'add', 'type', 'wifi', 'con-name', ssid, 'ssid', ssid] + settings)
+    # "Connection 'x' (<uuid>) successfully added."
+    match = re.search(r'\(([0-9a-fA-F-]{36})\)', output)
+    if not match:
+        raise RuntimeError(f'Unexpected nmcli output: {output}')
+    return match.group(1)
+
+
+def apply_and_activate(ssid, settings, uuid=None):
+    """Update profile `uuid`, or add one for `ssid` when it is None, then bring it up once.
+
+    `settings` is a flat property/value list (see ipv4_settings and
+    security_settings). Returns the profile UUID.
+    """
+    if uuid is None:
+        uuid = add_profile(ssid, settings)
+        rollback = ['connection', 'delete', uuid]
+    else:
+        rollback = ['connection', 'modify', uuid] + _read_settings(uuid, settings[::2])
+        nmcli(['connection', 'modify', uuid] + settings)
+
+    try:
+        nmcli(['connection', 'up', uuid])
+    except Exception:
+        try:
+            nmcli(rollback)
+        except (subprocess.CalledProcessError, subprocess.TimeoutExpired) as e:
+            print(f"Rollback of profile {uuid} failed: {executor.describe_error(e)}")
+        raise
+    return uuid
@@ -0,0 +1,271 @@
+"""Declarative multi-network provisioning.
+
+A desired-state document lists the Wi-Fi profiles a device should have:
+
+    {
+        "networks": [
+            {"ssid": "office", "password": "...", "priority": 20},
+            {"ssid": "lab", "password": "...", "method": "manual",
+             "ip": "10.0.0.5/24", "gateway": "10.0.0.1", "dns": "10.0.0.1",
+             "priority": 10, "autoconnect": true, "bssid": "AA:BB:CC:DD:EE:FF"}
+        ],
+        "activate": "office",
+        "prune": false
+    }
+
+plan() reads every saved Wi-Fi profile with three nmcli calls (the
+known-network index is re-read, then the settings of the profiles in
+use are read at once) and diffs them against the document: a network is
+added, modified (only the properties that differ are passed to nmcli)
+or left alone. Saved profiles are matched on their SSID, like connect
+does (see known_networks.py), so a profile saved as "office 1" is the
+one modified for "office". With "prune" the Wi-Fi profiles of SSIDs not
+in the document are deleted.
+
+apply() runs the plan with one nmcli call per changed profile (two
+when its security is removed) and activates nothing in between, so the
+link does not flap; at the end at most one profile is brought up:
+"activate" names it, false skips activation, and by default it is the
+highest-priority network seen in the last scan. It is only brought up
+when it is not already the active profile or a change to it needs
+re-activation. If a step fails, the steps done so far are undone in
+reverse order; deletions run last, after activation succeeded, because
+they cannot be undone.
+
+A network without "password" keeps the security settings of an existing
+profile (new profiles are open); "password": "" makes it an open network.
+"""
+import re
+import subprocess
+
+import executor
+import known_networks
+import nmcli_parser
+import profiles
+
+# Properties compared and set for every network of the document
+MANAGED_KEYS = (
+    'ipv4.method', 'ipv4.addresses', 'ipv4.gateway', 'ipv4.dns',
+    'wifi-sec.key-mgmt', 'wifi-sec.psk',
+    '802-11-wireless.bssid',
+    'connection.autoconnect', 'connection.autoconnect-priority',
+)
+# Changing only these does not require bringing an active profile up again
+NO_REACTIVATION_KEYS = ('connection.autoconnect', 'connection.autoconnect-priority')
+SECURITY_SETTING = '802-11-wireless-security'
+DEFAULT_PRIORITY = 0
+
+
+def nmcli(args):
+    return executor.run(args)
+
+
+def _normalise(key, value):
+    """Bring nmcli's and the document's spelling of a value to one form."""
+    value = (value or '').strip()
+    if value == '--':
+        return ''
+    if key in ('ipv4.addresses', 'ipv4.dns'):
+        return ','.join(v for v in re.split(r'[,\s]+', value) if v)
+    if key == '802-11-wireless.bssid':
+        return value.upper()
+    if key == 'connection.autoconnect':
+        return {'true': 'yes', 'false': 'no'}.get(value.lower(), value.lower())
+    return value
+
+
+def _listed():
+    """[(ssid, [uuid, ...])] of the saved Wi-Fi profiles, the one to use first.
+
+    From the known-network index, read again so changes made outside the
+    app are seen. With the index turned off, by profile name.
+    """
+    if known_networks.ENABLED:
+        return [(ssid, [entry['uuid'] for entry in group])
+                for ssid, group in known_networks.refresh().items()]
+    by_name = {}
+    for name, uuid in profiles.wifi_profiles():
+        by_name.setdefault(name, []).append(uuid)
+    return list(by_name.items())
+
+
+def read_profiles():
+    """{ssid: {'uuid': ..., 'others': [uuid, ...], key: value}} of the saved Wi-Fi profiles.
+
+    When several profiles are saved for one SSID the settings are those
+    of the one connect would use; the rest are listed under 'others'.
+    """
+    listed = _listed()
+    if not listed:
+        return {}
+    keys = ('connection.uuid',) + MANAGED_KEYS
+    output = nmcli(['-t', '-m', 'multiline', '--show-secrets', '-f', ','.join(keys),
+                    'connection', 'show'] + [uuids[0] for _, uuids in listed])
+    by_uuid = {record['connection.uuid']: record
+               for record in nmcli_parser.iter_multiline(output, 'connection.uuid')}
+    current = {}
+    for ssid, uuids in listed:
+        record = dict(by_uuid.get(uuids[0], {}))
+        record['uuid'] = uuids[0]
+        record['others'] = uuids[1:]
+        current[ssid] = record
+    return current
+
+
+def desired_settings(network, current=None, key_mgmt_for=None):
+    """Flat property/value list for one network of the document."""
+    dns = network.get('dns') or ''
+    if isinstance(dns, list):
+        dns = ','.join(dns)
+    settings = profiles.ipv4_settings(network.get('method', 'auto'), network.get('ip'),
+                                      network.get('gateway'), ','.join(dns.split()))
+    password = network.get('password')
+    if password:
+        key_mgmt = (network.get('key_mgmt')
+                    or (current or {}).get('wifi-sec.key-mgmt')
+                    or (key_mgmt_for(network['ssid']) if key_mgmt_for else 'wpa-psk'))
+        settings += profiles.security_settings(password, key_mgmt)
+    settings += profiles.wireless_settings(network.get('bssid'))
+    settings += ['connection.autoconnect', 'yes' if network.get('autoconnect', True) else 'no',
+                 'connection.autoconnect-priority', str(network.get('priority', DEFAULT_PRIORITY))]
+    return settings
+
+
+def _diff(settings, current):
+    """(changed keys, changed property/value list, previous values of those keys)."""
+    keys, changed, previous = [], [], []
+    for key, value in zip(settings[::2], settings[1::2]):
+        if _normalise(key, value) != _normalise(key, current.get(key)):
+            keys.append(key)
+            changed.extend([key, value])
+            previous.extend([key, current.get(key) or ''])
+    return keys, changed, previous
+
+
+def _modify_step(ssid, network, settings, existing):
+    uuid = existing['uuid']
+    keys, changed, previous = _diff(settings, existing)
+    had_security = bool(existing.get('wifi-sec.key-mgmt'))
+    commands, rollback = [], []
+    if not had_security:
+        # Security is being added: undo by removing the setting, not by
+        # writing empty wifi-sec values (which nmcli rejects)
+        if 'wifi-sec.key-mgmt' in keys:
+            rollback.append(['connection', 'modify', uuid, 'remove', SECURITY_SETTING])
+        previous = [v for key, value in zip(previous[::2], previous[1::2])
+                    if not key.startswith('wifi-sec.') for v in (key, value)]
+    if changed:
+        commands.append(['connection', 'modify', uuid] + changed)
+    if network.get('password') == '' and had_security:
+        keys.append(SECURITY_SETTING)
+        commands.append(['connection', 'modify', uuid, 'remove', SECURITY_SETTING])
+        previous += ['wifi-sec.key-mgmt', existing['wifi-sec.key-mgmt'],
+                     'wifi-sec.psk', existing.get('wifi-sec.psk') or '']
+    if previous:
+        rollback.append(['connection', 'modify', uuid] + previous)
+    return {'ssid': ssid, 'action': 'modify' if keys else 'unchanged', 'uuid': uuid,
+            'changes': keys, '_commands': commands, '_rollback': rollback}
+
+
+def _activation_target(document, visible_ssids):
+    activate = document.get('activate')
+    if activate is False:
+        return None
+    if activate:
+        return activate
+    candidates = sorted((n for n in document['networks'] if n.get('autoconnect', True)),
+                        key=lambda n: n.get('priority', DEFAULT_PRIORITY), reverse=True)
+    for network in candidates:
+        if visible_ssids is None or network['ssid'] in visible_ssids:
+            return network['ssid']
+    return None
+
+
+def plan(document, visible_ssids=None, active_uuids=(), key_mgmt_for=None):
+    """Diff the document against the saved profiles; nothing is changed yet.
+
+    `visible_ssids` (SSIDs in range, None if unknown) picks the default
+    network to activate, `active_uuids` tells whether it is already up.
+    """
+    current = read_profiles()
+    steps = []
+    for network in document['networks']:
+        ssid = network['ssid']
+        existing = current.get(ssid)
+        settings = desired_settings(network, existing, key_mgmt_for)
+        if existing is None:
+            steps.append({'ssid': ssid, 'action': 'add', 'uuid': None,
+                          'changes': settings[::2], '_settings': settings})
+            continue
+        steps.append(_modify_step(ssid, network, settings, existing))
+
+    if document.get('prune'):
+        wanted = {network['ssid'] for network in document['networks']}
+        for ssid, existing in current.items():
+            if ssid not in wanted:
+                steps.extend({'ssid': ssid, 'action': 'delete', 'uuid': uuid, 'changes': []}
+                             for uuid in [existing['uuid']] + existing['others'])
+
+    activation = None
+    target = _activation_target(document, visible_ssids)
+    for step in steps:
+        if step['ssid'] == target and step['action'] != 'delete':
+            needs_up = (step['uuid'] not in active_uuids
+                        or any(key not in NO_REACTIVATION_KEYS for key in step['changes']))
+            activation = {'ssid': target, 'needed': needs_up}
+    return {'steps': steps, 'activate': activation}
+
+
+def describe(result):
+    """The plan without settings values (they include secrets), for API responses."""
+    return {
+        'steps': [{key: value for key, value in step.items() if not key.startswith('_')}
+                  for step in result['steps']],
+        'activate': result['activate'],
+    }
+
+
+def _undo(rollbacks):
+    for args in reversed(rollbacks):
+        try:
+            nmcli(args)
+        except (subprocess.CalledProcessError, subprocess.TimeoutExpired) as e:
+            print(f"Provisioning rollback failed ({' '.join(args[:3])}): {executor.describe_error(e)}")
+
+
+def apply(result):
+    """Run a plan from plan(); returns the SSID brought up, or None.
+
+    On failure every add/modify already done is rolled back and the
+    error is raised again.
+    """
+    rollbacks = []
+    uuids = {}
+    try:
+        for step in result['steps']:
+            if step['action'] == 'add':
+                step['uuid'] = profiles.add_profile(step['ssid'], step['_settings'])
+                rollbacks.append(['connection', 'delete', step['uuid']])
+            elif step['action'] == 'modify':
+                rollbacks.extend(step['_rollback'])
+                for args in step['_commands']:
+                    nmcli(args)
+            uuids[step['ssid']] = step['uuid']
+
+        activated = None
+        activation = result['activate']
+        if activation and activation['needed']:
+            nmcli(['connection', 'up', uuids[activation['ssid']]])
+            activated = activation['ssid']
+    except Exception:
+        _undo(rollbacks)
+        raise
+
+    for step in result['steps']:
+        if step['action'] == 'delete':
+            try:
+                nmcli(['connection', 'delete', step['uuid']])
+            except (subprocess.CalledProcessError, subprocess.TimeoutExpired) as e:
+                # The networks are in place; a leftover profile is reported, not rolled back
+                step['error'] = executor.describe_error(e)
+    return activated
@@ -0,0 +1,385 @@
+"""Automatic Wi-Fi reconnect, driven by NetworkManager state changes.
+
+Replaces the `network-manager.sh monitor` polling loop. The monitor is a
+status_cache listener, so a drop is seen as soon as `nmcli monitor`
+reports it (plus the refresh debounce) instead of on the next poll.
+
+When the Wi-Fi device goes to 'disconnected' the first attempt runs right
+away; further attempts back off exponentially with jitter up to
+RECONNECT_BACKOFF_MAX seconds. The last profile that was connected, and
+the BSSID of its access point, are remembered so the attempt re-associates
+with the same AP (`connection up <uuid> ap <bssid>`) before falling back
+to any AP of that profile. Before anything was connected the target is
+INITIAL_WIFI_SSID.
+
+When the connectivity probes flag a connected link as degraded (see
+probes.py) the profile is brought up again, on the best-ranked access
+point of its SSID if that is not the current one; at most once every
+RECONNECT_ROAM_MIN_INTERVAL seconds, so a slow uplink does not make the
+link flap.
+
+Every attempt and re-association is written to the audit log (audit.py).
+
+A disconnect requested through the API pauses the monitor until the
+device is connected again. While profiles are being provisioned (see
+hold()) a drop is noted but no attempt is made, so the monitor does not
+race the provisioning run for the radio.
+"""
+import os
+import random
+import subprocess
+import threading
+import time
+
+import audit
+import executor
+import known_networks
+import metrics
+import nmcli_parser
+import probes
+import signal_history
+import status_cache
+
+ENABLED = os.environ.get('AUTO_RECONNECT', 'true') == 'true'
+BACKOFF_BASE = float(os.environ.get('RECONNECT_BACKOFF_BASE', '2'))
+BACKOFF_MAX = float(os.environ.get('RECONNECT_BACKOFF_MAX', '120'))
+# Used only while `nmcli monitor` is not running (no events to wait for)
+FALLBACK_POLL_INTERVAL = int(os.environ.get('WIFI_SCAN_INTERVAL', '30'))
+ROAM_MIN_INTERVAL = int(os.environ.get('RECONNECT_ROAM_MIN_INTERVAL', '600'))
+
+metrics.describe('wifi_reconnect_attempts_total', 'counter', 'Automatic reconnect attempts by result')
+metrics.describe('wifi_reconnect_outage_seconds', 'histogram', 'Time from a Wi-Fi drop to being connected again')
+metrics.describe('wifi_roam_total', 'counter', 'Re-associations of a degraded link by result')
+
+_lock = threading.Lock()
+_wake = threading.Event()
+_state = {
+    'started': False,
+    'paused': False,
+    # Number of running hold() sections
+    'held': 0,
+    'device': None,
+    'device_state': None,
+    # Last connected Wi-Fi profile: {'device', 'connection', 'uuid', 'bssid'}
+    'last_good': None,
+    'bssid_pending': False,
+    'dropped_at': None,
+    'attempt': 0,
+    'next_attempt_at': None,
+    'reconnecting': False,
+    # Probe problems that asked for a re-association, until it runs
+    'roam_reason': None,
+    'roamed_at': 0,
+}
+_stats = {
+    'drops': 0,
+    'attempts': 0,
+    'successes': 0,
+    'failures': 0,
+    'last_drop_at': None,
+    'last_reconnect_at': None,
+    'last_outage': None,
+    'last_error': None,
+    'roams': 0,
+    'last_roam': None,
+}
+
+
+def backoff_delay(attempt):
+    """Delay before attempt number `attempt` (0 = first attempt after a drop)."""
+    if attempt == 0:
+        return 0
+    delay = min(BACKOFF_MAX, BACKOFF_BASE * 2 ** (attempt - 1))
+    # Jitter keeps several devices behind one AP from retrying in lockstep
+    return delay * random.uniform(0.5, 1.0)
+
+
+def _wifi_device(devices):
+    for device in devices:
+        if device['type'] == 'wifi':
+            return device
+    return None
+
+
+def _on_status(previous, current):
+    device = _wifi_device(current['devices'])
+    if device is None:
+        return
+    now = time.time()
+    wake = False
+    with _lock:
+        _state['device'] = device['device']
+        _state['device_state'] = device['state']
+        if device['state'] == 'connected':
+            uuid = next((c['uuid'] for c in current['active_connections']
+                         if c['device'] == device['device']), '')
+            last_good = _state['last_good']
+            if last_good is None or last_good['uuid'] != uuid:
+                _state['last_good'] = {
+                    'device': device['device'],
+                    'connection': device['connection'],
+                    'uuid': uuid,
+                    'bssid': None,
+                }
+                _state['bssid_pending'] = True
+                wake = True
+            if _state['dropped_at'] is not None:
+                outage = now - _state['dropped_at']
+                _stats['last_outage'] = round(outage, 3)
+                metrics.observe('wifi_reconnect_outage_seconds', outage)
+            _state.update(paused=False, dropped_at=None, attempt=0, next_attempt_at=None)
+        elif (device['state'] == 'disconnected' and ENABLED and not _state['paused']
+              and _state['dropped_at'] is None
+              and (_state['last_good'] is not None or os.environ.get('INITIAL_WIFI_SSID'))):
+            _state['dropped_at'] = now
+            _state['next_attempt_at'] = now
+            _stats['drops'] += 1
+            _stats['last_drop_at'] = now
+            wake = True
+    if wake:
+        _wake.set()
+
+
+def _current_bssid(device):
+    output = executor.run(['-t', '-f', 'IN-USE,BSSID', 'device', 'wifi', 'list',
+                           'ifname', device, '--rescan', 'no'])
+    for in_use, bssid in nmcli_parser.iter_terse(output, 2):
+        if in_use == '*':
+            return bssid
+    return None
+
+
+def _remember_bssid():
+    with _lock:
+        last_good = _state['last_good']
+        _state['bssid_pending'] = False
+    if last_good is None:
+        return
+    try:
+        bssid = _current_bssid(last_good['device'])
+    except (subprocess.CalledProcessError, subprocess.TimeoutExpired, executor.QueueFull) as e:
+        print(f"Reading the current BSSID failed: {executor.describe_error(e)}")
+        return
+    with _lock:
+        if _state['last_good'] is last_good:
+            last_good['bssid'] = bssid
+
+
+def _connect(target, device):
+    """Run one reconnect attempt; raises on failure."""
+    if target is not None and target['uuid']:
+        if target['bssid']:
+            try:
+                executor.run(['connection', 'up', target['uuid'], 'ifname', device, 'ap', target['bssid']])
+                return
+            except (subprocess.CalledProcessError, subprocess.TimeoutExpired) as e:
+                # The AP may be gone; any AP of the same profile will do
+                print(f"Reconnect to {target['bssid']} failed: {executor.describe_error(e)}")
+        executor.run(['connection', 'up', target['uuid'], 'ifname', device])
+        return
+
+    ssid = os.environ.get('INITIAL_WIFI_SSID')
+    if not ssid:
+        raise RuntimeError('No known network to reconnect to')
+    uuid = known_networks.uuid_for(ssid)
+    if uuid is not None:
+        executor.run(['connection', 'up', uuid, 'ifname', device])
+        return
+    cmd = ['device', 'wifi', 'connect', ssid, 'ifname', device]
+    password = os.environ.get('INITIAL_WIFI_PASSWORD')
+    if password:
+        cmd.extend(['password', password])
+    executor.run(cmd)
+
+
+def _on_probe(previous, current):
+    if not current['degraded'] or (previous is not None and previous['degraded']):
+        return
+    with _lock:
+        if (not ENABLED or _state['paused'] or not (_state['last_good'] or {}).get('uuid')
+                or _state['device'] != current['device'] or _state['device_state'] != 'connected'
+                or time.time() - _state['roamed_at'] < ROAM_MIN_INTERVAL):
+            return
+        _state['roam_reason'] = ', '.join(current['problems'])
+    _wake.set()
+
+
+def _better_bssid(target, ssid):
+    """Best-ranked access point of `ssid`, if it is not the current one."""
+    if not ssid:
+        return None
+    ranked = [entry for entry in signal_history.recommend(ssid=ssid)
+              if not entry['low_confidence']]
+    if ranked and ranked[0]['bssid'] != target['bssid']:
+        return ranked[0]['bssid']
+    return None
+
+
+def _roam():
+    with _lock:
+        reason = _state['roam_reason']
+        target = dict(_state['last_good'])
+        device = _state['device']
+        _state.update(roam_reason=None, roamed_at=time.time(), reconnecting=True)
+        _stats['roams'] += 1
+    try:
+        # The profile name need not be the SSID ("MySSID 1", a custom name)
+        ssid = known_networks.ssid_for(target['uuid'])
+    except (subprocess.CalledProcessError, subprocess.TimeoutExpired, executor.QueueFull) as e:
+        print(f"Reading the SSID of {target['connection']} failed: {executor.describe_error(e)}")
+        ssid = None
+    bssid = _better_bssid(target, ssid)
+    print(f"Link on {device} degraded ({reason}), re-associating"
+          f"{f' to {bssid}' if bssid else ''}...")
+    try:
+        with audit.operation('wifi.roam', {'device': device, 'connection': target['connection'], 'ssid': ssid,
+                                           'from_bssid': target['bssid'], 'bssid': bssid, 'reason': reason}):
+            # Falls back to any access point of the profile when `bssid` fails
+            _connect(dict(target, bssid=bssid), device)
+        error = None
+    except Exception as e:
+        error = executor.describe_error(e)
+    status_cache.invalidate()
+    try:
+        status_cache.refresh()
+    except Exception as e:
+        print(f"Status refresh after re-association failed: {e}")
+    with _lock:
+        _state['reconnecting'] = False
+        # The access point may have changed
+        _state['bssid_pending'] = True
+        _stats['last_roam'] = {'at': time.time(), 'reason': reason, 'ssid': ssid, 'bssid': bssid, 'error': error}
+    _wake.set()
+    metrics.inc('wifi_roam_total', {'result': 'failure' if error else 'success'})
+    if error:
+        print(f"Re-association failed: {error}")
+
+
+def _attempt():
+    with _lock:
+        target = dict(_state['last_good']) if _state['last_good'] else None
+        device = _state['device']
+        _state['reconnecting'] = True
+        _stats['attempts'] += 1
+        attempt = _state['attempt'] + 1
+    print(f"Wi-Fi on {device} disconnected, reconnecting (attempt {attempt})...")
+    params = {'device': device, 'attempt': attempt}
+    if target is not None:
+        params.update(connection=target['connection'], uuid=target['uuid'], bssid=target['bssid'])
+    try:
+        with audit.operation('wifi.reconnect', params):
+            _connect(target, device)
+        error = None
+    except Exception as e:
+        error = executor.describe_error(e)
+    # Read the new device state now instead of waiting for the monitor;
+    # _on_status clears the drop if the device is connected
+    status_cache.invalidate()
+    try:
+        status_cache.refresh()
+    except Exception as e:
+        print(f"Status refresh after reconnect failed: {e}")
+
+    now = time.time()
+    with _lock:
+        _state['reconnecting'] = False
+        if error is None:
+            _stats['successes'] += 1
+            _stats['last_reconnect_at'] = now
+        else:
+            _stats['failures'] += 1
+            _stats['last_error'] = error
+        if _state['dropped_at'] is not None and not _state['paused']:
+            _state['attempt'] += 1
+            _state['next_attempt_at'] = now + backoff_delay(_state['attempt'])
+    metrics.inc('wifi_reconnect_attempts_total', {'result': 'failure' if error else 'success'})
+    if error:
+        print(f"Reconnect failed: {error}")
+
+
+def _loop():
+    while True:
+        with _lock:
+            due = _state['next_attempt_at']
+        timeout = None if due is None else max(0, due - time.time())
+        polling = ENABLED and not status_cache.is_watching()
+        if polling:
+            timeout = FALLBACK_POLL_INTERVAL if timeout is None else min(timeout, FALLBACK_POLL_INTERVAL)
+        if _wake.wait(timeout):
+            _wake.clear()
+        if polling:
+            try:
+                # A direct read runs the listeners, including _on_status
+                status_cache.get_snapshot()
+            except Exception as e:
+                print(f"Status poll failed: {e}")
+
+        if _state['bssid_pending']:
+            _remember_bssid()
+        if _state['roam_reason'] and not _state['held'] and _state['dropped_at'] is None:
+            _roam()
+        with _lock:
+            due = _state['next_attempt_at']
+            if due is None or time.time() < due or _state['paused'] or _state['held']:
+                continue
+            _state['next_attempt_at'] = None
+        _attempt()
+
+
+def pause():
+    """Stop reconnecting until the device is connected again (user disconnect)."""
+    with _lock:
+        _state.update(paused=True, dropped_at=None, attempt=0, next_attempt_at=None)
+
+
+def hold():
+    """Defer reconnect attempts until release(); a drop seen meanwhile stays pending."""
+    with _lock:
+        _state['held'] += 1
+
+
+def release():
+    with _lock:
+        _state['held'] -= 1
+    _wake.set()
+
+
+def stats():
+    with _lock:
+        if not ENABLED:
+            status = 'disabled'
+        elif _state['paused']:
+            status = 'paused'
+        elif _state['held']:
+            status = 'held'
+        elif _state['reconnecting']:
+            status = 'reconnecting'
+        elif _state['next_attempt_at'] is not None:
+            status = 'waiting'
+        else:
+            status = 'idle'
+        next_at = _state['next_attempt_at']
+        return dict(
+            _stats,
+            enabled=ENABLED,
+            status=status,
+            device=_state['device'],
+            device_state=_state['device_state'],
+            last_good=dict(_state['last_good']) if _state['last_good'] else None,
+            attempt=_state['attempt'],
+            next_attempt_in=None if next_at is None else round(max(0, next_at - time.time()), 3),
+            outage=None if _state['dropped_at'] is None else round(time.time() - _state['dropped_at'], 3),
+        )
+
+
+def start():
+    """Register the status listener and start the reconnect thread."""
+    with _lock:
+        if _state['started']:
+            return
+        _state['started'] = True
+    status_cache.add_listener(_on_status)
+    probes.add_listener(_on_probe)
+    threading.Thread(target=_loop, name='wifi-reconnect', daemon=True).start()
+    # Check the current state once; later changes arrive as events
+    _wake.set()
@@ -0,0 +1,256 @@
+"""Signal history per access point (BSSID).
+
+Every scan result is recorded here, one sample per BSSID, into a
+fixed-size ring buffer backed by two arrays (unix seconds and signal
+strength), so a series costs a few bytes per sample and recording never
+allocates. At most MAX_BSSIDS series are kept; the one not seen for the
+longest time is dropped first.
+
+stats() summarises the samples of an SSID per access point (min, avg,
+max, variance) and recommend() ranks access points by their average
+signal, penalised by its spread and adjusted for the band, instead of
+trusting a single noisy sample.
+
+When WIFI_HISTORY_PATH is set the series are saved there (at most every
+SAVE_INTERVAL seconds and on shutdown) and loaded again on start.
+"""
+import base64
+import json
+import math
+import os
+import threading
+import time
+from array import array
+
+SAMPLES = int(os.environ.get('WIFI_HISTORY_SAMPLES', '240'))
+MAX_BSSIDS = int(os.environ.get('WIFI_HISTORY_MAX_BSSIDS', '512'))
+HISTORY_PATH = os.environ.get('WIFI_HISTORY_PATH', '')
+SAVE_INTERVAL = 300
+# Fewer samples than this and a recommendation is marked low-confidence
+MIN_SAMPLES = 3
+# Score bonus for 5/6 GHz: more throughput at the same signal, but only
+# worth it while the signal stays usable
+BAND_BONUS = {'2.4GHz': 0, '5GHz': 10, '6GHz': 10}
+BAND_BONUS_MIN_SIGNAL = 50
+
+_lock = threading.Lock()
+_save_lock = threading.Lock()
+_series = {}
+_state = {
+    'loaded': False,
+    'saved_at': 0,
+}
+
+
+def band_for(freq):
+    """Band name for a frequency in MHz ('' when unknown)."""
+    if not freq:
+        return ''
+    if freq < 3000:
+        return '2.4GHz'
+    if freq < 5925:
+        return '5GHz'
+    return '6GHz'
+
+
+def _new_series(ssid):
+    return {
+        'ssid': ssid,
+        'freq': 0,
+        'security': '',
+        'times': array('I', [0]) * SAMPLES,
+        'signals': array('B', [0]) * SAMPLES,
+        'head': 0,
+        'count': 0,
+        'last_seen': 0,
+    }
+
+
+def _append(series, timestamp, signal):
+    series['times'][series['head']] = timestamp
+    series['signals'][series['head']] = max(0, min(100, signal))
+    series['head'] = (series['head'] + 1) % SAMPLES
+    series['count'] = min(series['count'] + 1, SAMPLES)
+    series['last_seen'] = timestamp
+
+
+def record(access_points, timestamp=None):
+    """Add one sample per access point (nmcli_parser.WifiNetwork records with a BSSID)."""
+    now = int(timestamp or time.time())
+    with _lock:
+        for ap in access_points:
+            if not ap.bssid:
+                continue
+            series = _series.get(ap.bssid)
+            if series is None:
+                series = _series[ap.bssid] = _new_series(ap.ssid)
+            elif series['last_seen'] == now:
+                # Already sampled in this second (scan and sampler raced)
+                continue
+            series['ssid'] = ap.ssid
+            series['freq'] = ap.freq or series['freq']
+            series['security'] = ap.security
+            _append(series, now, ap.signal)
+
+        if len(_series) > MAX_BSSIDS:
+            by_age = sorted(_series, key=lambda bssid: _series[bssid]['last_seen'])
+            for bssid in by_age[:len(_series) - MAX_BSSIDS]:
+                del _series[bssid]
+    if HISTORY_PATH and now - _state['saved_at'] >= SAVE_INTERVAL:
+        save()
+
+
+def _samples(series, since=0):
+    """(time, signal) pairs in time order, oldest first."""
+    start = (series['head'] - series['count']) % SAMPLES
+    pairs = []
+    for i in range(series['count']):
+        j = (start + i) % SAMPLES
+        if series['times'][j] >= since:
+            pairs.append((series['times'][j], series['signals'][j]))
+    return pairs
+
+
+def _summary(signals):
+    count = len(signals)
+    if not count:
+        return {'samples': 0, 'min': None, 'avg': None, 'max': None, 'variance': None}
+    avg = sum(signals) / count
+    return {
+        'samples': count,
+        'min': min(signals),
+        'avg': round(avg, 2),
+        'max': max(signals),
+        'variance': round(sum((s - avg) ** 2 for s in signals) / count, 2),
+    }
+
+
+def _collect(ssid, window):
+    """[(bssid, ssid, freq, last_seen, samples)] for one SSID (or all), samples within `window`."""
+    since = int(time.time() - window) if window else 0
+    with _lock:
+        return [(bssid, series['ssid'], series['freq'], series['last_seen'], _samples(series, since))
+                for bssid, series in _series.items()
+                if ssid is None or series['ssid'] == ssid]
+
+
+def _access_points(collected, include_samples=False):
+    access_points = []
+    for bssid, ssid, freq, last_seen, pairs in collected:
+        if not pairs:
+            continue
+        entry = {
+            'bssid': bssid,
+            'ssid': ssid,
+            'freq': freq,
+            'band': band_for(freq),
+            'last_signal': pairs[-1][1],
+            'last_seen': last_seen,
+        }
+        entry.update(_summary([signal for _, signal in pairs]))
+        if include_samples:
+            entry['series'] = pairs
+        access_points.append(entry)
+    return access_points
+
+
+def ssids():
+    """Known SSIDs with their number of access points."""
+    with _lock:
+        counts = {}
+        for series in _series.values():
+            counts[series['ssid']] = counts.get(series['ssid'], 0) + 1
+    return [{'ssid': ssid, 'access_points': count} for ssid, count in sorted(counts.items())]
+
+
+def stats(ssid, window=None, include_samples=False):
+    """Signal statistics for an SSID, overall and per access point; None if never seen.
+
+    `window` limits the samples to the last N seconds.
+    """
+    collected = _collect(ssid, window)
+    access_points = _access_points(collected, include_samples)
+    if not access_points:
+        return None
+    result = {'ssid': ssid}
+    result.update(_summary([signal for *_, pairs in collected for _, signal in pairs]))
+    result['access_points'] = sorted(access_points, key=lambda ap: ap['avg'], reverse=True)
+    return result
+
+
+def score(entry):
+    """Ranking score: average signal minus its standard deviation, plus a band bonus."""
+    value = entry['avg'] - math.sqrt(entry['variance'])
+    if entry['avg'] >= BAND_BONUS_MIN_SIGNAL:
+        value += BAND_BONUS.get(entry['band'], 0)
+    return round(value, 2)
+
+
+def recommend(ssid=None, window=None, limit=10):
+    """Access points ranked best first, optionally limited to one SSID."""
+    ranked = []
+    for entry in _access_points(_collect(ssid, window)):
+        entry['score'] = score(entry)
+        entry['low_confidence'] = entry['samples'] < MIN_SAMPLES
+        ranked.append(entry)
+    # Well-sampled access points first, then by score
+    ranked.sort(key=lambda entry: (entry['low_confidence'], -entry['score']))
+    return ranked[:limit]
+
+
+def save():
+    """Write all series to WIFI_HISTORY_PATH (atomically)."""
+    if not HISTORY_PATH:
+        return
+    with _lock:
+        data = {
+            'samples': SAMPLES,
+            'series': {
+                bssid: {
+                    'ssid': s['ssid'],
+                    'freq': s['freq'],
+                    'security': s['security'],
+                    'times': base64.b64encode(s['times'].tobytes()).decode(),
+                    'signals': base64.b64encode(s['signals'].tobytes()).decode(),
+                    'head': s['head'],
+                    'count': s['count'],
+                    'last_seen': s['last_seen'],
+                }
+                for bssid, s in _series.items()
+            },
+        }
+        _state['saved_at'] = int(time.time())
+    tmp = f'{HISTORY_PATH}.tmp'
+    with _save_lock:
+        try:
+            with open(tmp, 'w') as f:
+                json.dump(data, f, separators=(',', ':'))
+            os.replace(tmp, HISTORY_PATH)
+        except OSError as e:
+            print(f"Saving signal history failed: {e}")
+
+
+def load():
+    """Load the series saved by save(); a file with a different buffer size is ignored."""
+    if not HISTORY_PATH or _state['loaded']:
+        return
+    _state['loaded'] = True
+    try:
+        with open(HISTORY_PATH) as f:
+            data = json.load(f)
+    except FileNotFoundError:
+        return
+    except (OSError, ValueError) as e:
+        print(f"Loading signal history failed: {e}")
+        return
+    if data.get('samples') != SAMPLES:
+        print("Signal history was saved with a different buffer size, starting empty")
+        return
+    with _lock:
+        for bssid, saved in data['series'].items():
+            series = _new_series(saved['ssid'])
+            series['times'] = array('I', base64.b64decode(saved['times']))
+            series['signals'] = array('B', base64.b64decode(saved['signals']))
+            series.update(freq=saved['freq'], security=saved['security'], head=saved['head'],
+                          count=saved['count'], last_seen=saved['last_seen'])
+            _series[bssid] = series
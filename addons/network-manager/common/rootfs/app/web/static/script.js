@@ -174,59 +174,107 @@ document.addEventListener('DOMContentLoaded', () => {
     function fetchStatus() {
         fetch('/api/status')
             .then(res => res.json())
-            .then(data => {
-                statusContainer.innerHTML = '';
-                if (data.length === 0) {
-                    statusContainer.innerHTML = '<div class="status-item">No network devices detected</div>';
-                    return;
-                }
-                data.forEach(dev => {
-                    const div = document.createElement('div');
-                    div.className = 'status-item';
-
-                    // Use SVG icons instead of emoji
-                    let iconClass = 'device-icon ethernet-icon';
-                    if (dev.type === 'wifi') iconClass = 'device-icon wifi-status-icon';
-
-                    let statusText = dev.state;
-                    let disconnectBtn = '';
-
-                    if (dev.state === 'connected') {
-                        statusText = `<span class="text-success">Connected</span> (${dev.connection})`;
-                        // Add disconnect button only for WiFi
-                        if (dev.type === 'wifi') {
-                            disconnectBtn = `<button class="btn btn-sm btn-disconnect" data-device="${dev.device}">Disconnect</button>`;
-                        }
-                    } else if (dev.state === 'disconnected') {
-                        statusText = '<span class="text-error">Disconnected</span>';
-                    }
-
-                    div.innerHTML = `
-                        <div><span class="${iconClass}"></span> <strong>${dev.device}</strong></div>
-                        <div class="status-info-action">
-                            <span>${statusText}</span>
-                            ${disconnectBtn}
-                        </div>
-                        <div>${dev.ip || '-'}</div>
-                    `;
-
-                    // Add event listener for disconnect button
-                    const btnDisconnect = div.querySelector('.btn-disconnect');
-                    if (btnDisconnect) {
-                        btnDisconnect.addEventListener('click', (e) => {
-                            e.stopPropagation();
-                            disconnectWifi(dev.device);
-                        });
-                    }
-
-                    statusContainer.appendChild(div);
-                });
-            })
+            .then(renderStatus)
             .catch(err => {
                 statusContainer.innerHTML = '<div class="loading text-error">Failed to get status: ' + err + '</div>';
             });
     }
 
+    // ========== Live updates (server-sent events) ==========
+    // The server pushes a snapshot on connect, then only diffs:
+    // {added: [...], removed: [keys], changed: [...]}
+    const deviceState = new Map();
+    const networkState = new Map();
+
+    function applyDiff(state, key, diff) {
+        diff.removed.forEach(k => state.delete(k));
+        diff.added.concat(diff.changed).forEach(record => state.set(record[key], record));
+        return Array.from(state.values());
+    }
+
+    function subscribeEvents() {
+        if (!window.EventSource) {
+            return;
+        }
+        const source = new EventSource('/api/events');
+
+        source.addEventListener('snapshot', e => {
+            const data = JSON.parse(e.data);
+            renderStatus(data.devices);
+            renderWifiList(data.networks);
+        });
+        source.addEventListener('device', e => {
+            renderStatus(applyDiff(deviceState, 'device', JSON.parse(e.data)));
+        });
+        source.addEventListener('scan', e => {
+            renderWifiList(applyDiff(networkState, 'ssid', JSON.parse(e.data)));
+        });
+        // On error EventSource reconnects by itself and receives a new snapshot,
+        // unless the server refused the stream (503 when too many are open)
+        source.onerror = () => {
+            if (source.readyState === EventSource.CLOSED) {
+                fetchStatus();
+                setTimeout(subscribeEvents, 15000);
+            }
+        };
+    }
+
+    function renderStatus(data) {
+        if (data.error) {
+            statusContainer.innerHTML = '<div class="loading text-error">Failed to get status: ' + data.error + '</div>';
+            return;
+        }
+        deviceState.clear();
+        data.forEach(dev => deviceState.set(dev.device, dev));
+
+        statusContainer.innerHTML = '';
+        if (data.length === 0) {
+            statusContainer.innerHTML = '<div class="status-item">No network devices detected</div>';
+            return;
+        }
+        data.forEach(dev => {
+            const div = document.createElement('div');
+            div.className = 'status-item';
+
+            // Use SVG icons instead of emoji
+            let iconClass = 'device-icon ethernet-icon';
+            if (dev.type === 'wifi') iconClass = 'device-icon wifi-status-icon';
+
+            let statusText = dev.state;
+            let disconnectBtn = '';
+
+            if (dev.state === 'connected') {
+                statusText = `<span class="text-success">Connected</span> (${dev.connection})`;
+                // Add disconnect button only for WiFi
+                if (dev.type === 'wifi') {
+                    disconnectBtn = `<button class="btn btn-sm btn-disconnect" data-device="${dev.device}">Disconnect</button>`;
+                }
+            } else if (dev.state === 'disconnected') {
+                statusText = '<span class="text-error">Disconnected</span>';
+            }
+
+            div.innerHTML = `
+                <div><span class="${iconClass}"></span> <strong>${dev.device}</strong></div>
+                <div class="status-info-action">
+                    <span>${statusText}</span>
+                    ${disconnectBtn}
+                </div>
+                <div>${dev.ip || '-'}</div>
+            `;
+
+            // Add event listener for disconnect button
+            const btnDisconnect = div.querySelector('.btn-disconnect');
+            if (btnDisconnect) {
+                btnDisconnect.addEventListener('click', (e) => {
+                    e.stopPropagation();
+                    disconnectWifi(dev.device);
+                });
+            }
+
+            statusContainer.appendChild(div);
+        });
+    }
+
     function scanWifi() {
         // Show loading state (if list is empty)
         const hasExistingItems = wifiListEl.querySelectorAll('.wifi-item').length > 0;
@@ -234,109 +282,143 @@ document.addEventListener('DOMContentLoaded', () => {
             wifiListEl.innerHTML = '<div class="loading">Scanning...</div>';
         }
 
-        fetch('/api/wifi/scan')
+        // Start (or join) a background rescan, show the last result right away,
+        // then update the list once the rescan job finishes
+        fetch('/api/wifi/scan', { method: 'POST' })
             .then(res => res.json())
-            .then(data => {
-                // If no WiFi networks
-                if (data.length === 0) {
-                    wifiListEl.innerHTML = '<div class="loading">No WiFi networks found</div>';
-                    return;
+            .then(job => {
+                fetch('/api/wifi/scan')
+                    .then(res => res.json())
+                    .then(renderWifiList)
+                    .catch(() => {});
+                if (job.id !== undefined && job.status === 'running') {
+                    pollScanJob(job.id);
+                }
+            })
+            .catch(err => {
+                wifiListEl.innerHTML = '<div class="loading">Scan failed: ' + err + '</div>';
+            });
+    }
+
+    function pollScanJob(jobId) {
+        fetch(`/api/wifi/scan/jobs/${jobId}?wait=15`)
+            .then(res => res.json())
+            .then(job => {
+                if (job.status === 'running') {
+                    pollScanJob(jobId);
+                } else if (job.status === 'done') {
+                    renderWifiList(job.networks);
                 }
+            })
+            .catch(err => {
+                wifiListEl.innerHTML = '<div class="loading">Scan failed: ' + err + '</div>';
+            });
+    }
 
-                // Sort by signal strength
-                data.sort((a, b) => (b.signal || 0) - (a.signal || 0));
+    function renderWifiList(data) {
+        if (data.error) {
+            wifiListEl.innerHTML = '<div class="loading">Scan failed: ' + data.error + '</div>';
+            return;
+        }
+        networkState.clear();
+        data.forEach(net => networkState.set(net.ssid, net));
 
-                // Differential update: Create Map of existing items
-                const existingItems = new Map();
-                wifiListEl.querySelectorAll('.wifi-item').forEach(item => {
-                    const ssid = item.getAttribute('data-ssid');
-                    if (ssid) {
-                        existingItems.set(ssid, item);
-                    }
-                });
+        // If no WiFi networks
+        if (data.length === 0) {
+            wifiListEl.innerHTML = '<div class="loading">No WiFi networks found</div>';
+            return;
+        }
 
-                // Track which SSIDs still exist
-                const currentSSIDs = new Set(data.map(net => net.ssid));
+        // Sort by signal strength
+        data.sort((a, b) => (b.signal || 0) - (a.signal || 0));
 
-                // Remove WiFi networks that no longer exist
-                existingItems.forEach((item, ssid) => {
-                    if (!currentSSIDs.has(ssid)) {
-                        item.remove();
-                        existingItems.delete(ssid);
-                    }
-                });
+        // Differential update: Create Map of existing items
+        const existingItems = new Map();
+        wifiListEl.querySelectorAll('.wifi-item').forEach(item => {
+            const ssid = item.getAttribute('data-ssid');
+            if (ssid) {
+                existingItems.set(ssid, item);
+            }
+        });
+
+        // Track which SSIDs still exist
+        const currentSSIDs = new Set(data.map(net => net.ssid));
+
+        // Remove WiFi networks that no longer exist
+        existingItems.forEach((item, ssid) => {
+            if (!currentSSIDs.has(ssid)) {
+                item.remove();
+                existingItems.delete(ssid);
+            }
+        });
 
-                // Remove loading indicator (if exists)
-                const loadingDiv = wifiListEl.querySelector('.loading');
-                if (loadingDiv) {
-                    loadingDiv.remove();
+        // Remove loading indicator (if exists)
+        const loadingDiv = wifiListEl.querySelector('.loading');
+        if (loadingDiv) {
+            loadingDiv.remove();
+        }
+
+        // Update or create WiFi items
+        data.forEach((net, index) => {
+            const existingItem = existingItems.get(net.ssid);
+
+            const isSecure = net.security && net.security !== '--';
+            const iconClass = isSecure ? 'wifi-icon wifi-signal secured' : 'wifi-icon wifi-signal unsecured';
+            const icon = `<div class="${iconClass}"></div>`;
+            const signalBars = createSignalBars(net.signal || 0);
+
+            const itemHTML = `
+                ${icon}
+                <div class="wifi-details">
+                    <div class="wifi-ssid">${net.ssid}</div>
+                    <div class="wifi-info">
+                        ${signalBars}
+                        <span>${net.signal}%</span>
+                        <span>•</span>
+                        <span>${net.security}</span>
+                    </div>
+                </div>
+                <div class="wifi-action">
+                     <button class="btn btn-sm">Connect</button>
+                </div>
+            `;
+
+            if (existingItem) {
+                // Update existing item (only when content changes)
+                if (existingItem.innerHTML !== itemHTML) {
+                    existingItem.innerHTML = itemHTML;
                 }
 
-                // Update or create WiFi items
-                data.forEach((net, index) => {
-                    const existingItem = existingItems.get(net.ssid);
-
-                    const isSecure = net.security && net.security !== '--';
-                    const iconClass = isSecure ? 'wifi-icon wifi-signal secured' : 'wifi-icon wifi-signal unsecured';
-                    const icon = `<div class="${iconClass}"></div>`;
-                    const signalBars = createSignalBars(net.signal || 0);
-
-                    const itemHTML = `
-                        ${icon}
-                        <div class="wifi-details">
-                            <div class="wifi-ssid">${net.ssid}</div>
-                            <div class="wifi-info">
-                                ${signalBars}
-                                <span>${net.signal}%</span>
-                                <span>•</span>
-                                <span>${net.security}</span>
-                            </div>
-                        </div>
-                        <div class="wifi-action">
-                             <button class="btn btn-sm">Connect</button>
-                        </div>
-                    `;
-
-                    if (existingItem) {
-                        // Update existing item (only when content changes)
-                        if (existingItem.innerHTML !== itemHTML) {
-                            existingItem.innerHTML = itemHTML;
-                        }
-
-                        // Ensure correct position (in sorted order)
-                        const currentIndex = Array.from(wifiListEl.children).indexOf(existingItem);
-                        if (currentIndex !== index) {
-                            if (index >= wifiListEl.children.length) {
-                                wifiListEl.appendChild(existingItem);
-                            } else {
-                                wifiListEl.insertBefore(existingItem, wifiListEl.children[index]);
-                            }
-                        }
+                // Ensure correct position (in sorted order)
+                const currentIndex = Array.from(wifiListEl.children).indexOf(existingItem);
+                if (currentIndex !== index) {
+                    if (index >= wifiListEl.children.length) {
+                        wifiListEl.appendChild(existingItem);
                     } else {
-                        // Create new item
-                        const item = document.createElement('div');
-                        item.className = 'wifi-item';
-                        item.setAttribute('data-ssid', net.ssid);
-                        item.innerHTML = itemHTML;
-
-                        item.addEventListener('click', () => {
-                            openConnectModal(net.ssid);
-                        });
-
-                        // Insert at correct position
-                        if (index >= wifiListEl.children.length) {
-                            wifiListEl.appendChild(item);
-                        } else {
-                            wifiListEl.insertBefore(item, wifiListEl.children[index]);
-                        }
-
-                        existingItems.set(net.ssid, item);
+                        wifiListEl.insertBefore(existingItem, wifiListEl.children[index]);
                     }
+                }
+            } else {
+                // Create new item
+                const item = document.createElement('div');
+                item.className = 'wifi-item';
+                item.setAttribute('data-ssid', net.ssid);
+                item.innerHTML = itemHTML;
+
+                item.addEventListener('click', () => {
+                    openConnectModal(net.ssid);
                 });
-            })
-            .catch(err => {
-                wifiListEl.innerHTML = '<div class="loading">Scan failed: ' + err + '</div>';
-            });
+
+                // Insert at correct position
+                if (index >= wifiListEl.children.length) {
+                    wifiListEl.appendChild(item);
+                } else {
+                    wifiListEl.insertBefore(item, wifiListEl.children[index]);
+                }
+
+                existingItems.set(net.ssid, item);
+            }
+        });
     }
 
     // Create signal strength visualization bars
@@ -400,17 +482,24 @@ document.addEventListener('DOMContentLoaded', () => {
             headers: {
                 'Content-Type': 'application/json'
             },
-            body: JSON.stringify(payload)
+            body: JSON.stringify(Object.assign({ async: true }, payload))
         })
             .then(res => res.json())
-            .then(data => {
-                if (data.error) {
-                    showToast('Connection failed: ' + data.error, 'error', 4000);
-                } else {
-                    showToast('Connection command sent, waiting for connection...', 'success', 3000);
-                    modal.classList.remove('show');
-                    setTimeout(fetchStatus, 5000); // Wait a bit then refresh status
+            .then(job => {
+                if (job.error) {
+                    showToast('Connection failed: ' + job.error, 'error', 4000);
+                    return;
                 }
+                showToast('Connection command sent, waiting for connection...', 'success', 3000);
+                modal.classList.remove('show');
+                return waitForJob(job.id).then(job => {
+                    if (job.status === 'failed') {
+                        showToast('Connection failed: ' + job.error, 'error', 4000);
+                    } else if (job.status === 'succeeded') {
+                        showToast(job.result.message, 'success', 3000);
+                    }
+                    fetchStatus();
+                });
             })
             .catch(err => {
                 showToast('Request error: ' + err, 'error', 4000);
@@ -421,6 +510,18 @@ document.addEventListener('DOMContentLoaded', () => {
             });
     }
 
+    // Long-poll a connect/disconnect job until it finishes
+    function waitForJob(jobId) {
+        return fetch(`/api/jobs/${jobId}?wait=30`)
+            .then(res => res.json())
+            .then(job => {
+                if (job.status === 'queued' || job.status === 'running') {
+                    return waitForJob(jobId);
+                }
+                return job;
+            });
+    }
+
     function disconnectWifi(device) {
         // Use custom modal instead of native confirm
         currentDisconnectDevice = device;
@@ -438,9 +539,10 @@ document.addEventListener('DOMContentLoaded', () => {
             headers: {
                 'Content-Type': 'application/json'
             },
-            body: JSON.stringify({ device: device })
+            body: JSON.stringify({ device: device, async: true })
         })
             .then(res => res.json())
+            .then(job => job.error ? job : waitForJob(job.id))
             .then(data => {
                 disconnectConfirmBtn.disabled = false;
                 disconnectConfirmBtn.innerText = 'Confirm';
@@ -463,4 +565,5 @@ document.addEventListener('DOMContentLoaded', () => {
 
     // Initial scan
     scanWifi();
+    subscribeEvents();
 });
@@ -0,0 +1,187 @@
+"""In-memory snapshot of devices and active connections.
+
+A background watcher follows `nmcli monitor` and refreshes the snapshot
+whenever NetworkManager reports a change, so the routes can answer from
+memory. When the watcher is not running (not started yet, nmcli monitor
+exited) or the snapshot was invalidated, get_snapshot() falls back to a
+direct query. Concurrent misses share one query: the first runs it, the
+others wait for its result, like callers of a running scan job in
+wifi_scan.py.
+"""
+import subprocess
+import threading
+import time
+
+import metrics
+
+# Coalesce bursts of monitor lines (one state change prints several) into one refresh
+REFRESH_DEBOUNCE = 0.2
+# Delay before restarting `nmcli monitor` after it exits
+WATCHER_RESTART_DELAY = 5
+
+_lock = threading.Lock()
+_snapshot = {
+    'devices': [],
+    'active_connections': [],
+    'updated_at': None,
+    'valid': False,
+    # Bumped whenever devices or active_connections actually change; a
+    # cheap stamp for conditional responses (see http_cache)
+    'version': 0,
+    # Bumped by invalidate() so a refresh that started earlier cannot
+    # mark its (possibly outdated) result as valid
+    'generation': 0,
+}
+# The direct refresh run for a cache miss, shared by concurrent misses:
+# {'done': Event, 'generation', 'result', 'error'}
+_in_flight = {
+    'refresh': None,
+}
+_watcher = {
+    'process': None,
+    'alive': False,
+    'started': False,
+}
+_dirty = threading.Event()
+_loader = None
+_listeners = []
+
+
+def _store(data, generation):
+    with _lock:
+        previous = dict(_snapshot)
+        if any(_snapshot.get(key) != value for key, value in data.items()):
+            _snapshot['version'] += 1
+        _snapshot.update(data)
+        _snapshot['updated_at'] = time.time()
+        _snapshot['valid'] = generation == _snapshot['generation']
+        current = dict(_snapshot)
+    for listener in _listeners:
+        try:
+            listener(previous, current)
+        except Exception as e:
+            print(f"Status listener failed: {e}")
+    return current
+
+
+def refresh():
+    """Reload the snapshot from NetworkManager and return it."""
+    with _lock:
+        generation = _snapshot['generation']
+    return _store(_loader(), generation)
+
+
+def _mark_invalid():
+    with _lock:
+        _snapshot['valid'] = False
+        _snapshot['generation'] += 1
+
+
+def invalidate():
+    """Drop the snapshot; the next read queries NetworkManager directly."""
+    _mark_invalid()
+    _dirty.set()
+
+
+def is_watching():
+    return _watcher['alive']
+
+
+def get_snapshot():
+    """Return (snapshot, source), source being 'cache' or 'direct'."""
+    with _lock:
+        if _snapshot['valid'] and _watcher['alive']:
+            snapshot = dict(_snapshot)
+        else:
+            snapshot = None
+    if snapshot is not None:
+        metrics.inc('status_cache_reads_total', {'result': 'hit'})
+        return snapshot, 'cache'
+    return _shared_refresh(), 'direct'
+
+
+def _shared_refresh():
+    """refresh() for a cache miss; joins one already running for the current generation."""
+    with _lock:
+        flight = _in_flight['refresh']
+        leader = flight is None or flight['generation'] != _snapshot['generation']
+        if leader:
+            # None running, or it started before an invalidate() and may be outdated
+            flight = {'done': threading.Event(), 'generation': _snapshot['generation'],
+                      'result': None, 'error': None}
+            _in_flight['refresh'] = flight
+    if not leader:
+        metrics.inc('status_cache_reads_total', {'result': 'shared'})
+        flight['done'].wait()
+        if flight['error'] is not None:
+            raise flight['error']
+        return dict(flight['result'])
+
+    metrics.inc('status_cache_reads_total', {'result': 'miss'})
+    try:
+        flight['result'] = refresh()
+        return flight['result']
+    except Exception as e:
+        flight['error'] = e
+        raise
+    finally:
+        with _lock:
+            if _in_flight['refresh'] is flight:
+                _in_flight['refresh'] = None
+        flight['done'].set()
+
+
+def _watch():
+    while True:
+        try:
+            process = subprocess.Popen(
+                ['nmcli', 'monitor'],
+                stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL,
+                text=True,
+            )
+            _watcher['process'] = process
+            _watcher['alive'] = True
+            # The snapshot may have missed changes while the watcher was down
+            _dirty.set()
+            for _ in process.stdout:
+                _dirty.set()
+            process.wait()
+        except Exception as e:
+            print(f"nmcli monitor failed: {e}")
+        finally:
+            _watcher['alive'] = False
+            _watcher['process'] = None
+        time.sleep(WATCHER_RESTART_DELAY)
+
+
+def _refresh_loop():
+    while True:
+        _dirty.wait()
+        time.sleep(REFRESH_DEBOUNCE)
+        _dirty.clear()
+        try:
+            refresh()
+        except Exception as e:
+            print(f"Status refresh failed: {e}")
+            _mark_invalid()
+
+
+def add_listener(listener):
+    """listener(previous, current) is called after every refresh."""
+    _listeners.append(listener)
+
+
+def set_loader(loader):
+    """loader() returns {'devices': [...], 'active_connections': [...]}."""
+    global _loader
+    _loader = loader
+
+
+def start():
+    """Start the `nmcli monitor` watcher and the background refresher."""
+    if _watcher['started']:
+        return
+    _watcher['started'] = True
+    threading.Thread(target=_watch, name='nmcli-monitor', daemon=True).start()
+    threading.Thread(target=_refresh_loop, name='status-refresh', daemon=True).start()
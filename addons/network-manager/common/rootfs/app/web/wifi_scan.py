@@ -0,0 +1,205 @@
+"""Wi-Fi scan scheduler.
+
+Scans run on a background thread as jobs. Concurrent scan requests join
+the running job instead of starting another rescan, and a new rescan is
+not started until MIN_RESCAN_INTERVAL has passed since the last one;
+NetworkManager rejects rescans that come too quickly anyway. Readers
+always get the last result right away together with its age.
+
+Between requests a sampler lists NetworkManager's AP cache (no rescan)
+every SAMPLE_INTERVAL seconds, so the signal history keeps getting data
+points while nobody is looking at the scan page.
+"""
+import os
+import threading
+import time
+
+import metrics
+
+MIN_RESCAN_INTERVAL = int(os.environ.get('WIFI_RESCAN_MIN_INTERVAL', '10'))
+SAMPLE_INTERVAL = int(os.environ.get('WIFI_SCAN_INTERVAL', '30'))
+# Number of finished jobs kept for polling
+JOB_HISTORY = 20
+SCAN_SIZE_BUCKETS = (0, 5, 10, 25, 50, 100, 250, 500, 1000)
+
+_lock = threading.Lock()
+_result = {
+    'networks': None,
+    # Every radio of every network grouped by SSID, for the extended scan
+    'access_points': None,
+    'scanned_at': None,
+    # Bumped when a scan returns different networks or access points
+    'version': 0,
+}
+_jobs = {}
+_job_done = {}
+_state = {
+    'running_job_id': None,
+    'last_rescan_at': 0,
+    'job_counter': 0,
+    'sampler_started': False,
+}
+_scanner = None
+_listeners = []
+
+
+def set_scanner(scanner):
+    """scanner(rescan) returns (networks, access_points); rescan=True waits for a fresh scan."""
+    global _scanner
+    _scanner = scanner
+
+
+def add_listener(listener):
+    """listener(previous_networks, networks) is called after every scan."""
+    _listeners.append(listener)
+
+
+def _store(scan):
+    networks, access_points = scan
+    metrics.observe('wifi_scan_networks', len(networks), buckets=SCAN_SIZE_BUCKETS)
+    with _lock:
+        previous = _result['networks']
+        if networks != previous or access_points != _result['access_points']:
+            _result['version'] += 1
+        _result['networks'] = networks
+        _result['access_points'] = access_points
+        _result['scanned_at'] = time.time()
+        scanned_at = _result['scanned_at']
+    for listener in _listeners:
+        try:
+            listener(previous, networks)
+        except Exception as e:
+            print(f"Scan listener failed: {e}")
+    return networks, scanned_at
+
+
+def get_latest():
+    """Return (networks, scanned_at) without waiting on the radio.
+
+    Before the first scan has finished this lists NetworkManager's current
+    AP cache directly, which does not trigger a rescan.
+    """
+    return _latest('networks')[:2]
+
+
+def get_access_points():
+    """Like get_latest(), but every access point instead of one entry per SSID."""
+    return _latest('access_points')[:2]
+
+
+def get_versioned(extended=False):
+    """(networks or access points, scanned_at, version) read together.
+
+    The version changes only when a scan returns different content, so it
+    can stamp cached responses (see http_cache).
+    """
+    return _latest('access_points' if extended else 'networks')
+
+
+def _latest(key):
+    with _lock:
+        if _result[key] is not None:
+            value = (_result[key], _result['scanned_at'], _result['version'])
+        else:
+            value = None
+    if value is not None:
+        metrics.inc('scan_cache_reads_total', {'result': 'hit'})
+        return value
+    metrics.inc('scan_cache_reads_total', {'result': 'miss'})
+    _store(_scanner(False))
+    with _lock:
+        return _result[key], _result['scanned_at'], _result['version']
+
+
+def is_stale():
+    with _lock:
+        scanned_at = _result['scanned_at']
+    return scanned_at is None or time.time() - scanned_at >= MIN_RESCAN_INTERVAL
+
+
+def _run_job(job_id):
+    try:
+        networks, _ = _store(_scanner(True))
+        _finish_job(job_id, status='done', count=len(networks))
+    except Exception as e:
+        _finish_job(job_id, status='error', error=str(e))
+
+
+def _finish_job(job_id, **kwargs):
+    with _lock:
+        _jobs[job_id].update(kwargs, finished_at=time.time())
+        _state['running_job_id'] = None
+        done = _job_done.pop(job_id)
+        # Drop the oldest finished jobs
+        for old_id in sorted(_jobs)[:-JOB_HISTORY]:
+            _jobs.pop(old_id, None)
+    done.set()
+
+
+def request_scan():
+    """Start a rescan job, or join the running one. Returns the job."""
+    with _lock:
+        running_id = _state['running_job_id']
+        if running_id is not None:
+            return dict(_jobs[running_id])
+
+        now = time.time()
+        if _jobs and now - _state['last_rescan_at'] < MIN_RESCAN_INTERVAL:
+            # Rate limited: the latest job is recent enough
+            return dict(_jobs[max(_jobs)])
+
+        _state['job_counter'] += 1
+        job_id = _state['job_counter']
+        _state['running_job_id'] = job_id
+        _state['last_rescan_at'] = now
+        _jobs[job_id] = {
+            'id': job_id,
+            'status': 'running',
+            'created_at': now,
+            'finished_at': None,
+        }
+        _job_done[job_id] = threading.Event()
+        job = dict(_jobs[job_id])
+
+    threading.Thread(target=_run_job, args=(job_id,), name=f'wifi-scan-{job_id}', daemon=True).start()
+    return job
+
+
+def get_job(job_id, wait=0):
+    """Return the job, waiting up to `wait` seconds for it to finish (long-poll)."""
+    with _lock:
+        if job_id not in _jobs:
+            return None
+        done = _job_done.get(job_id)
+    if done is not None and wait > 0:
+        done.wait(wait)
+    with _lock:
+        job = _jobs.get(job_id)
+        return dict(job) if job else None
+
+
+def running_job_id():
+    return _state['running_job_id']
+
+
+def _sample_loop():
+    while True:
+        time.sleep(SAMPLE_INTERVAL)
+        with _lock:
+            scanned_at = _result['scanned_at']
+        if scanned_at is not None and time.time() - scanned_at < SAMPLE_INTERVAL:
+            # A scan request already produced a recent sample
+            continue
+        try:
+            _store(_scanner(False))
+        except Exception as e:
+            print(f"Scan sample failed: {e}")
+
+
+def start():
+    """Start the background sampler."""
+    with _lock:
+        if _state['sampler_started']:
+            return
+        _state['sampler_started'] = True
+    threading.Thread(target=_sample_loop, name='wifi-scan-sampler', daemon=True).start()
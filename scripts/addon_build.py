@@ -0,0 +1,817 @@
+#!/usr/bin/env python3
+"""
+Addon 验证与 template 生成工具
+
+validate-addon.sh、generate-template-from-addon.sh 和 generate-all-templates.sh
+都调用此工具。多个 addon 在进程池中并行处理（默认每个 CPU 核心一个进程），
+每个 JSON 文件只解析一次，不再调用外部命令。
+
+每个 addon 目录的内容哈希和处理结果记录在 .cache/addon-build.json 中：
+内容没有变化的 addon 直接沿用上次的验证结果；生成的 template 在 addon
+和输出目录都没有变化时不会重新生成。工具本身变化时缓存全部失效。
+
+使用方法:
+  python3 scripts/addon_build.py validate [addon ...] [--check-template]
+  python3 scripts/addon_build.py generate [addon ...] [--output-dir <dir>] [--skip-no-template]
+
+不指定 addon 时处理 addons/ 下的所有 addon。
+"""
+import argparse
+import concurrent.futures
+import hashlib
+import json
+import os
+import re
+import shutil
+import sys
+import tempfile
+import time
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(SCRIPT_DIR)
+ADDONS_DIR = os.path.join(PROJECT_ROOT, 'addons')
+DEFAULT_OUTPUT_DIR = os.path.join(PROJECT_ROOT, 'addon_templates')
+TEMPLATE_SOURCE_DIR = os.path.join(PROJECT_ROOT, 'templates', 'addon-template', 'template')
+CACHE_FILE = os.path.join(PROJECT_ROOT, '.cache', 'addon-build.json')
+
+# 颜色输出
+RED = '\033[0;31m'
+GREEN = '\033[0;32m'
+YELLOW = '\033[1;33m'
+BLUE = '\033[0;34m'
+NC = '\033[0m'  # No Color
+
+_COLORS = {'red': RED, 'green': GREEN, 'yellow': YELLOW, 'blue': BLUE}
+_SYMBOLS = {'ok': f'{GREEN}✓{NC}', 'warn': f'{YELLOW}⚠{NC}', 'fail': f'{RED}✗{NC}'}
+
+# 计算内容哈希时忽略的文件
+_IGNORED_NAMES = {'__pycache__', '.git', '.DS_Store'}
+_IGNORED_SUFFIXES = ('.pyc', '.pyo')
+
+# 替换模板变量的文件类型
+_TEMPLATE_SUFFIXES = ('.md', '.json', '.yml', '.yaml')
+
+CONFIG_REQUIRED_FIELDS = ('name', 'version', 'slug', 'description', 'startup', 'boot')
+
+
+def tree_hash(path):
+    """目录的内容哈希（相对路径和文件内容，与修改时间无关），目录不存在时为 None"""
+    if not os.path.isdir(path):
+        return None
+    digest = hashlib.sha256()
+    for root, dirs, files in os.walk(path):
+        dirs[:] = sorted(d for d in dirs if d not in _IGNORED_NAMES)
+        for name in dirs:
+            digest.update(f'd {os.path.relpath(os.path.join(root, name), path)}\0'.encode())
+        for name in sorted(files):
+            if name in _IGNORED_NAMES or name.endswith(_IGNORED_SUFFIXES):
+                continue
+            full = os.path.join(root, name)
+            rel = os.path.relpath(full, path)
+            if os.path.islink(full):
+                digest.update(f'l {rel}\0{os.readlink(full)}\0'.encode())
+                continue
+            digest.update(f'f {rel}\0{os.path.getsize(full)}\0'.encode())
+            with open(full, 'rb') as f:
+                for chunk in iter(lambda: f.read(1 << 20), b''):
+                    digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _file_hash(path):
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def _cache_key(*parts):
+    return hashlib.sha256('\0'.join(str(p) for p in parts).encode()).hexdigest()
+
+
+def load_cache():
+    try:
+        with open(CACHE_FILE, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_cache(cache):
+    # 先写临时文件再替换，同时运行的两个进程不会读到写了一半的缓存
+    os.makedirs(os.path.dirname(CACHE_FILE), exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(CACHE_FILE), suffix='.tmp')
+    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+        json.dump(cache, f, ensure_ascii=False, indent=1, sort_keys=True)
+    os.replace(tmp, CACHE_FILE)
+
+
+def _load_json(path):
+    """解析 JSON 文件，文件不存在或格式错误时返回 None"""
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _read_text(path):
+    with open(path, encoding='utf-8', errors='replace') as f:
+        return f.read()
+
+
+def _present(data, field):
+    # 与 jq -e 相同：字段不存在、为 null 或 false 都视为缺少
+    return isinstance(data, dict) and data.get(field) not in (None, False)
+
+
+def _rel(path):
+    return os.path.relpath(path, PROJECT_ROOT)
+
+
+class Report:
+    """一个 addon 的处理结果：输出行以及错误和警告计数（可以序列化到缓存中）"""
+
+    def __init__(self):
+        self.lines = []
+        self.notes = []
+        self.errors = 0
+        self.warnings = 0
+
+    def line(self, text='', kind=''):
+        self.lines.append([kind, text])
+
+    def ok(self, text):
+        self.line(text, 'ok')
+
+    def warn(self, text):
+        self.line(text, 'warn')
+        self.warnings += 1
+
+    def fail(self, text):
+        self.line(text, 'fail')
+        self.errors += 1
+
+    def check_file(self, path, required):
+        if os.path.isfile(path):
+            self.ok(_rel(path))
+            return True
+        if required:
+            self.fail(f'{_rel(path)} (必需)')
+        else:
+            self.warn(f'{_rel(path)} (可选)')
+        return False
+
+    def check_dir(self, path, required):
+        if os.path.isdir(path):
+            self.ok(f'{_rel(path)}/')
+            return True
+        if required:
+            self.fail(f'{_rel(path)}/ (必需)')
+        else:
+            self.warn(f'{_rel(path)}/ (可选)')
+        return False
+
+    def check_json(self, path):
+        if not os.path.isfile(path):
+            return None
+        data = _load_json(path)
+        if data is None:
+            self.fail(f'JSON 格式错误: {_rel(path)}')
+        else:
+            self.ok(f'JSON 格式正确: {_rel(path)}')
+        return data
+
+    def to_dict(self):
+        return {'lines': self.lines, 'notes': self.notes, 'errors': self.errors, 'warnings': self.warnings}
+
+
+def render(kind, text):
+    if kind in _SYMBOLS:
+        return f'{_SYMBOLS[kind]} {text}'
+    if kind in _COLORS:
+        return f'{_COLORS[kind]}{text}{NC}'
+    return text
+
+
+# ---------------------------------------------------------------------------
+# 验证
+# ---------------------------------------------------------------------------
+
+def validate_addon(addon, check_template):
+    """与原 validate-addon.sh 相同的检查，返回 Report"""
+    addon_dir = os.path.join(ADDONS_DIR, addon)
+    report = Report()
+
+    report.line('检查文件结构...')
+    report.line()
+    # 必需文件
+    report.check_file(os.path.join(addon_dir, 'VERSION'), True)
+    report.check_file(os.path.join(addon_dir, 'docker-compose.yml'), True)
+    # 推荐文件（README.md 是 addon 级文档，面向开发者）
+    report.check_file(os.path.join(addon_dir, 'README.md'), False)
+    # 可选文件（用于元数据和架构配置）
+    report.check_file(os.path.join(addon_dir, 'repository.json'), False)
+    report.check_file(os.path.join(addon_dir, 'requirements.txt'), False)
+    report.check_file(os.path.join(addon_dir, 'CHANGELOG.md'), False)
+    # 必需目录
+    report.check_dir(os.path.join(addon_dir, 'common'), True)
+    report.check_file(os.path.join(addon_dir, 'common', 'Dockerfile'), True)
+    report.check_dir(os.path.join(addon_dir, 'common', 'rootfs'), True)
+
+    report.line()
+    report.line('验证 JSON 文件...')
+    report.line()
+    config_path = os.path.join(addon_dir, 'config.json')
+    config = report.check_json(config_path)
+    repository = report.check_json(os.path.join(addon_dir, 'repository.json'))
+
+    report.line()
+    report.line('检查版本号格式...')
+    version_path = os.path.join(addon_dir, 'VERSION')
+    if os.path.isfile(version_path):
+        version = ''.join(_read_text(version_path).split())
+        if re.fullmatch(r'\d+\.\d+\.\d+', version):
+            report.ok(f'版本号格式正确: {version}')
+        else:
+            report.fail(f'版本号格式错误: {version} (应为 MAJOR.MINOR.PATCH)')
+
+    report.line()
+    report.line('检查 Dockerfile...')
+    dockerfile_path = os.path.join(addon_dir, 'common', 'Dockerfile')
+    if os.path.isfile(dockerfile_path):
+        dockerfile = _read_text(dockerfile_path)
+        if 'FROM' in dockerfile:
+            report.ok('Dockerfile 包含 FROM 指令')
+        else:
+            report.fail('Dockerfile 缺少 FROM 指令')
+        # 检查是否有 ARG BUILD_FROM（推荐）
+        if 'ARG BUILD_FROM' in dockerfile:
+            report.ok('Dockerfile 包含 ARG BUILD_FROM（推荐）')
+        else:
+            report.warn('Dockerfile 未包含 ARG BUILD_FROM（推荐添加以支持多架构）')
+    else:
+        report.fail('Dockerfile 不存在')
+
+    report.line()
+    report.line('检查 README.md（addon 级文档）...')
+    readme_path = os.path.join(addon_dir, 'README.md')
+    if os.path.isfile(readme_path):
+        readme = _read_text(readme_path)
+        # 检查是否包含基本章节
+        if re.search(r'^## (概述|Overview)', readme, re.M):
+            report.ok('README.md 包含概述部分')
+        else:
+            report.warn('README.md 缺少概述部分（推荐添加）')
+        if re.search(r'^## (主要功能|功能|Features)', readme, re.M):
+            report.ok('README.md 包含功能说明部分')
+        else:
+            report.warn('README.md 缺少功能说明部分（推荐添加）')
+        # 检查是否包含模板变量（不应该存在）
+        if '{{ADDON_NAME}}' in readme or '{{ADDON_SLUG}}' in readme:
+            report.fail('README.md 包含未替换的模板变量')
+        else:
+            report.ok('README.md 模板变量已正确替换')
+    else:
+        report.warn('README.md 不存在（推荐添加 addon 级文档）')
+
+    report.line()
+    report.line('检查 config.json 内容...')
+    if os.path.isfile(config_path):
+        # 检查必需字段
+        for field in CONFIG_REQUIRED_FIELDS:
+            if _present(config, field):
+                report.ok(f'config.json 包含必需字段: {field}')
+            else:
+                report.fail(f'config.json 缺少必需字段: {field}')
+        # 检查 arch (可在 config.json 或 repository.json 中)
+        if _present(config, 'arch'):
+            report.ok('config.json 包含架构定义')
+        elif _present(repository, 'arch'):
+            report.ok('repository.json 包含架构定义')
+        else:
+            report.fail('缺少架构定义 (arch)，需要在 config.json 或 repository.json 中定义')
+        # 检查 slug 格式（应该是下划线分隔）
+        slug = config.get('slug') if isinstance(config, dict) else None
+        if slug is not None:
+            slug = str(slug)
+            if re.fullmatch(r'[a-z0-9_]+', slug):
+                report.ok(f'config.json slug 格式正确: {slug}')
+            elif slug:
+                report.warn(f'config.json slug 格式建议使用下划线: {slug}')
+
+    if check_template:
+        _validate_template(addon, report)
+    return report
+
+
+def _validate_template(addon, report):
+    template_dir = os.path.join(DEFAULT_OUTPUT_DIR, addon)
+    report.line()
+    report.line('==========================================')
+    report.line('检查上传用的 template...')
+    report.line()
+    if not os.path.isdir(template_dir):
+        report.line(f'⚠ Template 目录不存在: {_rel(template_dir)}', 'yellow')
+        report.line(f'  运行 ./scripts/generate-template-from-addon.sh {addon} 生成 template')
+        report.warnings += 1
+        return
+
+    errors, warnings = report.errors, report.warnings
+    upload_config = os.path.join(template_dir, 'upload_config.json')
+    report.check_file(upload_config, True)
+    report.check_file(os.path.join(template_dir, 'docker-compose.yml'), False)
+    report.check_file(os.path.join(template_dir, '.tarignore'), False)
+    report.check_dir(os.path.join(template_dir, 'common'), False)
+    report.check_json(upload_config)
+    errors, warnings = report.errors - errors, report.warnings - warnings
+
+    report.line()
+    report.line('Template 验证结果:')
+    if not errors and not warnings:
+        report.line('✓ Template 验证通过！', 'green')
+    elif not errors:
+        report.line(f'⚠ Template 验证通过，但有 {warnings} 个警告', 'yellow')
+    else:
+        report.line(f'✗ Template 验证失败：发现 {errors} 个错误，{warnings} 个警告', 'red')
+
+
+def validate_job(addon, options, cached):
+    """进程池中运行：内容哈希与缓存一致时直接返回缓存的结果"""
+    key = _cache_key(options['tool'], 'validate', tree_hash(os.path.join(ADDONS_DIR, addon)),
+                     tree_hash(os.path.join(DEFAULT_OUTPUT_DIR, addon)) if options['check_template'] else '')
+    if cached and cached.get('key') == key:
+        return {'addon': addon, 'status': 'cached', 'key': key, 'report': cached['report']}
+    report = validate_addon(addon, options['check_template'])
+    return {'addon': addon, 'status': 'done', 'key': key, 'report': report.to_dict()}
+
+
+def print_validation(result):
+    report = result['report']
+    header = f"{BLUE}验证 addon: {result['addon']}{NC}"
+    if result['status'] == 'cached':
+        header += f'{YELLOW}（内容未变化，沿用上次的验证结果）{NC}'
+    print(header)
+    print()
+    for kind, text in report['lines']:
+        print(render(kind, text))
+    print()
+    print('==========================================')
+    errors, warnings = report['errors'], report['warnings']
+    if not errors and not warnings:
+        print(f'{GREEN}✓ 验证通过！{NC}')
+    elif not errors:
+        print(f'{YELLOW}⚠ 验证通过，但有 {warnings} 个警告{NC}')
+    else:
+        print(f'{RED}✗ 验证失败：发现 {errors} 个错误，{warnings} 个警告{NC}')
+
+
+# ---------------------------------------------------------------------------
+# 生成 template
+# ---------------------------------------------------------------------------
+
+def _template_missing(addon_dir):
+    template_dir = os.path.join(addon_dir, 'template')
+    return not os.path.isdir(template_dir) or not os.listdir(template_dir)
+
+
+def _addon_metadata(addon, addon_dir):
+    """显示名称、描述和 slug：优先从 config.json 读取（Haddons 标准），否则从 repository.json 读取"""
+    default_slug = addon.replace('-', '_')
+    for name in ('config.json', 'repository.json'):
+        path = os.path.join(addon_dir, name)
+        if os.path.isfile(path):
+            data = _load_json(path)
+            data = data if isinstance(data, dict) else {}
+            return (data.get('name') or addon, data.get('description') or '',
+                    data.get('slug') or default_slug, True)
+    return addon, '', default_slug, False
+
+
+def _copy_entries(src, dst):
+    # 与 cp -r "$src"/* "$dst/" 相同：不复制隐藏文件
+    names = [n for n in os.listdir(src) if not n.startswith('.')]
+    if not names:
+        raise OSError(f'{src} 为空')
+    os.makedirs(dst, exist_ok=True)
+    for name in names:
+        path = os.path.join(src, name)
+        if os.path.isdir(path):
+            shutil.copytree(path, os.path.join(dst, name), dirs_exist_ok=True, copy_function=shutil.copy)
+        else:
+            shutil.copy(path, os.path.join(dst, name))
+
+
+def _replace_in_file(path, replacements):
+    with open(path, encoding='utf-8') as f:
+        text = f.read()
+    updated = text
+    for old, new in replacements:
+        updated = updated.replace(old, new)
+    if updated != text:
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(updated)
+
+
+def create_template(addon, addon_dir, report):
+    """从 templates/addon-template/template 创建或填充 addon 的 template/ 目录"""
+    template_dir = os.path.join(addon_dir, 'template')
+    report.notes.append(['yellow', '  检测到 template/ 目录不存在或为空，自动创建...'])
+    if not os.path.isdir(TEMPLATE_SOURCE_DIR):
+        report.notes.append(['red', f'  ✗ 模板源目录不存在: {TEMPLATE_SOURCE_DIR}'])
+        return False
+    try:
+        _copy_entries(TEMPLATE_SOURCE_DIR, template_dir)
+    except OSError:
+        report.notes.append(['red', '  ✗ 无法复制模板文件'])
+        return False
+
+    display_name, _, slug, found = _addon_metadata(addon, addon_dir)
+    if not found:
+        # 生成显示名称（首字母大写）
+        display_name = ' '.join(word[:1].upper() + word[1:] for word in addon.split('-') if word)
+
+    # 注意：{{ADDON_NAME}} 替换为显示名称，{{ADDON_SLUG}} 替换为 slug（下划线格式）
+    # 但 upload_config.json 中的 display_name 和 id 应该使用 addon 名称（连字符格式）
+    for root, _, files in os.walk(template_dir):
+        for name in files:
+            if name.endswith(_TEMPLATE_SUFFIXES):
+                _replace_in_file(os.path.join(root, name),
+                                 [('{{ADDON_NAME}}', display_name), ('{{ADDON_SLUG}}', slug)])
+    upload_config = os.path.join(template_dir, 'upload_config.json')
+    if os.path.isfile(upload_config):
+        _replace_in_file(upload_config, [(f'"display_name": "{slug}"', f'"display_name": "{addon}"'),
+                                         (f'"id": "{slug}"', f'"id": "{addon}"')])
+
+    report.notes.append(['green', '  ✓ 已创建/填充 template/ 目录并复制模板文件'])
+    report.notes.append(['yellow', f'  ⚠ 请编辑 addons/{addon}/template/ 目录中的文件，填充实际的模板内容'])
+    return True
+
+
+DEFAULT_TARIGNORE = """.git
+__pycache__
+*.pyc
+*.log
+.DS_Store
+TEMPLATE_INFO.md
+common/
+"""
+
+TEMPLATE_INFO = """# Template 生成信息
+
+此 template 由脚本自动生成自 addon: `{addon}`
+
+生成时间: {time}
+源版本: {version}
+模板来源: `addons/{addon}/template/`
+
+## 文件说明
+
+- `upload_config.json`: 上传配置文件（**必需**），已从模板复制并更新版本号
+- `docker-compose.yml`: Docker Compose 配置（**必需**），必须使用 image: 而不是 build:
+- `.tarignore`: 打包时排除的文件列表
+- `DOCS.md`: 使用说明文档（推荐），会显示在 Haddons Web 界面的"文档"标签页
+- `README.md`: 核心能力说明文档（推荐），会显示在 Haddons Web 界面的 Addon 卡片中
+- `icon.png`: 图标文件（推荐），显示在 Haddons Web 界面中
+
+**注意**：
+- 模板文件来自 `addons/{addon}/template/` 目录
+- 如需修改模板内容，请编辑 `addons/{addon}/template/` 目录中的文件，然后重新运行生成脚本
+- `common/` 目录**不需要**包含在 Template 中，因为 Template 必须使用已发布的镜像（`image:`），不需要构建文件
+
+## 使用前检查清单
+
+- [ ] 检查 `upload_config.json` 中的配置（版本号已自动更新为 {version}）
+- [ ] 确认 `docker-compose.yml` 配置正确（使用 image: 而不是 build:）
+- [ ] 确认 `README.md` 和 `DOCS.md` 内容完整
+- [ ] 确认 `icon.png` 存在（如需要）
+"""
+
+
+def generate_template(addon, output_dir, report):
+    """与原 generate-template-from-addon.sh 相同的生成步骤，失败时返回 False"""
+    addon_dir = os.path.join(ADDONS_DIR, addon)
+    template_dir = os.path.join(output_dir, addon)
+    report.line(f"正在从 addon '{addon}' 生成 template...", 'blue')
+    report.line()
+
+    addon_template_dir = os.path.join(addon_dir, 'template')
+    if not os.path.isdir(addon_template_dir):
+        report.line(f"错误: Addon '{addon}' 没有 template/ 目录", 'red')
+        report.line(f'  请先运行: ./scripts/add-addon.sh {addon}')
+        report.line(f'  然后编辑 addons/{addon}/template/ 目录中的模板文件')
+        return False
+
+    os.makedirs(template_dir, exist_ok=True)
+    report.line(f'创建输出目录: {template_dir}', 'green')
+    report.line('从 addon template/ 目录复制模板文件...', 'green')
+    try:
+        _copy_entries(addon_template_dir, template_dir)
+    except OSError:
+        report.line('错误: 无法复制模板文件', 'red')
+        return False
+
+    # 读取版本号和 addon 信息（用于更新 upload_config.json）
+    version = '0.0.1'
+    version_path = os.path.join(addon_dir, 'VERSION')
+    if os.path.isfile(version_path):
+        version = ''.join(_read_text(version_path).split())
+    display_name, description, _, _ = _addon_metadata(addon, addon_dir)
+    if not description:
+        description = f'{display_name} 旨在为 Ubuntu Server 系统提供相关能力。'
+
+    upload_config_path = os.path.join(template_dir, 'upload_config.json')
+    if os.path.isfile(upload_config_path):
+        report.line('更新 upload_config.json...', 'green')
+        upload_config = _load_json(upload_config_path)
+        if not isinstance(upload_config, dict):
+            report.line('错误: upload_config.json 格式错误', 'red')
+            return False
+        upload_config.update({'version': version, 'name': display_name, 'addondescription': description,
+                              'display_name': addon, 'id': addon})
+        with open(upload_config_path, 'w', encoding='utf-8') as f:
+            json.dump(upload_config, f, ensure_ascii=False, indent=2)
+            f.write('\n')
+        report.line(f'  ✓ 已更新版本号: {version}')
+    else:
+        report.line('警告: upload_config.json 不存在，创建默认文件...', 'yellow')
+        upload_config = {
+            'name': display_name, 'addonid': '0', 'addondescription': description, 'version': version,
+            'visiturl': '', 'issupportupdate': 0, 'issupportuninstall': 1, 'isbuiltin': 0,
+            'candisableservice': 1, 'releasestatus': 1, 'order': 0, 'display_name': addon, 'id': addon,
+        }
+        with open(upload_config_path, 'w', encoding='utf-8') as f:
+            json.dump(upload_config, f, ensure_ascii=False, indent=4)
+            f.write('\n')
+
+    # 检查并处理 docker-compose.yml
+    compose_path = os.path.join(template_dir, 'docker-compose.yml')
+    if os.path.isfile(compose_path):
+        report.line('检查 docker-compose.yml...', 'green')
+        if 'build:' in _read_text(compose_path):
+            report.line('警告: docker-compose.yml 包含 build:，需要改为 image:', 'yellow')
+            report.line(f'  请编辑 {compose_path}，将 build: 改为 image: <镜像名称>:<版本>')
+        else:
+            report.line('  ✓ docker-compose.yml 使用 image:（正确）')
+    else:
+        report.line('警告: docker-compose.yml 不存在，从 addon 复制...', 'yellow')
+        addon_compose = os.path.join(addon_dir, 'docker-compose.yml')
+        if os.path.isfile(addon_compose):
+            shutil.copy(addon_compose, compose_path)
+            if 'build:' in _read_text(compose_path):
+                report.line('警告: docker-compose.yml 包含 build:，需要手动改为 image:', 'yellow')
+        else:
+            report.line('错误: addon 中也没有 docker-compose.yml', 'red')
+
+    # 复制其他可能需要的文件
+    report.line('复制其他文件...', 'green')
+    for name in ('icon.png', 'CHANGELOG.md', 'requirements.txt', 'repository.json'):
+        path = os.path.join(addon_dir, name)
+        if os.path.isfile(path):
+            shutil.copy(path, os.path.join(template_dir, name))
+            report.line(f'  复制: {name}')
+
+    # 确保 .tarignore 存在，并排除 common/ 目录
+    tarignore_path = os.path.join(template_dir, '.tarignore')
+    if not os.path.isfile(tarignore_path):
+        report.line('创建 .tarignore...', 'green')
+        with open(tarignore_path, 'w', encoding='utf-8') as f:
+            f.write(DEFAULT_TARIGNORE)
+    else:
+        tarignore = _read_text(tarignore_path)
+        if 'common/' not in tarignore.splitlines():
+            with open(tarignore_path, 'a', encoding='utf-8') as f:
+                f.write('common/\n' if not tarignore or tarignore.endswith('\n') else '\ncommon/\n')
+            report.line('  添加: common/ 到 .tarignore')
+
+    # 创建说明文件
+    with open(os.path.join(template_dir, 'TEMPLATE_INFO.md'), 'w', encoding='utf-8') as f:
+        f.write(TEMPLATE_INFO.format(addon=addon, version=version, time=time.strftime('%Y-%m-%d %H:%M:%S')))
+
+    report.line()
+    report.line('✓ Template 生成成功！', 'green')
+    report.line()
+    report.line(f'输出目录: {template_dir}', 'blue')
+    report.line()
+    report.line('下一步:', 'blue')
+    report.line(f'  1. 检查 {template_dir}/upload_config.json')
+    report.line(f'     - 确认版本号已更新为: {version}')
+    report.line('     - 确认 addonid、visiturl 等字段正确')
+    report.line(f'  2. 检查 {template_dir}/docker-compose.yml')
+    report.line('     - 确保使用 image: 而不是 build:')
+    report.line('     - 确认镜像地址和版本正确')
+    if not os.path.isfile(os.path.join(template_dir, 'icon.png')):
+        report.line(f'  3. 添加 icon.png 文件到 {template_dir}')
+        report.line('     - 参考 templates/addon-template/template/ICON_REQUIREMENTS.md')
+    report.line(f'  4. 检查 {template_dir}/README.md 和 DOCS.md')
+    report.line('     - 确保内容完整、用户友好')
+    report.line('  5. 使用 upload_batch.py 上传到服务器')
+    return True
+
+
+def generate_job(addon, options, cached):
+    """进程池中运行：addon 和已生成的 template 都没有变化时跳过"""
+    addon_dir = os.path.join(ADDONS_DIR, addon)
+    report = Report()
+    result = {'addon': addon, 'status': 'failed', 'key': None, 'output_hash': None}
+    if _template_missing(addon_dir):
+        if options['skip_no_template']:
+            result.update(status='skipped', report=report.to_dict())
+            return result
+        if options['create_template'] and not create_template(addon, addon_dir, report):
+            result['report'] = report.to_dict()
+            return result
+
+    output_dir = os.path.join(options['output_dir'], addon)
+    key = _cache_key(options['tool'], 'generate', tree_hash(addon_dir), options['output_dir'])
+    if cached and cached.get('key') == key and cached.get('output_hash') == tree_hash(output_dir):
+        result.update(status='cached', key=key, output_hash=cached['output_hash'])
+    elif generate_template(addon, options['output_dir'], report):
+        result.update(status='done', key=key, output_hash=tree_hash(output_dir))
+    result['report'] = report.to_dict()
+    return result
+
+
+def print_generation(index, result, verbose):
+    addon, report = result['addon'], result['report']
+    if result['status'] == 'skipped':
+        print(f'{YELLOW}[{index}] 跳过 {addon}（没有 template/ 目录或目录为空）{NC}')
+        return
+    print(f'{BLUE}[{index}] 处理 addon: {addon}{NC}')
+    for kind, text in report['notes']:
+        print(render(kind, text))
+    if result['status'] == 'cached':
+        print(f'{GREEN}  ✓ {addon} 未变化，沿用已生成的 template{NC}')
+        return
+    if verbose:
+        for kind, text in report['lines']:
+            print(render(kind, text))
+    if result['status'] == 'done':
+        print(f'{GREEN}  ✓ {addon} template 生成成功{NC}')
+        return
+    print(f'{RED}  ✗ {addon} template 生成失败{NC}')
+    if not verbose:
+        # 只显示第一条错误信息
+        errors = [text for _, text in report['lines'] if '错误:' in text]
+        if errors:
+            print(f'    {errors[0]}')
+
+
+# ---------------------------------------------------------------------------
+# 命令行
+# ---------------------------------------------------------------------------
+
+def list_addons():
+    return sorted(name for name in os.listdir(ADDONS_DIR)
+                  if not name.startswith('.') and os.path.isdir(os.path.join(ADDONS_DIR, name)))
+
+
+def run_jobs(job, addons, options, cache, prefix, use_cache, jobs):
+    """在进程池中处理 addon，按 addon 顺序逐个产出结果，并更新缓存"""
+    def cached(addon):
+        return cache.get(f'{prefix}:{addon}') if use_cache else None
+
+    if jobs <= 1 or len(addons) <= 1:
+        results = (job(addon, options, cached(addon)) for addon in addons)
+        executor = None
+    else:
+        executor = concurrent.futures.ProcessPoolExecutor(max_workers=min(jobs, len(addons)))
+        futures = [executor.submit(job, addon, options, cached(addon)) for addon in addons]
+        results = (future.result() for future in futures)
+    try:
+        for result in results:
+            entry = f"{prefix}:{result['addon']}"
+            if result['status'] == 'done':
+                cache[entry] = {'key': result['key'], 'output_hash': result.get('output_hash'),
+                                'report': result['report']}
+            elif result['status'] != 'cached':
+                cache.pop(entry, None)
+            yield result
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+
+def cmd_validate(args, options):
+    addons = args.addons or list_addons()
+    for addon in addons:
+        if not os.path.isdir(os.path.join(ADDONS_DIR, addon)):
+            print(f"{RED}错误: Addon '{addon}' 不存在{NC}")
+            return 1
+    options['check_template'] = args.check_template
+
+    cache = load_cache()
+    start = time.monotonic()
+    failed, cached_count = [], 0
+    for i, result in enumerate(run_jobs(validate_job, addons, options, cache, 'validate',
+                                        not args.no_cache, args.jobs)):
+        if i:
+            print()
+        print_validation(result)
+        cached_count += result['status'] == 'cached'
+        if result['report']['errors']:
+            failed.append(result['addon'])
+    save_cache(cache)
+
+    if len(addons) > 1:
+        print()
+        print('==========================================')
+        print(f'{BLUE}共验证 {len(addons)} 个 addon（{cached_count} 个未变化），'
+              f'用时 {time.monotonic() - start:.1f} 秒{NC}')
+        for addon in failed:
+            print(f'  {RED}- {addon}{NC}')
+    return 1 if failed else 0
+
+
+def cmd_generate(args, options):
+    if not os.path.isdir(ADDONS_DIR):
+        print(f'{RED}错误: Addons 目录不存在: {ADDONS_DIR}{NC}')
+        return 1
+    addons = args.addons or list_addons()
+    for addon in addons:
+        if not os.path.isdir(os.path.join(ADDONS_DIR, addon)):
+            print(f"{RED}错误: Addon '{addon}' 不存在{NC}")
+            return 1
+    options.update(output_dir=os.path.abspath(args.output_dir or DEFAULT_OUTPUT_DIR),
+                   skip_no_template=args.skip_no_template, create_template=not args.no_create_template)
+
+    if options['create_template'] and not os.path.isdir(TEMPLATE_SOURCE_DIR):
+        print(f'{YELLOW}警告: 模板源目录不存在: {TEMPLATE_SOURCE_DIR}{NC}')
+        print('  将无法自动创建 template/ 目录')
+    scope = f' {len(addons)} 个' if args.addons else '所有'
+    print(f'{BLUE}正在为{scope} addon 生成 template...{NC}')
+    if args.skip_no_template:
+        print(f'{YELLOW}提示: 将跳过没有 template/ 目录的 addon{NC}')
+    print()
+
+    cache = load_cache()
+    start = time.monotonic()
+    counts = {'done': 0, 'cached': 0, 'skipped': 0, 'failed': 0}
+    skipped, failed = [], []
+    for i, result in enumerate(run_jobs(generate_job, addons, options, cache, f"generate:{options['output_dir']}",
+                                        not args.no_cache, args.jobs), 1):
+        print_generation(i, result, args.verbose)
+        counts[result['status']] += 1
+        if result['status'] == 'skipped':
+            skipped.append(result['addon'])
+        elif result['status'] == 'failed':
+            failed.append(result['addon'])
+    save_cache(cache)
+
+    print()
+    print('==========================================')
+    print(f'{BLUE}生成完成！{NC}')
+    print()
+    print('统计信息:')
+    print(f'  总 addon 数: {len(addons)}')
+    print(f"  成功: {GREEN}{counts['done'] + counts['cached']}{NC}（其中未变化: {counts['cached']}）")
+    if skipped:
+        print(f'  跳过: {YELLOW}{len(skipped)}{NC}')
+    print(f'  失败: {RED}{len(failed)}{NC}' if failed else '  失败: 0')
+    print(f'  用时: {time.monotonic() - start:.1f} 秒（{max(1, min(args.jobs, len(addons)))} 个并行进程）')
+    print()
+    if skipped:
+        print('跳过的 addon（没有 template/ 目录或目录为空）:')
+        for addon in skipped:
+            print(f'  {YELLOW}- {addon}{NC}')
+        print()
+    if failed:
+        print('失败的 addon:')
+        for addon in failed:
+            print(f'  {RED}- {addon}{NC}')
+        print()
+        print(f'{YELLOW}提示:{NC}')
+        print('  - 如果 addon 没有 template/ 目录，请先运行: ./scripts/add-addon.sh <addon-name>')
+        print('  - 然后编辑 addons/<addon-name>/template/ 目录中的模板文件')
+        print('  - 使用 --skip-no-template 选项可以跳过没有 template/ 目录的 addon')
+        print()
+        return 1
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='并行验证 addon 并生成上传用的 template（带内容哈希缓存）')
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('addons', nargs='*', metavar='addon', help='addon 名称（默认: addons/ 下的所有 addon）')
+    common.add_argument('--jobs', '-j', type=int, default=os.cpu_count() or 1,
+                        help='并行进程数（默认: CPU 核心数）')
+    common.add_argument('--no-cache', action='store_true', help='忽略缓存，重新处理所有 addon')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    validate = commands.add_parser('validate', parents=[common], help='验证 addon 结构')
+    validate.add_argument('--check-template', action='store_true', help='同时检查上传用的 template（如果存在）')
+
+    generate = commands.add_parser('generate', parents=[common], help='生成上传用的 template')
+    generate.add_argument('--output-dir', help='输出目录（默认: addon_templates/）')
+    generate.add_argument('--skip-no-template', action='store_true', help='跳过没有 template/ 目录的 addon')
+    generate.add_argument('--no-create-template', action='store_true',
+                          help='addon 没有 template/ 目录时报错，而不是从模板自动创建')
+    generate.add_argument('--verbose', '-v', action='store_true', help='显示详细输出')
+
+    args = parser.parse_args(argv)
+    options = {'tool': _file_hash(os.path.abspath(__file__))}
+    if args.command == 'validate':
+        return cmd_validate(args, options)
+    return cmd_generate(args, options)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
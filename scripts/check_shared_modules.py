@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+检查各 addon 之间共用的模块副本是否一致
+
+每个 addon 单独构建镜像，不能导入其他 addon 的代码，因此部分模块以副本的
+形式存在于多个 addon 中。SHARED 列出这些模块：第一个 addon 中的是原件，
+其余为副本；列出的函数和常量在所有副本中的行为必须相同。修改其中之一时
+同步修改其他副本。
+
+比较的是语法树，以下差异不算不一致：
+- 文档字符串和注释（各 addon 的注释语言不同）
+- print() 输出的文字（控制台日志随 addon 的语言）
+- metrics.* 调用（只有 network-manager 提供 /metrics）
+
+使用方法:
+  python3 scripts/check_shared_modules.py
+"""
+import ast
+import os
+import sys
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(SCRIPT_DIR)
+WEB_DIR = os.path.join('common', 'rootfs', 'app', 'web')
+
+SHARED = {
+    'audit.py': {
+        'addons': ('network-manager', 'hacs-installer'),
+        'names': ('MAX_BYTES', 'BACKUPS', 'FLUSH_INTERVAL', 'BATCH_SIZE', 'MAX_PENDING', 'TAIL_BYTES',
+                  'REDACTED', 'SECRET_KEY_RE', 'SECRET_TEXT_RE',
+                  'redact', 'redact_text', 'record', '_files', '_rotate', 'flush', '_writer', '_ts', '_time_span',
+                  '_matches', 'query', 'stats'),
+    },
+    'http_cache.py': {
+        'addons': ('network-manager', 'hacs-installer'),
+        'names': ('GZIP_MIN_SIZE', 'GZIP_LEVEL', '_instance', '_entry', '_accepts_gzip', 'json_response'),
+    },
+}
+
+
+class _Normalize(ast.NodeTransformer):
+    def _strip_docstring(self, node):
+        body = node.body
+        if body and isinstance(body[0], ast.Expr) and isinstance(getattr(body[0], 'value', None), ast.Constant) \
+                and isinstance(body[0].value.value, str):
+            node.body = body[1:] or [ast.Pass()]
+        return node
+
+    def visit_FunctionDef(self, node):
+        self.generic_visit(node)
+        return self._strip_docstring(node)
+
+    def visit_Expr(self, node):
+        call = node.value
+        if isinstance(call, ast.Call) and isinstance(call.func, ast.Attribute) \
+                and isinstance(call.func.value, ast.Name) and call.func.value.id == 'metrics':
+            return None
+        return self.generic_visit(node)
+
+    def visit_Call(self, node):
+        self.generic_visit(node)
+        if isinstance(node.func, ast.Name) and node.func.id == 'print':
+            node.args = []
+        return node
+
+
+def _definitions(path):
+    """{名字: 规范化后的语法树}，包括模块级的函数和赋值"""
+    with open(path, encoding='utf-8') as f:
+        tree = ast.parse(f.read(), path)
+    found = {}
+    for node in tree.body:
+        if isinstance(node, ast.FunctionDef):
+            found[node.name] = node
+        elif isinstance(node, ast.Assign) and len(node.targets) == 1 and isinstance(node.targets[0], ast.Name):
+            found[node.targets[0].id] = node
+    normalize = _Normalize()
+    return {name: ast.dump(ast.fix_missing_locations(normalize.visit(node))) for name, node in found.items()}
+
+
+def main():
+    errors = []
+    for module, spec in SHARED.items():
+        origin, *copies = spec['addons']
+        origin_path = os.path.join(PROJECT_ROOT, 'addons', origin, WEB_DIR, module)
+        expected = _definitions(origin_path)
+        for addon in copies:
+            path = os.path.join(PROJECT_ROOT, 'addons', addon, WEB_DIR, module)
+            actual = _definitions(path)
+            for name in spec['names']:
+                if name not in expected or name not in actual:
+                    errors.append(f'{module}: {name} 不存在于 {origin if name not in expected else addon}')
+                elif expected[name] != actual[name]:
+                    errors.append(f'{module}: {addon} 中的 {name} 与 {origin} 不一致')
+    for error in errors:
+        print(f'错误: {error}')
+    if errors:
+        return 1
+    print(f'共享模块一致: {", ".join(SHARED)}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())